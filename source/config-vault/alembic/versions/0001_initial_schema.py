@@ -0,0 +1,62 @@
+"""Initial schema, as previously created by create_all at startup
+
+Databases created that way can be adopted with ``alembic stamp 0001``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "tenants",
+        sa.Column("id", sa.Uuid(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("domain", sa.String(255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_tenants_id", "tenants", ["id"])
+    op.create_index("ix_tenants_domain", "tenants", ["domain"], unique=True)
+
+    op.create_table(
+        "sites",
+        sa.Column("id", sa.Uuid(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("domain", sa.String(255), nullable=False),
+        sa.Column("tenant_id", sa.Uuid(as_uuid=True), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_sites_id", "sites", ["id"])
+    op.create_index("ix_sites_domain", "sites", ["domain"], unique=True)
+
+    op.create_table(
+        "rsa_key_pairs",
+        sa.Column("id", sa.Uuid(as_uuid=True), primary_key=True),
+        sa.Column("kid", sa.String(255), nullable=False),
+        sa.Column("private_key", sa.Text(), nullable=False),
+        sa.Column("public_key", sa.Text(), nullable=False),
+        sa.Column("tenant_id", sa.Uuid(as_uuid=True), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("site_id", sa.Uuid(as_uuid=True), sa.ForeignKey("sites.id"), nullable=True),
+        sa.Column("status", sa.String(50), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_rsa_key_pairs_id", "rsa_key_pairs", ["id"])
+    op.create_index("ix_rsa_key_pairs_kid", "rsa_key_pairs", ["kid"], unique=True)
+
+def downgrade() -> None:
+    op.drop_table("rsa_key_pairs")
+    op.drop_table("sites")
+    op.drop_table("tenants")
@@ -0,0 +1,30 @@
+"""Indexes backing keyset pagination on (created_at, id)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index("ix_tenants_created_at_id", "tenants", ["created_at", "id"])
+    op.create_index("ix_sites_created_at_id", "sites", ["created_at", "id"])
+    op.create_index("ix_sites_tenant_id_created_at_id", "sites", ["tenant_id", "created_at", "id"])
+    op.create_index(
+        "ix_rsa_key_pairs_tenant_id_created_at_id", "rsa_key_pairs", ["tenant_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_rsa_key_pairs_site_id_created_at_id", "rsa_key_pairs", ["site_id", "created_at", "id"]
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_rsa_key_pairs_site_id_created_at_id", table_name="rsa_key_pairs")
+    op.drop_index("ix_rsa_key_pairs_tenant_id_created_at_id", table_name="rsa_key_pairs")
+    op.drop_index("ix_sites_tenant_id_created_at_id", table_name="sites")
+    op.drop_index("ix_sites_created_at_id", table_name="sites")
+    op.drop_index("ix_tenants_created_at_id", table_name="tenants")
@@ -0,0 +1,25 @@
+"""Partial index for the key expiry sweep
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_rsa_key_pairs_active_expires_at",
+        "rsa_key_pairs",
+        ["status", "expires_at"],
+        postgresql_where=sa.text("status = 'active'"),
+        sqlite_where=sa.text("status = 'active'"),
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_rsa_key_pairs_active_expires_at", table_name="rsa_key_pairs")
@@ -0,0 +1,49 @@
+"""Key rotation schedule, successor and retirement columns
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table("rsa_key_pairs") as batch_op:
+        batch_op.add_column(sa.Column("rotate_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column("successor_id", sa.Uuid(as_uuid=True), nullable=True))
+        batch_op.add_column(sa.Column("retire_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_rsa_key_pairs_successor_id",
+            "rsa_key_pairs",
+            ["successor_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+    op.create_index(
+        "ix_rsa_key_pairs_pending_rotate_at",
+        "rsa_key_pairs",
+        ["rotate_at"],
+        postgresql_where=sa.text("status = 'active' AND successor_id IS NULL"),
+        sqlite_where=sa.text("status = 'active' AND successor_id IS NULL"),
+    )
+    op.create_index(
+        "ix_rsa_key_pairs_active_retire_at",
+        "rsa_key_pairs",
+        ["retire_at"],
+        postgresql_where=sa.text("status = 'active' AND retire_at IS NOT NULL"),
+        sqlite_where=sa.text("status = 'active' AND retire_at IS NOT NULL"),
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_rsa_key_pairs_active_retire_at", table_name="rsa_key_pairs")
+    op.drop_index("ix_rsa_key_pairs_pending_rotate_at", table_name="rsa_key_pairs")
+    with op.batch_alter_table("rsa_key_pairs") as batch_op:
+        batch_op.drop_constraint("fk_rsa_key_pairs_successor_id", type_="foreignkey")
+        batch_op.drop_column("retire_at")
+        batch_op.drop_column("successor_id")
+        batch_op.drop_column("rotate_at")
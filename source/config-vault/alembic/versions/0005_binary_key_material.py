@@ -0,0 +1,66 @@
+"""Store key material as bytes, PEM or DER
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.db.types import PEM_PREFIX, der_to_pem
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+KEY_COLUMNS = ("private_key", "public_key")
+LABELS = {"private_key": "PRIVATE KEY", "public_key": "PUBLIC KEY"}
+
+def upgrade() -> None:
+    # Existing PEM text is kept as its UTF-8 bytes, which reads back unchanged
+    with op.batch_alter_table("rsa_key_pairs") as batch_op:
+        for column in KEY_COLUMNS:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.Text(),
+                type_=sa.LargeBinary(),
+                existing_nullable=False,
+                postgresql_using=f"convert_to({column}, 'UTF8')",
+            )
+    if op.get_bind().dialect.name == "sqlite":
+        # SQLite keeps the copied values as TEXT unless they are cast
+        op.execute(
+            "UPDATE rsa_key_pairs SET private_key = CAST(private_key AS BLOB), "
+            "public_key = CAST(public_key AS BLOB)"
+        )
+
+def downgrade() -> None:
+    # DER rows have to become PEM again before the columns can be text
+    connection = op.get_bind()
+    table = sa.table(
+        "rsa_key_pairs",
+        sa.column("id", sa.Uuid()),
+        *(sa.column(column, sa.LargeBinary()) for column in KEY_COLUMNS),
+    )
+    for row in connection.execute(sa.select(table)).all():
+        values = {
+            column: der_to_pem(bytes(getattr(row, column)), LABELS[column]).encode("utf-8")
+            for column in KEY_COLUMNS
+            if not bytes(getattr(row, column)).startswith(PEM_PREFIX)
+        }
+        if values:
+            connection.execute(sa.update(table).where(table.c.id == row.id).values(**values))
+    with op.batch_alter_table("rsa_key_pairs") as batch_op:
+        for column in KEY_COLUMNS:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.LargeBinary(),
+                type_=sa.Text(),
+                existing_nullable=False,
+                postgresql_using=f"convert_from({column}, 'UTF8')",
+            )
+    if connection.dialect.name == "sqlite":
+        op.execute(
+            "UPDATE rsa_key_pairs SET private_key = CAST(private_key AS TEXT), "
+            "public_key = CAST(public_key AS TEXT)"
+        )
@@ -1,7 +1,46 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import tenants, sites, rsa_keys
+from app.api.api_v1.endpoints import tenants, sites, rsa_keys, stats, export, bulk_import, resolve
+from app.api.api_v1.async_endpoints import (
+    tenants as async_tenants,
+    sites as async_sites,
+    rsa_keys as async_rsa_keys,
+    export as async_export,
+)
+from app.core.config import settings
+
+def with_async_routes(sync_router: APIRouter, async_router: APIRouter) -> APIRouter:
+    """
+    Replace the routes of ``sync_router`` that ``async_router`` also serves,
+    keeping route order and any sync-only routes.
+    """
+    async_routes = {
+        (route.path, method): route
+        for route in async_router.routes
+        for method in route.methods
+    }
+    router = APIRouter()
+    for route in sync_router.routes:
+        replacement = next(
+            (async_routes[(route.path, method)] for method in route.methods
+             if (route.path, method) in async_routes),
+            route,
+        )
+        router.routes.append(replacement)
+    return router
+
+tenants_router, sites_router, rsa_keys_router = tenants.router, sites.router, rsa_keys.router
+export_router = export.router
+if settings.DB_ASYNC:
+    tenants_router = with_async_routes(tenants.router, async_tenants.router)
+    sites_router = with_async_routes(sites.router, async_sites.router)
+    rsa_keys_router = with_async_routes(rsa_keys.router, async_rsa_keys.router)
+    export_router = with_async_routes(export.router, async_export.router)
 
 api_router = APIRouter()
-api_router.include_router(tenants.router, prefix="/tenants", tags=["tenants"])
-api_router.include_router(sites.router, prefix="/sites", tags=["sites"])
-api_router.include_router(rsa_keys.router, prefix="/keys", tags=["rsa-keys"])
+api_router.include_router(tenants_router, prefix="/tenants", tags=["tenants"])
+api_router.include_router(sites_router, prefix="/sites", tags=["sites"])
+api_router.include_router(rsa_keys_router, prefix="/keys", tags=["rsa-keys"])
+api_router.include_router(export_router, prefix="/export", tags=["export"])
+api_router.include_router(bulk_import.router, prefix="/import", tags=["import"])
+api_router.include_router(resolve.router, prefix="/resolve", tags=["resolve"])
+api_router.include_router(stats.router, prefix="/stats", tags=["stats"])
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.api.api_v1.endpoints.export import ExportEntity, export_response
+from app.core.export import export_ndjson_async
+
+router = APIRouter()
+
+@router.get("/{entity}", response_class=StreamingResponse)
+async def export_table(
+    *,
+    entity: ExportEntity,
+    tenant_id: Optional[UUID] = None,
+    updated_since: Optional[datetime] = None,
+    include_private: bool = False,
+    gzip: bool = False,
+) -> StreamingResponse:
+    """
+    Stream every tenant, site or key as NDJSON, one object per line in
+    creation order.
+    """
+    chunks = export_ndjson_async(
+        entity,
+        tenant_id=tenant_id,
+        updated_since=updated_since,
+        include_private=include_private,
+        gzip=gzip,
+    )
+    return export_response(chunks, entity, gzip)
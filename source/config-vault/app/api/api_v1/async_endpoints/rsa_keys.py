@@ -0,0 +1,280 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud
+from app.api import deps
+from app.api.api_v1.endpoints.rsa_keys import (
+    active_keys_response,
+    build_key_data,
+    check_key_owner,
+    draw_key_pair,
+    keys_page_response,
+    read_key,
+    sign_batch_items,
+    sign_with,
+    status_change,
+    verify_activated,
+    verify_selection,
+)
+from app.core.key_snapshot import key_snapshot
+from app.core.query_budget import query_budget
+from app.core.signing import get_signing_keys
+from app.schemas.rsa_key_pair import (
+    RSAKeyPair,
+    RSAKeyPairCreate,
+    RSAKeyPairSelection,
+    RSAKeyPairStatusChange,
+    RSAKeyPairWithPrivate,
+    SignBatchItem,
+    SignBatchResult,
+    SignRequest,
+    SignResponse,
+)
+
+router = APIRouter()
+
+@router.post("/", response_model=RSAKeyPairWithPrivate)
+@query_budget(3)
+async def create_rsa_key(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    key_in: RSAKeyPairCreate,
+) -> RSAKeyPairWithPrivate:
+    """
+    Create new RSA key pair.
+    """
+    tenant = await crud.async_tenant.get(db=db, id=key_in.tenant_id)
+    site = await crud.async_site.get(db=db, id=key_in.site_id) if tenant and key_in.site_id else None
+    check_key_owner(key_in, tenant, site)
+    private_key, public_key = await draw_key_pair(key_in.key_size)
+    
+    key_data = build_key_data(key_in, private_key, public_key)
+    key_pair = await crud.async_rsa_key_pair.create(db=db, obj_in=key_data)
+    return key_pair
+
+@router.post("/sign/batch", response_model=List[SignBatchResult])
+@query_budget(1)
+async def sign_batch(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    items: List[SignBatchItem],
+) -> List[SignBatchResult]:
+    """
+    Sign many payloads, each with its own key and algorithm, in one request.
+    """
+    return await sign_batch_items(
+        items, lambda kids: crud.async_rsa_key_pair.get_signing_keys(db=db, kids=kids)
+    )
+
+@router.post("/bulk/revoke", response_model=RSAKeyPairStatusChange)
+@query_budget(1)
+async def revoke_rsa_keys(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    selection: RSAKeyPairSelection,
+) -> RSAKeyPairStatusChange:
+    """
+    Revoke every RSA key pair of a tenant, a site or an id list.
+    
+    Selectors are combined, so `tenant_id` with `site_id` only revokes that
+    site's keys. All matching keys are revoked with a single UPDATE.
+    """
+    verify_selection(selection)
+    rows = await crud.async_rsa_key_pair.update_status_multi(
+        db=db, status="revoked", **selection.model_dump()
+    )
+    return status_change("revoked", rows)
+
+@router.post("/bulk/activate", response_model=RSAKeyPairStatusChange)
+@query_budget(1)
+async def activate_rsa_keys(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    selection: RSAKeyPairSelection,
+) -> RSAKeyPairStatusChange:
+    """
+    Activate every revoked RSA key pair of a tenant, a site or an id list
+    that has not expired. Expired and retired keys are left as they are.
+    """
+    verify_selection(selection)
+    rows = await crud.async_rsa_key_pair.update_status_multi(
+        db=db, status="active", **selection.model_dump()
+    )
+    return status_change("active", rows)
+
+@router.get("/{kid}", response_model=RSAKeyPair)
+@query_budget(1)
+async def read_rsa_key_by_kid(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    kid: str,
+    if_none_match: Optional[str] = Header(None),
+) -> RSAKeyPair:
+    """
+    Get RSA key pair by Key ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
+    """
+    return await read_key(
+        kid, if_none_match, lambda: crud.async_rsa_key_pair.get_by_kid(db=db, kid=kid)
+    )
+
+@router.post("/{kid}/sign", response_model=SignResponse)
+@query_budget(1)
+async def sign_with_rsa_key(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    kid: str,
+    request: SignRequest,
+) -> SignResponse:
+    """
+    Sign data with an active key, so clients never handle private keys.
+    """
+    keys = await get_signing_keys(
+        [kid], lambda kids: crud.async_rsa_key_pair.get_signing_keys(db=db, kids=kids)
+    )
+    signature = await sign_with(keys[kid], request)
+    return SignResponse(kid=kid, algorithm=request.algorithm, signature=signature)
+
+@router.get("/tenant/{tenant_id}", response_model=List[RSAKeyPair])
+@query_budget(2)
+async def read_rsa_keys_by_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    include_total: bool = False,
+    if_none_match: Optional[str] = Header(None),
+) -> List[RSAKeyPair]:
+    """
+    Get RSA key pairs by tenant ID, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
+    """
+    try:
+        page = await crud.async_rsa_key_pair.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"tenant_id": tenant_id, "status": status},
+            with_total=include_total,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return keys_page_response(page, if_none_match)
+
+@router.get("/site/{site_id}", response_model=List[RSAKeyPair])
+@query_budget(2)
+async def read_rsa_keys_by_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    include_total: bool = False,
+    if_none_match: Optional[str] = Header(None),
+) -> List[RSAKeyPair]:
+    """
+    Get RSA key pairs by site ID, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
+    """
+    try:
+        page = await crud.async_rsa_key_pair.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"site_id": site_id, "status": status},
+            with_total=include_total,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return keys_page_response(page, if_none_match)
+
+@router.get("/tenant/{tenant_id}/active", response_model=List[RSAKeyPair])
+@query_budget(1)
+async def read_active_rsa_keys_by_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> List[RSAKeyPair]:
+    """
+    Get active RSA key pairs by tenant ID.
+    """
+    key_pairs = key_snapshot.active_by_tenant(tenant_id)
+    if key_pairs is None:
+        key_pairs = await crud.async_rsa_key_pair.get_active_by_tenant_id(db=db, tenant_id=tenant_id)
+    return active_keys_response(key_pairs, if_none_match)
+
+@router.get("/site/{site_id}/active", response_model=List[RSAKeyPair])
+@query_budget(1)
+async def read_active_rsa_keys_by_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> List[RSAKeyPair]:
+    """
+    Get active RSA key pairs by site ID.
+    """
+    key_pairs = key_snapshot.active_by_site(site_id)
+    if key_pairs is None:
+        key_pairs = await crud.async_rsa_key_pair.get_active_by_site_id(db=db, site_id=site_id)
+    return active_keys_response(key_pairs, if_none_match)
+
+@router.post("/{key_id}/revoke")
+@query_budget(1)
+async def revoke_rsa_key(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    key_id: UUID,
+):
+    """
+    Revoke an RSA key pair.
+    """
+    key_pair = await crud.async_rsa_key_pair.update_status(db=db, id=key_id, status="revoked")
+    if not key_pair:
+        raise HTTPException(status_code=404, detail="RSA key pair not found")
+    return {"message": "RSA key pair revoked successfully"}
+
+@router.post("/{key_id}/activate")
+@query_budget(2)
+async def activate_rsa_key(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    key_id: UUID,
+):
+    """
+    Activate a revoked RSA key pair that has not expired.
+    """
+    key_pair = await crud.async_rsa_key_pair.update_status(db=db, id=key_id, status="active")
+    if not key_pair:
+        verify_activated(await crud.async_rsa_key_pair.get(db=db, id=key_id))
+    return {"message": "RSA key pair activated successfully"}
+
+@router.delete("/{key_id}", response_model=RSAKeyPair)
+@query_budget(1)
+async def delete_rsa_key(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    key_id: UUID,
+) -> RSAKeyPair:
+    """
+    Delete an RSA key pair.
+    """
+    key_pair = await crud.async_rsa_key_pair.remove(db=db, id=key_id)
+    if not key_pair:
+        raise HTTPException(status_code=404, detail="RSA key pair not found")
+    return key_pair
@@ -0,0 +1,146 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud
+from app.api import deps
+from app.core.config import settings
+from app.core.pagination import page_response
+from app.core.query_budget import query_budget
+from app.core.version_cache import read_versioned
+from app.schemas.site import Site, SiteCreate, SiteUpdate
+
+router = APIRouter()
+
+@router.post("/", response_model=Site)
+@query_budget(3)
+async def create_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_in: SiteCreate,
+) -> Site:
+    """
+    Create new site.
+    """
+    # Verify tenant exists
+    tenant = await crud.async_tenant.get(db=db, id=site_in.tenant_id)
+    if not tenant:
+        raise HTTPException(
+            status_code=400,
+            detail="The tenant with this ID does not exist in the system.",
+        )
+    
+    # Check if domain already exists
+    site = await crud.async_site.get_by_domain(db, domain=site_in.domain)
+    if site:
+        raise HTTPException(
+            status_code=400,
+            detail="A site with this domain already exists in the system.",
+        )
+    
+    site = await crud.async_site.create(db=db, obj_in=site_in)
+    return site
+
+@router.get("/", response_model=List[Site])
+@query_budget(2)
+async def read_sites(
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    tenant_id: Optional[UUID] = None,
+    is_active: Optional[bool] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    if_none_match: Optional[str] = Header(None),
+) -> List[Site]:
+    """
+    Retrieve sites, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
+    """
+    try:
+        page = await crud.async_site.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"tenant_id": tenant_id, "is_active": is_active},
+            with_total=include_total,
+            skip=skip,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return page_response(
+        page,
+        Site,
+        cache_control=settings.SITE_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+
+@router.get("/{site_id}", response_model=Site)
+@query_budget(1)
+async def read_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Site:
+    """
+    Get site by ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
+    """
+    site = await read_versioned(
+        "sites",
+        site_id,
+        Site,
+        loader=lambda: crud.async_site.get(db=db, id=site_id),
+        cache_control=settings.SITE_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+    if site is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return site
+
+@router.put("/{site_id}", response_model=Site)
+@query_budget(2)
+async def update_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_id: UUID,
+    site_in: SiteUpdate,
+) -> Site:
+    """
+    Update a site.
+    """
+    # Check if new domain already exists
+    if site_in.domain:
+        existing_site = await crud.async_site.get_by_domain(db, domain=site_in.domain)
+        if existing_site and existing_site.id != site_id:
+            raise HTTPException(
+                status_code=400,
+                detail="A site with this domain already exists in the system.",
+            )
+    
+    site = await crud.async_site.update_by_id(db=db, id=site_id, obj_in=site_in)
+    if not site:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return site
+
+@router.delete("/{site_id}", response_model=Site)
+@query_budget(2)
+async def delete_site(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    site_id: UUID,
+) -> Site:
+    """
+    Delete a site.
+    """
+    site = await crud.async_site.remove(db=db, id=site_id)
+    if not site:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return site
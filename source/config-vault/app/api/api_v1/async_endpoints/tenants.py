@@ -0,0 +1,176 @@
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud
+from app.api import deps
+from app.api.api_v1.endpoints.tenants import bundle_response, bundles_document, verify_bundle_ids
+from app.core.bundle import get_tenant_bundles
+from app.core.config import settings
+from app.core.pagination import page_response
+from app.core.query_budget import query_budget
+from app.core.version_cache import read_versioned
+from app.schemas.bundle import TenantBundle
+from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate
+
+router = APIRouter()
+
+@router.post("/", response_model=Tenant)
+@query_budget(2)
+async def create_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_in: TenantCreate,
+) -> Tenant:
+    """
+    Create new tenant.
+    """
+    # Check if domain already exists
+    tenant = await crud.async_tenant.get_by_domain(db, domain=tenant_in.domain)
+    if tenant:
+        raise HTTPException(
+            status_code=400,
+            detail="A tenant with this domain already exists in the system.",
+        )
+    tenant = await crud.async_tenant.create(db=db, obj_in=tenant_in)
+    return tenant
+
+@router.get("/", response_model=List[Tenant])
+@query_budget(2)
+async def read_tenants(
+    db: AsyncSession = Depends(deps.get_async_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    is_active: Optional[bool] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    if_none_match: Optional[str] = Header(None),
+) -> List[Tenant]:
+    """
+    Retrieve tenants, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
+    """
+    try:
+        page = await crud.async_tenant.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"is_active": is_active},
+            with_total=include_total,
+            skip=skip,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return page_response(
+        page,
+        Tenant,
+        cache_control=settings.TENANT_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+
+@router.get("/bundles", response_model=List[TenantBundle])
+@query_budget(3)
+async def read_tenant_bundles(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    ids: List[UUID] = Query(...),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """
+    Get the bundles of many tenants at once, e.g. to warm a node.
+    
+    Bundles are returned in the order of `ids`. Unknown tenants are left out.
+    """
+    ids = verify_bundle_ids(ids)
+    documents = await get_tenant_bundles(
+        ids, lambda missing: crud.async_tenant.get_bundles(db=db, ids=missing)
+    )
+    return bundle_response(bundles_document(ids, documents), if_none_match)
+
+@router.get("/{tenant_id}", response_model=Tenant)
+@query_budget(1)
+async def read_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Tenant:
+    """
+    Get tenant by ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
+    """
+    tenant = await read_versioned(
+        "tenants",
+        tenant_id,
+        Tenant,
+        loader=lambda: crud.async_tenant.get(db=db, id=tenant_id),
+        cache_control=settings.TENANT_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+    if tenant is None:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return tenant
+
+@router.get("/{tenant_id}/bundle", response_model=TenantBundle)
+@query_budget(3)
+async def read_tenant_bundle(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """
+    Get a tenant with its active sites and all their active public keys.
+    """
+    documents = await get_tenant_bundles(
+        [tenant_id], lambda missing: crud.async_tenant.get_bundles(db=db, ids=missing)
+    )
+    if str(tenant_id) not in documents:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return bundle_response(documents[str(tenant_id)], if_none_match)
+
+@router.put("/{tenant_id}", response_model=Tenant)
+@query_budget(2)
+async def update_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+    tenant_in: TenantUpdate,
+) -> Tenant:
+    """
+    Update a tenant.
+    """
+    # Check if new domain already exists
+    if tenant_in.domain:
+        existing_tenant = await crud.async_tenant.get_by_domain(db, domain=tenant_in.domain)
+        if existing_tenant and existing_tenant.id != tenant_id:
+            raise HTTPException(
+                status_code=400,
+                detail="A tenant with this domain already exists in the system.",
+            )
+    
+    tenant = await crud.async_tenant.update_by_id(db=db, id=tenant_id, obj_in=tenant_in)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return tenant
+
+@router.delete("/{tenant_id}", response_model=Tenant)
+@query_budget(3)
+async def delete_tenant(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    tenant_id: UUID,
+) -> Tenant:
+    """
+    Delete a tenant.
+    """
+    tenant = await crud.async_tenant.remove(db=db, id=tenant_id)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return tenant
@@ -0,0 +1,31 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.core.bulk_import import bulk_importer, detect_format, read_records
+from app.schemas.bulk_import import ImportResult
+
+router = APIRouter()
+
+@router.post("/{entity}", response_model=ImportResult)
+def import_table(
+    *,
+    db: Session = Depends(deps.get_db),
+    entity: Literal["tenants", "sites", "keys"],
+    file: UploadFile = File(...),
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    start_row: int = Query(1, ge=1),
+) -> ImportResult:
+    """
+    Bulk import tenants, sites or keys from an NDJSON or CSV file, optionally
+    gzipped. The format defaults to the file extension.
+    
+    Rows are committed in chunks and rows that fail validation (including
+    keys that are not one PEM RSA key pair), reuse a domain, id or kid, or
+    reference a missing tenant or a site of another tenant are reported in
+    `errors` while the rest are imported. Pass `next_row` back as `start_row`
+    to resume an interrupted import. Files from `GET /export` can be imported
+    as they are, keys only when exported with `include_private`.
+    """
+    records = read_records(file.file, format or detect_format(file.filename), start_row)
+    return bulk_importer(entity).run(db, records, start_row=start_row)
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import AsyncIterator, Iterator, Literal, Optional, Union
+from uuid import UUID
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.core.export import export_filename, export_ndjson
+
+router = APIRouter()
+
+ExportEntity = Literal["tenants", "sites", "keys"]
+
+def export_response(
+    chunks: Union[Iterator[bytes], AsyncIterator[bytes]], entity: str, gzip: bool
+) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(entity, gzip)}"'},
+    )
+
+@router.get("/{entity}", response_class=StreamingResponse)
+def export_table(
+    *,
+    entity: ExportEntity,
+    tenant_id: Optional[UUID] = None,
+    updated_since: Optional[datetime] = None,
+    include_private: bool = False,
+    gzip: bool = False,
+) -> StreamingResponse:
+    """
+    Stream every tenant, site or key as NDJSON, one object per line in
+    creation order.
+    
+    `tenant_id` limits the export to one tenant, `updated_since` to rows
+    created or updated since then. Private keys are only included with
+    `include_private`. `gzip` returns a gzip file instead.
+    """
+    chunks = export_ndjson(
+        entity,
+        tenant_id=tenant_id,
+        updated_since=updated_since,
+        include_private=include_private,
+        gzip=gzip,
+    )
+    return export_response(chunks, entity, gzip)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.domain_index import domain_index
+from app.schemas.resolve import DomainResolution
+
+router = APIRouter()
+
+@router.get("", response_model=DomainResolution)
+async def resolve_domain(domain: str) -> DomainResolution:
+    """
+    Resolve a domain, e.g. a Host header, to its site or tenant.
+    
+    Served from an in-memory index without touching the database. Exact
+    matches win, then the most specific wildcard domain such as `*.tenant.com`.
+    Sites win over tenants with the same domain.
+    """
+    if not domain_index.ready:
+        try:
+            await run_in_threadpool(domain_index.ensure_built)
+        except SQLAlchemyError:
+            raise HTTPException(status_code=503, detail="The domain index is not available yet.")
+    resolution = domain_index.resolve(domain)
+    if resolution is None:
+        raise HTTPException(status_code=404, detail="Domain not found")
+    target = resolution.target
+    return DomainResolution(
+        domain=domain,
+        matched=target.domain,
+        tenant_id=target.tenant_id,
+        site_id=target.site_id,
+        is_active=target.is_active,
+        kids=sorted(resolution.kids),
+    )
@@ -1,122 +1,546 @@
-from typing import List
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app import crud
 from app.api import deps
-from app.schemas.rsa_key_pair import RSAKeyPair, RSAKeyPairCreate, RSAKeyPairWithPrivate
+from app.core.pagination import page_response
+from app.schemas.rsa_key_pair import (
+    RSAKeyPair,
+    RSAKeyPairCreate,
+    RSAKeyPairSelection,
+    RSAKeyPairStatusChange,
+    RSAKeyPairWithPrivate,
+    SignBatchItem,
+    SignBatchResult,
+    SignRequest,
+    SignResponse,
+)
+from app.core.config import settings
+from app.core.http_cache import etag_matches, versioned_rows_response
+from app.core.jwks import JWKSDocument, jwks_cache
 from app.core.key_generation import KeyGenerationService
+from app.core.key_pool import KeyPoolExhausted, key_pool
+from app.core.key_snapshot import get_key_by_kid, key_snapshot
+from app.core.query_budget import query_budget
+from app.core.signing import (
+    SigningKeyInactive,
+    SigningKeyNotFound,
+    SigningKeyResult,
+    decode_data,
+    get_signing_keys,
+    sign,
+)
+from app.core.version_cache import read_versioned
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/", response_model=RSAKeyPairWithPrivate)
-def create_rsa_key(
-    *,
-    db: Session = Depends(deps.get_db),
-    key_in: RSAKeyPairCreate,
-) -> RSAKeyPairWithPrivate:
+POOL_EXHAUSTED_DETAIL = "No pre-generated keys are available, please retry shortly."
+NOT_ACTIVATABLE_DETAIL = "Only revoked RSA key pairs that have not expired can be activated."
+
+def check_key_owner(key_in: RSAKeyPairCreate, tenant: Any, site: Any) -> None:
     """
-    Create new RSA key pair.
+    Raise unless the tenant, and the site if one is given, of a new key exist.
     """
-    # Verify tenant exists
-    tenant = crud.tenant.get(db=db, id=key_in.tenant_id)
     if not tenant:
         raise HTTPException(
             status_code=400,
             detail="The tenant with this ID does not exist in the system.",
         )
+    if key_in.site_id and not site:
+        raise HTTPException(
+            status_code=400,
+            detail="The site with this ID does not exist in the system.",
+        )
+
+def verify_key_owner(db: Session, key_in: RSAKeyPairCreate) -> None:
+    """
+    Verify that the tenant, and the site if provided, of a new key exist.
+    """
+    tenant = crud.tenant.get(db=db, id=key_in.tenant_id)
+    site = crud.site.get(db=db, id=key_in.site_id) if tenant and key_in.site_id else None
+    check_key_owner(key_in, tenant, site)
+
+def verify_key_owners(db: Session, keys_in: List[RSAKeyPairCreate]) -> None:
+    """
+    Verify that every tenant and site referenced by a batch of new keys exists,
+    with one set-based query per table.
+    """
+    tenant_ids = {key_in.tenant_id for key_in in keys_in}
+    missing = tenant_ids - crud.tenant.get_existing_ids(db=db, ids=tenant_ids)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail="The tenants with these IDs do not exist in the system: "
+            + ", ".join(sorted(str(id) for id in missing)),
+        )
     
-    # Verify site exists if provided
-    if key_in.site_id:
-        site = crud.site.get(db=db, id=key_in.site_id)
-        if not site:
-            raise HTTPException(
-                status_code=400,
-                detail="The site with this ID does not exist in the system.",
-            )
-    
-    # Generate key pair
-    private_key, public_key = KeyGenerationService.generate_rsa_key_pair()
-    kid = KeyGenerationService.generate_kid()
-    expires_at = KeyGenerationService.calculate_expires_at(key_in.expires_in_days)
-    
-    # Create key pair object
-    key_data = {
-        "kid": kid,
+    site_ids = {key_in.site_id for key_in in keys_in if key_in.site_id}
+    missing = site_ids - crud.site.get_existing_ids(db=db, ids=site_ids)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail="The sites with these IDs do not exist in the system: "
+            + ", ".join(sorted(str(id) for id in missing)),
+        )
+
+async def draw_key_pair(key_size: int) -> Tuple[str, str]:
+    """
+    A key pair from the pool, generated on the key generation executor on a
+    miss, or a 503 when the pool is exhausted and may not generate on demand.
+    """
+    try:
+        return await key_pool.get_async(key_size)
+    except KeyPoolExhausted:
+        raise HTTPException(status_code=503, detail=POOL_EXHAUSTED_DETAIL)
+
+def status_change(status: str, rows: List[Any]) -> RSAKeyPairStatusChange:
+    return RSAKeyPairStatusChange(status=status, count=len(rows), kids=[row.kid for row in rows])
+
+def keys_page_response(page: Any, if_none_match: Optional[str]) -> Response:
+    return page_response(
+        page,
+        RSAKeyPair,
+        cache_control=settings.KEY_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+
+def active_keys_response(key_pairs: List[Any], if_none_match: Optional[str]) -> Response:
+    return versioned_rows_response(
+        key_pairs,
+        RSAKeyPair,
+        cache_control=settings.KEY_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+
+async def read_key(
+    kid: str,
+    if_none_match: Optional[str],
+    loader: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    A key pair by kid from the shared snapshot, the kid cache or ``loader``,
+    with its ETag, or a 304 or 404.
+    """
+    key_pair = await read_versioned(
+        "rsa_key_pairs",
+        kid,
+        RSAKeyPair,
+        loader=lambda: get_key_by_kid(kid, loader),
+        cache_control=settings.KEY_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+    if key_pair is None:
+        raise HTTPException(status_code=404, detail="RSA key pair not found")
+    return key_pair
+
+def build_key_data(key_in: RSAKeyPairCreate, private_key: str, public_key: str) -> dict:
+    """
+    Build the row for a newly generated key pair.
+    """
+    return {
+        "kid": KeyGenerationService.generate_kid(),
         "private_key": private_key,
         "public_key": public_key,
         "tenant_id": key_in.tenant_id,
         "site_id": key_in.site_id,
         "status": "active",
-        "expires_at": expires_at
+        "expires_at": KeyGenerationService.calculate_expires_at(key_in.expires_in_days),
     }
+
+async def sign_with(key: SigningKeyResult, request: SignRequest) -> str:
+    """
+    Sign a request with a key from ``get_signing_keys``, raising the HTTP
+    error for unknown or inactive keys and undecodable data.
+    """
+    if isinstance(key, SigningKeyNotFound):
+        raise HTTPException(status_code=404, detail="RSA key pair not found")
+    if isinstance(key, SigningKeyInactive):
+        raise HTTPException(status_code=409, detail="RSA key pair is not active")
+    try:
+        data = decode_data(request.data, request.encoding)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="data is not valid base64url")
+    return await sign(key, data, request.algorithm)
+
+async def sign_batch_items(
+    items: List[SignBatchItem], loader: Callable[[List[str]], Awaitable[List]]
+) -> List[SignBatchResult]:
+    """
+    Sign every item concurrently, loading all uncached keys with one query.
+    Failures are reported per item.
+    """
+    if len(items) > settings.KEY_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A signing batch may contain at most {settings.KEY_BATCH_MAX_SIZE} items.",
+        )
+    keys = await get_signing_keys((item.kid for item in items), loader)
+
+    async def sign_item(item: SignBatchItem) -> SignBatchResult:
+        result = SignBatchResult(kid=item.kid, algorithm=item.algorithm)
+        try:
+            result.signature = await sign_with(keys[item.kid], item)
+        except HTTPException as exc:
+            result.error = exc.detail
+        return result
+
+    return list(await asyncio.gather(*(sign_item(item) for item in items)))
+
+def verify_selection(selection: RSAKeyPairSelection) -> None:
+    """
+    Bound the size of an explicit id list in a bulk status change.
+    """
+    if selection.ids is not None and len(selection.ids) > settings.KEY_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A bulk status change may list at most {settings.KEY_BATCH_MAX_SIZE} keys.",
+        )
+
+def verify_activated(key_pair: Any) -> None:
+    """
+    Explain an activation that changed nothing, given the key pair as it is
+    now. A key that is already active is left as is.
+    """
+    if key_pair is None:
+        raise HTTPException(status_code=404, detail="RSA key pair not found")
+    if key_pair.status != "active":
+        raise HTTPException(status_code=409, detail=NOT_ACTIVATABLE_DETAIL)
+
+@router.post("/", response_model=RSAKeyPairWithPrivate)
+@query_budget(3)
+async def create_rsa_key(
+    *,
+    db: Session = Depends(deps.get_db),
+    key_in: RSAKeyPairCreate,
+) -> RSAKeyPairWithPrivate:
+    """
+    Create new RSA key pair.
+    """
+    # Blocking DB calls go to the threadpool so the event loop stays free
+    await run_in_threadpool(verify_key_owner, db, key_in)
+    
+    private_key, public_key = await draw_key_pair(key_in.key_size)
     
-    key_pair = crud.rsa_key_pair.create(db=db, obj_in=key_data)
+    key_data = build_key_data(key_in, private_key, public_key)
+    key_pair = await run_in_threadpool(crud.rsa_key_pair.create, db=db, obj_in=key_data)
     return key_pair
 
+async def _generate_for(key_in: RSAKeyPairCreate) -> dict:
+    private_key, public_key = await key_pool.get_async(key_in.key_size)
+    return build_key_data(key_in, private_key, public_key)
+
+async def _stream_key_batch(db: Session, keys_in: List[RSAKeyPairCreate]) -> AsyncIterator[str]:
+    """
+    Commit and send keys in chunks as they are generated. The status code is
+    sent with the first chunk, so a later failure ends the stream with an
+    ``{"error": ..., "created": ...}`` line instead; chunks sent before it stay
+    committed.
+    """
+    pending = [asyncio.ensure_future(_generate_for(key_in)) for key_in in keys_in]
+    chunk = []
+    created = 0
+    try:
+        for count, generated in enumerate(asyncio.as_completed(pending), start=1):
+            chunk.append(await generated)
+            if len(chunk) < settings.KEY_BATCH_STREAM_CHUNK_SIZE and count < len(pending):
+                continue
+            rows = await run_in_threadpool(crud.rsa_key_pair.create_multi, db=db, objs_in=chunk)
+            chunk = []
+            created += len(rows)
+            for row in rows:
+                yield RSAKeyPairWithPrivate.model_validate(row).model_dump_json() + "\n"
+    except KeyPoolExhausted:
+        yield json.dumps({"error": POOL_EXHAUSTED_DETAIL, "created": created}) + "\n"
+    except Exception:
+        logger.exception("Streaming key batch failed after %s keys", created)
+        yield json.dumps({"error": "Key batch failed", "created": created}) + "\n"
+    finally:
+        # Keys not generated yet are not needed any more
+        for future in pending:
+            future.cancel()
+
+@router.post("/batch", response_model=List[RSAKeyPairWithPrivate])
+async def create_rsa_keys_batch(
+    *,
+    db: Session = Depends(deps.get_db),
+    keys_in: List[RSAKeyPairCreate],
+    stream: bool = False,
+) -> List[RSAKeyPairWithPrivate]:
+    """
+    Create RSA key pairs in bulk.
+    
+    Keys are generated in parallel and written with one multi-row insert in a
+    single transaction. With `stream=true` the keys are returned as NDJSON,
+    committed and sent in chunks as soon as they are generated, each chunk in
+    its own transaction. A failure after the first chunk ends the stream with
+    an `error` line giving the number of keys `created` before it.
+    """
+    if len(keys_in) > settings.KEY_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {settings.KEY_BATCH_MAX_SIZE} keys.",
+        )
+    if not keys_in:
+        return []
+    await run_in_threadpool(verify_key_owners, db, keys_in)
+    
+    if stream:
+        return StreamingResponse(
+            _stream_key_batch(db, keys_in), media_type="application/x-ndjson"
+        )
+    
+    try:
+        objs_in = await asyncio.gather(*(_generate_for(key_in) for key_in in keys_in))
+    except KeyPoolExhausted:
+        raise HTTPException(
+            status_code=503,
+            detail=POOL_EXHAUSTED_DETAIL,
+        )
+    return await run_in_threadpool(crud.rsa_key_pair.create_multi, db=db, objs_in=objs_in)
+
+@router.post("/sign/batch", response_model=List[SignBatchResult])
+@query_budget(1)
+async def sign_batch(
+    *,
+    db: Session = Depends(deps.get_db),
+    items: List[SignBatchItem],
+) -> List[SignBatchResult]:
+    """
+    Sign many payloads, each with its own key and algorithm, in one request.
+    
+    Results are returned in request order, with `error` set instead of
+    `signature` for unknown or inactive keys and invalid data.
+    """
+    return await sign_batch_items(
+        items, lambda kids: run_in_threadpool(crud.rsa_key_pair.get_signing_keys, db=db, kids=kids)
+    )
+
+@router.post("/bulk/revoke", response_model=RSAKeyPairStatusChange)
+@query_budget(1)
+def revoke_rsa_keys(
+    *,
+    db: Session = Depends(deps.get_db),
+    selection: RSAKeyPairSelection,
+) -> RSAKeyPairStatusChange:
+    """
+    Revoke every RSA key pair of a tenant, a site or an id list.
+    
+    Selectors are combined, so `tenant_id` with `site_id` only revokes that
+    site's keys. All matching keys are revoked with a single UPDATE.
+    """
+    verify_selection(selection)
+    rows = crud.rsa_key_pair.update_status_multi(db=db, status="revoked", **selection.model_dump())
+    return status_change("revoked", rows)
+
+@router.post("/bulk/activate", response_model=RSAKeyPairStatusChange)
+@query_budget(1)
+def activate_rsa_keys(
+    *,
+    db: Session = Depends(deps.get_db),
+    selection: RSAKeyPairSelection,
+) -> RSAKeyPairStatusChange:
+    """
+    Activate every revoked RSA key pair of a tenant, a site or an id list
+    that has not expired. Expired and retired keys are left as they are.
+    """
+    verify_selection(selection)
+    rows = crud.rsa_key_pair.update_status_multi(db=db, status="active", **selection.model_dump())
+    return status_change("active", rows)
+
 @router.get("/{kid}", response_model=RSAKeyPair)
-def read_rsa_key_by_kid(
+@query_budget(1)
+async def read_rsa_key_by_kid(
     *,
     db: Session = Depends(deps.get_db),
     kid: str,
+    if_none_match: Optional[str] = Header(None),
 ) -> RSAKeyPair:
     """
     Get RSA key pair by Key ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
     """
-    key_pair = crud.rsa_key_pair.get_by_kid(db=db, kid=kid)
-    if not key_pair:
-        raise HTTPException(status_code=404, detail="RSA key pair not found")
-    return key_pair
+    return await read_key(
+        kid, if_none_match, lambda: run_in_threadpool(crud.rsa_key_pair.get_by_kid, db=db, kid=kid)
+    )
+
+@router.post("/{kid}/sign", response_model=SignResponse)
+@query_budget(1)
+async def sign_with_rsa_key(
+    *,
+    db: Session = Depends(deps.get_db),
+    kid: str,
+    request: SignRequest,
+) -> SignResponse:
+    """
+    Sign data with an active key, so clients never handle private keys.
+    
+    `RS*` algorithms use PKCS#1 v1.5 and `PS*` use PSS. The signature is
+    base64url encoded without padding, ready to append to a JWS. Parsed
+    private keys are cached in memory until the key is revoked or deleted.
+    """
+    keys = await get_signing_keys(
+        [kid], lambda kids: run_in_threadpool(crud.rsa_key_pair.get_signing_keys, db=db, kids=kids)
+    )
+    signature = await sign_with(keys[kid], request)
+    return SignResponse(kid=kid, algorithm=request.algorithm, signature=signature)
 
 @router.get("/tenant/{tenant_id}", response_model=List[RSAKeyPair])
+@query_budget(2)
 def read_rsa_keys_by_tenant(
     *,
     db: Session = Depends(deps.get_db),
     tenant_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    include_total: bool = False,
+    if_none_match: Optional[str] = Header(None),
 ) -> List[RSAKeyPair]:
     """
-    Get RSA key pairs by tenant ID.
+    Get RSA key pairs by tenant ID, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
     """
-    key_pairs = crud.rsa_key_pair.get_by_tenant_id(db=db, tenant_id=tenant_id)
-    return key_pairs
+    try:
+        page = crud.rsa_key_pair.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"tenant_id": tenant_id, "status": status},
+            with_total=include_total,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return keys_page_response(page, if_none_match)
 
 @router.get("/site/{site_id}", response_model=List[RSAKeyPair])
+@query_budget(2)
 def read_rsa_keys_by_site(
     *,
     db: Session = Depends(deps.get_db),
     site_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[str] = None,
+    include_total: bool = False,
+    if_none_match: Optional[str] = Header(None),
 ) -> List[RSAKeyPair]:
     """
-    Get RSA key pairs by site ID.
+    Get RSA key pairs by site ID, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
     """
-    key_pairs = crud.rsa_key_pair.get_by_site_id(db=db, site_id=site_id)
-    return key_pairs
+    try:
+        page = crud.rsa_key_pair.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"site_id": site_id, "status": status},
+            with_total=include_total,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return keys_page_response(page, if_none_match)
 
 @router.get("/tenant/{tenant_id}/active", response_model=List[RSAKeyPair])
+@query_budget(1)
 def read_active_rsa_keys_by_tenant(
     *,
     db: Session = Depends(deps.get_db),
     tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
 ) -> List[RSAKeyPair]:
     """
     Get active RSA key pairs by tenant ID.
     """
-    key_pairs = crud.rsa_key_pair.get_active_by_tenant_id(db=db, tenant_id=tenant_id)
-    return key_pairs
+    key_pairs = key_snapshot.active_by_tenant(tenant_id)
+    if key_pairs is None:
+        key_pairs = crud.rsa_key_pair.get_active_by_tenant_id(db=db, tenant_id=tenant_id)
+    return active_keys_response(key_pairs, if_none_match)
 
 @router.get("/site/{site_id}/active", response_model=List[RSAKeyPair])
+@query_budget(1)
 def read_active_rsa_keys_by_site(
     *,
     db: Session = Depends(deps.get_db),
     site_id: UUID,
+    if_none_match: Optional[str] = Header(None),
 ) -> List[RSAKeyPair]:
     """
     Get active RSA key pairs by site ID.
     """
-    key_pairs = crud.rsa_key_pair.get_active_by_site_id(db=db, site_id=site_id)
-    return key_pairs
+    key_pairs = key_snapshot.active_by_site(site_id)
+    if key_pairs is None:
+        key_pairs = crud.rsa_key_pair.get_active_by_site_id(db=db, site_id=site_id)
+    return active_keys_response(key_pairs, if_none_match)
+
+def jwks_response(document: JWKSDocument, if_none_match: Optional[str]) -> Response:
+    headers = {
+        "ETag": document.etag,
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+    }
+    if etag_matches(if_none_match, document.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
+
+@router.get("/tenant/{tenant_id}/jwks")
+@query_budget(1)
+async def read_tenant_jwks(
+    *,
+    db: Session = Depends(deps.get_db),
+    tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """
+    Get the JWKS document of a tenant's active keys.
+    """
+    document = jwks_cache.get("tenant", tenant_id)
+    if document is None:
+        generation = jwks_cache.generation
+        key_pairs = await run_in_threadpool(
+            crud.rsa_key_pair.get_active_by_tenant_id, db=db, tenant_id=tenant_id
+        )
+        document = jwks_cache.build("tenant", tenant_id, key_pairs, generation)
+    return jwks_response(document, if_none_match)
+
+@router.get("/site/{site_id}/jwks")
+@query_budget(1)
+async def read_site_jwks(
+    *,
+    db: Session = Depends(deps.get_db),
+    site_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """
+    Get the JWKS document of a site's active keys.
+    """
+    document = jwks_cache.get("site", site_id)
+    if document is None:
+        generation = jwks_cache.generation
+        key_pairs = await run_in_threadpool(
+            crud.rsa_key_pair.get_active_by_site_id, db=db, site_id=site_id
+        )
+        document = jwks_cache.build("site", site_id, key_pairs, generation)
+    return jwks_response(document, if_none_match)
 
 @router.post("/{key_id}/revoke")
+@query_budget(1)
 def revoke_rsa_key(
     *,
     db: Session = Depends(deps.get_db),
@@ -131,20 +555,22 @@ def revoke_rsa_key(
     return {"message": "RSA key pair revoked successfully"}
 
 @router.post("/{key_id}/activate")
+@query_budget(2)
 def activate_rsa_key(
     *,
     db: Session = Depends(deps.get_db),
     key_id: UUID,
 ):
     """
-    Activate an RSA key pair.
+    Activate a revoked RSA key pair that has not expired.
     """
     key_pair = crud.rsa_key_pair.update_status(db=db, id=key_id, status="active")
     if not key_pair:
-        raise HTTPException(status_code=404, detail="RSA key pair not found")
+        verify_activated(crud.rsa_key_pair.get(db=db, id=key_id))
     return {"message": "RSA key pair activated successfully"}
 
 @router.delete("/{key_id}", response_model=RSAKeyPair)
+@query_budget(1)
 def delete_rsa_key(
     *,
     db: Session = Depends(deps.get_db),
@@ -153,8 +579,7 @@ def delete_rsa_key(
     """
     Delete an RSA key pair.
     """
-    key_pair = crud.rsa_key_pair.get(db=db, id=key_id)
+    key_pair = crud.rsa_key_pair.remove(db=db, id=key_id)
     if not key_pair:
         raise HTTPException(status_code=404, detail="RSA key pair not found")
-    key_pair = crud.rsa_key_pair.remove(db=db, id=key_id)
     return key_pair
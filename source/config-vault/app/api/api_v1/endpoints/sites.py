@@ -1,14 +1,20 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app import crud
 from app.api import deps
+from app.core.config import settings
+from app.core.pagination import page_response
+from app.core.query_budget import query_budget
+from app.core.version_cache import read_versioned
 from app.schemas.site import Site, SiteCreate, SiteUpdate
 
 router = APIRouter()
 
 @router.post("/", response_model=Site)
+@query_budget(3)
 def create_site(
     *,
     db: Session = Depends(deps.get_db),
@@ -37,32 +43,71 @@ def create_site(
     return site
 
 @router.get("/", response_model=List[Site])
+@query_budget(2)
 def read_sites(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    tenant_id: Optional[UUID] = None,
+    is_active: Optional[bool] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    if_none_match: Optional[str] = Header(None),
 ) -> List[Site]:
     """
-    Retrieve sites.
+    Retrieve sites, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
     """
-    sites = crud.site.get_multi(db, skip=skip, limit=limit)
-    return sites
+    try:
+        page = crud.site.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"tenant_id": tenant_id, "is_active": is_active},
+            with_total=include_total,
+            skip=skip,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return page_response(
+        page,
+        Site,
+        cache_control=settings.SITE_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
 
 @router.get("/{site_id}", response_model=Site)
-def read_site(
+@query_budget(1)
+async def read_site(
     *,
     db: Session = Depends(deps.get_db),
     site_id: UUID,
+    if_none_match: Optional[str] = Header(None),
 ) -> Site:
     """
     Get site by ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
     """
-    site = crud.site.get(db=db, id=site_id)
-    if not site:
+    site = await read_versioned(
+        "sites",
+        site_id,
+        Site,
+        loader=lambda: run_in_threadpool(crud.site.get, db=db, id=site_id),
+        cache_control=settings.SITE_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+    if site is None:
         raise HTTPException(status_code=404, detail="Site not found")
     return site
 
 @router.put("/{site_id}", response_model=Site)
+@query_budget(2)
 def update_site(
     *,
     db: Session = Depends(deps.get_db),
@@ -72,10 +117,6 @@ def update_site(
     """
     Update a site.
     """
-    site = crud.site.get(db=db, id=site_id)
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
-    
     # Check if new domain already exists
     if site_in.domain:
         existing_site = crud.site.get_by_domain(db, domain=site_in.domain)
@@ -85,10 +126,13 @@ def update_site(
                 detail="A site with this domain already exists in the system.",
             )
     
-    site = crud.site.update(db=db, db_obj=site, obj_in=site_in)
+    site = crud.site.update_by_id(db=db, id=site_id, obj_in=site_in)
+    if not site:
+        raise HTTPException(status_code=404, detail="Site not found")
     return site
 
 @router.delete("/{site_id}", response_model=Site)
+@query_budget(2)
 def delete_site(
     *,
     db: Session = Depends(deps.get_db),
@@ -97,8 +141,7 @@ def delete_site(
     """
     Delete a site.
     """
-    site = crud.site.get(db=db, id=site_id)
+    site = crud.site.remove(db=db, id=site_id)
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
-    site = crud.site.remove(db=db, id=site_id)
     return site
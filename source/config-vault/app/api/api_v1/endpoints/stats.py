@@ -0,0 +1,54 @@
+from fastapi import APIRouter
+from app.core.bundle import bundle_cache
+from app.core.domain_index import domain_index
+from app.core.invalidation import invalidation_bus
+from app.core.jwks import jwks_cache
+from app.core.key_expiry import key_expiry_sweeper
+from app.core.key_pool import key_pool
+from app.core.key_rotation import key_rotation_scheduler
+from app.core.key_snapshot import key_snapshot
+from app.core.kid_cache import kid_cache
+from app.core.signing import signing_key_cache
+from app.core.version_cache import version_cache
+from app.db.session import async_engine, async_pool_stats, engine, pool_stats
+
+router = APIRouter()
+
+# Path, source and description of each component's counters
+STATS_SOURCES = [
+    ("key-pool", key_pool, "Get RSA key pool depth, refill settings and hit/miss counters."),
+    ("key-expiry", key_expiry_sweeper, "Get key expiry sweep settings and counters."),
+    ("key-rotation", key_rotation_scheduler, "Get key rotation schedule settings and counters."),
+    ("jwks-cache", jwks_cache, "Get JWKS document and per-key JWK cache counters."),
+    ("kid-cache", kid_cache, "Get key-by-kid cache size, hit/miss, eviction and invalidation counters."),
+    ("version-cache", version_cache, "Get the cache counters of tenant, site and key ETags used for 304s."),
+    (
+        "key-snapshot",
+        key_snapshot,
+        "Get the state of the shared active key snapshot, with lookup and build counters.",
+    ),
+    ("signing-keys", signing_key_cache, "Get loaded private key cache size, estimated memory and counters."),
+    ("tenant-bundles", bundle_cache, "Get tenant bundle cache size, hit/miss and eviction counters."),
+    ("domain-index", domain_index, "Get domain index size and build counters."),
+    ("invalidation", invalidation_bus, "Get invalidation bus backend, connection state and event counters."),
+]
+
+for path, source, description in STATS_SOURCES:
+    router.add_api_route(
+        f"/{path}",
+        source.stats,
+        methods=["GET"],
+        response_model=dict,
+        name=f"read_{path.replace('-', '_')}_stats",
+        description=description,
+    )
+
+@router.get("/db-pool")
+def read_db_pool_stats() -> dict:
+    """
+    Get connection pool usage, checkout wait times and invalidation counters.
+    """
+    stats = {"sync": pool_stats.snapshot(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = async_pool_stats.snapshot(async_engine.pool)
+    return stats
@@ -1,14 +1,45 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app import crud
 from app.api import deps
+from app.core.bundle import BundleDocument, combine, get_tenant_bundles
+from app.core.config import settings
+from app.core.http_cache import etag_matches
+from app.core.pagination import page_response
+from app.core.query_budget import query_budget
+from app.core.version_cache import read_versioned
+from app.schemas.bundle import TenantBundle
 from app.schemas.tenant import Tenant, TenantCreate, TenantUpdate
 
 router = APIRouter()
 
+def bundle_response(document: BundleDocument, if_none_match: Optional[str]) -> Response:
+    headers = {
+        "ETag": document.etag,
+        "Cache-Control": f"private, max-age={settings.TENANT_BUNDLE_MAX_AGE_SECONDS}",
+    }
+    if etag_matches(if_none_match, document.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
+
+def verify_bundle_ids(ids: List[UUID]) -> List[UUID]:
+    """The requested tenant ids without duplicates, in request order"""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.TENANT_BUNDLE_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.TENANT_BUNDLE_MAX_IDS} tenant ids can be requested at once.",
+        )
+    return ids
+
+def bundles_document(ids: List[UUID], documents: dict) -> BundleDocument:
+    return combine([documents[str(id)] for id in ids if str(id) in documents])
+
 @router.post("/", response_model=Tenant)
+@query_budget(2)
 def create_tenant(
     *,
     db: Session = Depends(deps.get_db),
@@ -28,32 +59,111 @@ def create_tenant(
     return tenant
 
 @router.get("/", response_model=List[Tenant])
+@query_budget(2)
 def read_tenants(
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    is_active: Optional[bool] = None,
+    include_total: bool = False,
+    skip: int = Query(0, ge=0, deprecated=True),
+    if_none_match: Optional[str] = Header(None),
 ) -> List[Tenant]:
     """
-    Retrieve tenants.
+    Retrieve tenants, ordered by creation time.
+    
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next
+    page. `X-Total-Count` is only computed when `include_total` is set.
+    Send the `ETag` back as `If-None-Match` to get a `304` when the page did
+    not change.
+    """
+    try:
+        page = crud.tenant.get_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            filters={"is_active": is_active},
+            with_total=include_total,
+            skip=skip,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return page_response(
+        page,
+        Tenant,
+        cache_control=settings.TENANT_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+
+@router.get("/bundles", response_model=List[TenantBundle])
+@query_budget(3)
+async def read_tenant_bundles(
+    *,
+    db: Session = Depends(deps.get_db),
+    ids: List[UUID] = Query(...),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
-    tenants = crud.tenant.get_multi(db, skip=skip, limit=limit)
-    return tenants
+    Get the bundles of many tenants at once, e.g. to warm a node.
+    
+    Bundles are returned in the order of `ids`. Unknown tenants are left out.
+    """
+    ids = verify_bundle_ids(ids)
+    documents = await get_tenant_bundles(
+        ids, lambda missing: run_in_threadpool(crud.tenant.get_bundles, db=db, ids=missing)
+    )
+    return bundle_response(bundles_document(ids, documents), if_none_match)
 
 @router.get("/{tenant_id}", response_model=Tenant)
-def read_tenant(
+@query_budget(1)
+async def read_tenant(
     *,
     db: Session = Depends(deps.get_db),
     tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
 ) -> Tenant:
     """
     Get tenant by ID.
+    
+    Send the `ETag` back as `If-None-Match` to get a `304` when it did not
+    change, answered without a database query while its version is cached.
     """
-    tenant = crud.tenant.get(db=db, id=tenant_id)
-    if not tenant:
+    tenant = await read_versioned(
+        "tenants",
+        tenant_id,
+        Tenant,
+        loader=lambda: run_in_threadpool(crud.tenant.get, db=db, id=tenant_id),
+        cache_control=settings.TENANT_CACHE_CONTROL,
+        if_none_match=if_none_match,
+    )
+    if tenant is None:
         raise HTTPException(status_code=404, detail="Tenant not found")
     return tenant
 
+@router.get("/{tenant_id}/bundle", response_model=TenantBundle)
+@query_budget(3)
+async def read_tenant_bundle(
+    *,
+    db: Session = Depends(deps.get_db),
+    tenant_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """
+    Get a tenant with its active sites and all their active public keys.
+    
+    Loaded with a fixed number of queries and cached until the tenant, one of
+    its sites or one of its keys changes. Send the `ETag` back as
+    `If-None-Match` to get a `304` when nothing changed.
+    """
+    documents = await get_tenant_bundles(
+        [tenant_id], lambda missing: run_in_threadpool(crud.tenant.get_bundles, db=db, ids=missing)
+    )
+    if str(tenant_id) not in documents:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return bundle_response(documents[str(tenant_id)], if_none_match)
+
 @router.put("/{tenant_id}", response_model=Tenant)
+@query_budget(2)
 def update_tenant(
     *,
     db: Session = Depends(deps.get_db),
@@ -63,10 +173,6 @@ def update_tenant(
     """
     Update a tenant.
     """
-    tenant = crud.tenant.get(db=db, id=tenant_id)
-    if not tenant:
-        raise HTTPException(status_code=404, detail="Tenant not found")
-    
     # Check if new domain already exists
     if tenant_in.domain:
         existing_tenant = crud.tenant.get_by_domain(db, domain=tenant_in.domain)
@@ -76,10 +182,13 @@ def update_tenant(
                 detail="A tenant with this domain already exists in the system.",
             )
     
-    tenant = crud.tenant.update(db=db, db_obj=tenant, obj_in=tenant_in)
+    tenant = crud.tenant.update_by_id(db=db, id=tenant_id, obj_in=tenant_in)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
     return tenant
 
 @router.delete("/{tenant_id}", response_model=Tenant)
+@query_budget(3)
 def delete_tenant(
     *,
     db: Session = Depends(deps.get_db),
@@ -88,8 +197,7 @@ def delete_tenant(
     """
     Delete a tenant.
     """
-    tenant = crud.tenant.get(db=db, id=tenant_id)
+    tenant = crud.tenant.remove(db=db, id=tenant_id)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
-    tenant = crud.tenant.remove(db=db, id=tenant_id)
     return tenant
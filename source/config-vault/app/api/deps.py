@@ -1,6 +1,6 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal, SessionLocal
 
 def get_db() -> Generator:
     try:
@@ -8,3 +8,7 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
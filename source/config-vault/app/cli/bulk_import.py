@@ -0,0 +1,68 @@
+"""
+Bulk import tenants, sites or keys from NDJSON or CSV files, e.g.:
+
+    python -m app.cli.bulk_import tenants backup/tenants.ndjson.gz
+    python -m app.cli.bulk_import sites sites.csv --start-row 400001
+
+Rows are committed in chunks of --chunk-size. Failed rows are written to
+stderr as NDJSON and skipped, up to IMPORT_MAX_ERRORS of them. If the import stops, rerun it with the
+printed --start-row to continue after the last committed chunk.
+"""
+import argparse
+import sys
+import time
+import orjson
+from app.core.bulk_import import IMPORT_TABLES, bulk_importer, detect_format, read_records
+from app.db.session import SessionLocal
+from app.schemas.bulk_import import ImportResult
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.bulk_import", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("entity", choices=list(IMPORT_TABLES))
+    parser.add_argument("path", help="File to import, or - for stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"],
+                        help="Input format (default: from the file extension, ndjson for stdin)")
+    parser.add_argument("--start-row", type=int, default=1, help="First row to import, to resume")
+    parser.add_argument("--chunk-size", type=int, help="Rows per commit (default: IMPORT_CHUNK_SIZE)")
+    return parser.parse_args(argv)
+
+class Progress:
+    """Reports each committed chunk and the failures it found"""
+
+    def __init__(self, start_row: int):
+        self.started = time.perf_counter()
+        self.reported = 0
+        self.next_row = start_row
+
+    def __call__(self, result: ImportResult) -> None:
+        for error in result.errors[self.reported:]:
+            sys.stderr.buffer.write(orjson.dumps(error.model_dump(), option=orjson.OPT_APPEND_NEWLINE))
+        self.reported = len(result.errors)
+        self.next_row = result.next_row
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"{result.entity}: {result.imported} imported, {result.failed} failed, "
+            f"next row {result.next_row} ({result.imported / max(elapsed, 1e-9):.0f} rows/s)",
+            file=sys.stderr,
+        )
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    importer = bulk_importer(args.entity, chunk_size=args.chunk_size)
+    progress = Progress(args.start_row)
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        with stream, SessionLocal() as db:
+            records = read_records(stream, args.format or detect_format(args.path), args.start_row)
+            result = importer.run(db, records, start_row=args.start_row, on_chunk=progress)
+    except BaseException:
+        print(f"Import stopped, resume with --start-row {progress.next_row}", file=sys.stderr)
+        raise
+    print(result.model_dump_json())
+    if result.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Dump tenants, sites and keys as NDJSON files, e.g.:
+
+    python -m app.cli.export --output-dir backup --gzip
+    python -m app.cli.export keys --tenant-id <uuid> --include-private -o -
+
+Rows are streamed from a server-side cursor, so memory use does not depend
+on table size. Each file is written under a temporary name and renamed once
+complete.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from uuid import UUID
+from app.core.export import EXPORT_TABLES, export_filename, export_ndjson
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.export", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("entities", nargs="*", metavar="entity",
+                        help=f"One of {', '.join(EXPORT_TABLES)} (default: all)")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory for the files, or - for stdout")
+    parser.add_argument("--tenant-id", type=UUID, help="Only export rows of this tenant")
+    parser.add_argument("--updated-since", type=datetime.fromisoformat,
+                        help="Only export rows created or updated since this ISO 8601 time")
+    parser.add_argument("--include-private", action="store_true", help="Include private keys")
+    parser.add_argument("--gzip", action="store_true", help="Write gzip files")
+    parser.add_argument("--batch-size", type=int, help="Rows per cursor fetch (default: EXPORT_BATCH_SIZE)")
+    args = parser.parse_args(argv)
+    args.entities = args.entities or list(EXPORT_TABLES)
+    unknown = [entity for entity in args.entities if entity not in EXPORT_TABLES]
+    if unknown:
+        parser.error(f"unknown entity: {', '.join(unknown)}")
+    if args.output_dir == "-" and len(args.entities) != 1:
+        parser.error("exporting to stdout takes exactly one entity")
+    return args
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    for entity in args.entities:
+        started = time.perf_counter()
+        chunks = export_ndjson(
+            entity,
+            tenant_id=args.tenant_id,
+            updated_since=args.updated_since,
+            include_private=args.include_private,
+            gzip=args.gzip,
+            batch_size=args.batch_size,
+        )
+        if args.output_dir == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            continue
+        os.makedirs(args.output_dir, exist_ok=True)
+        path = os.path.join(args.output_dir, export_filename(entity, args.gzip))
+        size = 0
+        with open(f"{path}.partial", "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        os.replace(f"{path}.partial", path)
+        print(f"{path}: {size} bytes in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
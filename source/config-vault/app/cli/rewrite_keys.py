@@ -0,0 +1,36 @@
+"""
+Rewrite stored key material in the current KEY_STORAGE_FORMAT, e.g.:
+
+    KEY_STORAGE_FORMAT=der python -m app.cli.rewrite_keys
+
+Rows in either format are readable at any time, so this can run while the
+service is serving traffic. Each batch is committed on its own.
+"""
+import argparse
+import sys
+from app import crud
+from app.core.config import settings
+from app.db import base  # noqa: F401 registers every model for the relationships
+from app.db.session import SessionLocal
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.rewrite_keys", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="Key pairs per commit")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    rewritten, after = 0, None
+    with SessionLocal() as db:
+        while True:
+            count, after = crud.rsa_key_pair.rewrite_key_material(db, after=after, limit=args.batch_size)
+            if after is None:
+                break
+            rewritten += count
+            print(f"Rewrote {rewritten} key pairs as {settings.KEY_STORAGE_FORMAT}", file=sys.stderr)
+    print(f"Done, {rewritten} key pairs are stored as {settings.KEY_STORAGE_FORMAT}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import csv
+import gzip
+import io
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Type, Union
+import orjson
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app import crud
+from app.core.config import settings
+from app.core.invalidation import publish
+from app.crud.base import CRUDBase
+from app.schemas.bulk_import import ImportResult, ImportRowError
+from app.schemas.rsa_key_pair import RSAKeyPairImport
+from app.schemas.site import SiteImport
+from app.schemas.tenant import TenantImport
+
+class ImportTable(NamedTuple):
+    crud: CRUDBase
+    schema: Type[BaseModel]
+    # Columns that must not already be taken, checked set-wise per chunk
+    unique: Tuple[str, ...]
+    # Columns that must reference an existing row of another table
+    references: Tuple[Tuple[str, CRUDBase], ...]
+    # (column, owner column, table): the row ``column`` references must have
+    # the same owner as the imported row
+    owners: Tuple[Tuple[str, str, CRUDBase], ...] = ()
+
+IMPORT_TABLES = {
+    "tenants": ImportTable(crud.tenant, TenantImport, ("id", "domain"), ()),
+    "sites": ImportTable(crud.site, SiteImport, ("id", "domain"), (("tenant_id", crud.tenant),)),
+    "keys": ImportTable(
+        crud.rsa_key_pair,
+        RSAKeyPairImport,
+        ("id", "kid"),
+        (("tenant_id", crud.tenant), ("site_id", crud.site)),
+        (("site_id", "tenant_id", crud.site),),
+    ),
+}
+
+# A parsed record, or why the row could not be parsed
+Record = Tuple[int, Union[Dict[str, Any], str]]
+
+def detect_format(filename: Optional[str]) -> str:
+    name = (filename or "").lower()
+    return "csv" if name.endswith((".csv", ".csv.gz")) else "ndjson"
+
+def decompressed(stream: BinaryIO) -> BinaryIO:
+    """Transparently gunzip ``stream`` when it starts with the gzip magic number"""
+    if hasattr(stream, "peek"):
+        head = stream.peek(2)[:2]
+    else:
+        head = stream.read(2)
+        stream.seek(0)
+    return gzip.GzipFile(fileobj=stream, mode="rb") if head == b"\x1f\x8b" else stream
+
+def read_ndjson(stream: BinaryIO, start_row: int) -> Iterator[Record]:
+    """One record per line, rows are line numbers"""
+    for row, line in enumerate(stream, 1):
+        if row < start_row or not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield row, f"Invalid JSON: {exc}"
+            continue
+        yield row, record if isinstance(record, dict) else "Expected a JSON object"
+
+def read_csv(stream: BinaryIO, start_row: int) -> Iterator[Record]:
+    """One record per row after the header, empty cells are missing values"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row, record in enumerate(reader, 1):
+        if row >= start_row:
+            yield row, {field: value for field, value in record.items() if value != "" and field is not None}
+
+def read_records(stream: BinaryIO, format: str, start_row: int = 1) -> Iterator[Record]:
+    stream = decompressed(stream)
+    if format == "csv":
+        return read_csv(stream, start_row)
+    return read_ndjson(stream, start_row)
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+class BulkImporter:
+    """
+    Loads records into one table in chunks of ``chunk_size`` rows.
+
+    Each chunk is validated, checked against the unique columns, the
+    referenced tables and the owners of referenced rows with one query per
+    column, inserted with COPY or
+    executemany and committed on its own. Rows failing a check are reported
+    and skipped, the rest of their chunk is still imported. Because chunks
+    commit in input order, an interrupted import resumes from ``next_row``.
+    """
+
+    def __init__(self, entity: str, *, chunk_size: int, max_errors: int):
+        self.entity = entity
+        self.table = IMPORT_TABLES[entity]
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    def run(
+        self,
+        db: Session,
+        records: Iterator[Record],
+        *,
+        start_row: int = 1,
+        on_chunk: Optional[Callable[[ImportResult], None]] = None,
+    ) -> ImportResult:
+        result = ImportResult(entity=self.entity, next_row=start_row)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return result
+            self.import_chunk(db, chunk, result)
+            result.next_row = chunk[-1][0] + 1
+            if on_chunk is not None:
+                on_chunk(result)
+
+    def import_chunk(self, db: Session, chunk: List[Record], result: ImportResult) -> None:
+        failures: List[Tuple[int, str]] = []
+        result.imported += self.load_chunk(db, chunk, failures)
+        result.failed += len(failures)
+        for row, error in sorted(failures)[: self.max_errors - len(result.errors)]:
+            result.errors.append(ImportRowError(row=row, error=error))
+
+    def load_chunk(self, db: Session, chunk: List[Record], failures: List) -> int:
+        """Insert and commit the rows of ``chunk`` passing every check, adding the others to ``failures``"""
+        created_at = datetime.now(timezone.utc)
+        rows = []
+        for row, record in chunk:
+            if isinstance(record, str):
+                failures.append((row, record))
+                continue
+            try:
+                values = self.table.schema.model_validate(record).model_dump()
+            except ValidationError as exc:
+                failures.append((row, validation_message(exc)))
+                continue
+            values["id"] = values["id"] or uuid.uuid4()
+            values["created_at"] = values["created_at"] or created_at
+            rows.append((row, values))
+
+        for column in self.table.unique:
+            rows = self.check_unique(db, rows, column, failures)
+        for column, referenced in self.table.references:
+            rows = self.check_references(db, rows, column, referenced, failures)
+        for column, owner, referenced in self.table.owners:
+            rows = self.check_owners(db, rows, column, owner, referenced, failures)
+        if not rows:
+            return 0
+
+        try:
+            self.table.crud.insert_many(db, rows=[values for _, values in rows])
+            db.commit()
+        except (SQLAlchemyError, ValueError, db.get_bind().dialect.loaded_dbapi.Error) as exc:
+            # Only a write racing the checks above, or a value the database
+            # rejects although it passed validation, gets here. COPY raises
+            # driver errors and bind processing errors unwrapped.
+            db.rollback()
+            failures.extend((row, f"Chunk rolled back: {getattr(exc, 'orig', None) or exc}") for row, _ in rows)
+            return 0
+        # New sites and keys change the cached bundle and JWKS documents of their tenant
+        tablename = self.table.crud.model.__tablename__
+        for _, values in rows:
+            publish(tablename, "create", values)
+        return len(rows)
+
+    def check_unique(self, db: Session, rows: List, column: str, failures: List) -> List:
+        existing = self.table.crud.get_existing_values(
+            db, column=column, values=(values[column] for _, values in rows)
+        )
+        seen: Dict[Any, int] = {}
+        kept = []
+        for row, values in rows:
+            value = values[column]
+            if value in existing:
+                failures.append((row, f"{column} {value} already exists"))
+            elif value in seen:
+                failures.append((row, f"{column} {value} duplicates row {seen[value]}"))
+            else:
+                seen[value] = row
+                kept.append((row, values))
+        return kept
+
+    def check_references(
+        self, db: Session, rows: List, column: str, referenced: CRUDBase, failures: List
+    ) -> List:
+        ids = {values[column] for _, values in rows if values[column] is not None}
+        missing = ids - referenced.get_existing_ids(db, ids=ids)
+        kept = []
+        for row, values in rows:
+            if values[column] in missing:
+                failures.append((row, f"{column} {values[column]} does not exist"))
+            else:
+                kept.append((row, values))
+        return kept
+
+    def check_owners(
+        self, db: Session, rows: List, column: str, owner: str, referenced: CRUDBase, failures: List
+    ) -> List:
+        owners = referenced.get_column_by_id(
+            db, column=owner, ids=(values[column] for _, values in rows if values[column] is not None)
+        )
+        kept = []
+        for row, values in rows:
+            if values[column] is not None and owners[values[column]] != values[owner]:
+                failures.append((row, f"{column} {values[column]} does not belong to {owner} {values[owner]}"))
+            else:
+                kept.append((row, values))
+        return kept
+
+def bulk_importer(entity: str, *, chunk_size: Optional[int] = None) -> BulkImporter:
+    return BulkImporter(
+        entity,
+        chunk_size=chunk_size or settings.IMPORT_CHUNK_SIZE,
+        max_errors=settings.IMPORT_MAX_ERRORS,
+    )
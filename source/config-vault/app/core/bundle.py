@@ -0,0 +1,92 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+from uuid import UUID
+import orjson
+from app.core.cache import GenerationCache
+from app.core.config import settings
+from app.core.http_cache import make_etag
+from app.core.serialization import ORJSON_OPTIONS, row_to_dict, schema_fields
+from app.schemas.rsa_key_pair import RSAKeyPair
+from app.schemas.site import Site
+from app.schemas.tenant import Tenant
+
+class BundleDocument(NamedTuple):
+    body: bytes
+    etag: str
+
+def bundle_dict(tenant: Any) -> dict:
+    """
+    The TenantBundle of a tenant loaded with its active sites and active keys.
+    Sites are ordered by domain and keys by kid, so unchanged data always
+    serializes to the same bytes and keeps its ETag.
+    """
+    key_fields = schema_fields(RSAKeyPair)
+    keys_by_site: Dict[Optional[UUID], List[dict]] = {}
+    for key_pair in sorted(tenant.rsa_keys, key=lambda key_pair: key_pair.kid):
+        keys_by_site.setdefault(key_pair.site_id, []).append(row_to_dict(key_pair, key_fields))
+    sites = []
+    for site in sorted(tenant.sites, key=lambda site: site.domain):
+        sites.append({**row_to_dict(site, schema_fields(Site)), "keys": keys_by_site.get(site.id, [])})
+    return {**row_to_dict(tenant, schema_fields(Tenant)), "sites": sites, "keys": keys_by_site.get(None, [])}
+
+def combine(documents: Sequence[BundleDocument]) -> BundleDocument:
+    """One JSON array of several bundles, reusing their serialized bodies"""
+    body = b"[" + b",".join(document.body for document in documents) + b"]"
+    return BundleDocument(body=body, etag=make_etag(body))
+
+class TenantBundleCache:
+    """
+    In-process cache of serialized tenant bundles by tenant id, dropped
+    whenever the tenant, one of its sites or one of its keys changes, with
+    the generation guard of ``GenerationCache``.
+    """
+
+    def __init__(self, *, max_size: int, ttl: Optional[float]):
+        self.entries = GenerationCache(max_size=max_size, ttl=ttl)
+
+    @property
+    def generation(self) -> int:
+        return self.entries.generation
+
+    def get(self, tenant_id: str) -> Optional[BundleDocument]:
+        return self.entries.get(tenant_id)
+
+    def put(self, tenant: Any, generation: int) -> BundleDocument:
+        body = orjson.dumps(bundle_dict(tenant), option=ORJSON_OPTIONS)
+        document = BundleDocument(body=body, etag=make_etag(body))
+        self.entries.put(str(tenant.id), document, generation)
+        return document
+
+    def invalidate(self, tenant_id: Optional[str]) -> None:
+        self.entries.invalidate(tenant_id)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+bundle_cache = TenantBundleCache(
+    max_size=settings.TENANT_BUNDLE_CACHE_MAX_SIZE,
+    ttl=settings.TENANT_BUNDLE_CACHE_TTL_SECONDS,
+)
+
+async def get_tenant_bundles(
+    tenant_ids: Iterable[UUID], loader: Callable[[List[UUID]], Awaitable[List[Any]]]
+) -> Dict[str, BundleDocument]:
+    """
+    Bundles of ``tenant_ids`` from the cache, loading the missing ones with a
+    single ``loader`` call. Unknown tenants are left out.
+    """
+    documents: Dict[str, BundleDocument] = {}
+    missing = []
+    for tenant_id in tenant_ids:
+        document = bundle_cache.get(str(tenant_id))
+        if document is None:
+            missing.append(tenant_id)
+        else:
+            documents[str(tenant_id)] = document
+    if missing:
+        generation = bundle_cache.generation
+        for tenant in await loader(missing):
+            documents[str(tenant.id)] = bundle_cache.put(tenant, generation)
+    return documents
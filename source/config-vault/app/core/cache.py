@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+# Default for ``get`` when None is itself a cached value
+MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache with an optional per-entry TTL.
+
+    Keeps hit, miss and eviction counters so each cache can be sized against
+    real traffic through the stats endpoints. ``on_evict`` is called with the
+    key and value of every entry dropped for size or age, under the lock.
+
+    With ``weigh``, entries are also bounded by their total weight, e.g. the
+    memory they take, up to ``max_weight``; heavier values are not stored.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: Optional[int],
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        weigh: Optional[Callable[[Any], int]] = None,
+        max_weight: Optional[int] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.weigh = weigh
+        self.max_weight = max_weight
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._weight = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                if self.on_evict is not None:
+                    self.on_evict(key, value)
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        weight = self.weigh(value) if self.weigh is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+            self._entries[key] = (expires_at, value)
+            self._weight += weight
+            while self._over_bounds():
+                evicted_key = next(iter(self._entries))
+                evicted = self._remove(evicted_key)
+                self._evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted_key, evicted)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+            if self.weigh is not None:
+                stats.update({"weight": self._weight, "max_weight": self.max_weight})
+            return stats
+
+    def _over_bounds(self) -> bool:
+        if self.max_size is not None and len(self._entries) > self.max_size:
+            return True
+        return self.max_weight is not None and self._weight > self.max_weight
+
+    def _remove(self, key: Hashable) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        if self.weigh is not None:
+            self._weight -= self.weigh(entry[1])
+        return entry[1]
+
+class GenerationCache(TTLCache):
+    """
+    A TTLCache filled by loads that can race invalidations of what they load.
+
+    A loader takes ``generation`` before reading and stores its value with
+    ``put``. Every invalidation bumps the generation, and a value loaded
+    before the bump is not stored, so a concurrent read can never put back
+    an entry that was just invalidated, e.g. a key that was just revoked.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._generation_lock = threading.Lock()
+        self._generation = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Token to take before loading a value"""
+        return self._generation
+
+    def put(self, key: Hashable, value: Any, generation: int, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` unless an invalidation came after ``generation``, returning whether it was"""
+        with self._generation_lock:
+            if generation != self._generation:
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._generation_lock:
+            self._generation += 1
+            self._invalidations += 1
+            self.pop(key)
+
+    def clear(self) -> None:
+        with self._generation_lock:
+            self._generation += 1
+            super().clear()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "invalidations": self._invalidations}
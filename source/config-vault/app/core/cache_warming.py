@@ -0,0 +1,48 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from app import crud
+from app.core.jwks import jwks_cache
+from app.core.kid_cache import kid_cache
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def warm_caches(batch_size: int = 1000) -> int:
+    """
+    Cache every active key by kid and the JWKS document of every tenant and
+    site with active keys, reading the public key columns once. Returns the
+    number of keys read.
+
+    Entries invalidated while the keys are read are left out, as for any
+    other read racing a write.
+    """
+    kid_generation, jwks_generation = kid_cache.generation, jwks_cache.generation
+    by_tenant, by_site = defaultdict(list), defaultdict(list)
+    count = 0
+    with SessionLocal() as db:
+        for rows in crud.rsa_key_pair.stream_active_public_keys(db, batch_size=batch_size):
+            for row in rows:
+                kid_cache.put(row.kid, {**row._mapping, "status": "active"}, kid_generation)
+                by_tenant[row.tenant_id].append(row)
+                if row.site_id is not None:
+                    by_site[row.site_id].append(row)
+            count += len(rows)
+    for scope, groups in (("tenant", by_tenant), ("site", by_site)):
+        for id, key_pairs in groups.items():
+            jwks_cache.build(scope, id, key_pairs, jwks_generation)
+    return count
+
+def _warm_in_background() -> None:
+    started = time.perf_counter()
+    try:
+        count = warm_caches()
+    except Exception:
+        logger.exception("Warming the key caches failed, they fill on first use")
+        return
+    logger.info("Warmed the key caches with %d active keys in %.2fs", count, time.perf_counter() - started)
+
+def start_cache_warming() -> None:
+    """Warm in a background thread, so startup never waits for the database"""
+    threading.Thread(target=_warm_in_background, name="cache-warming", daemon=True).start()
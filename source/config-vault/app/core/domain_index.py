@@ -0,0 +1,236 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from app import crud
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.db.session import SessionLocal
+
+if TYPE_CHECKING:
+    from app.core.invalidation import InvalidationEvent
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+class DomainTarget(NamedTuple):
+    """What a domain belongs to, a site when ``site_id`` is set and a tenant otherwise"""
+    domain: str
+    tenant_id: str
+    site_id: Optional[str]
+    is_active: bool
+
+class Resolution(NamedTuple):
+    target: DomainTarget
+    kids: FrozenSet[str]
+
+def normalize_domain(domain: str) -> str:
+    """Lower-case ``domain``, dropping a trailing dot and a Host header port"""
+    domain = domain.strip().lower()
+    host, _, port = domain.rpartition(":")
+    return (host if host and port.isdigit() else domain).rstrip(".")
+
+class TrieNode:
+    __slots__ = ("children", "tenant", "site")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.tenant: Optional[DomainTarget] = None
+        self.site: Optional[DomainTarget] = None
+
+    @property
+    def target(self) -> Optional[DomainTarget]:
+        # A site is more specific than a tenant with the same domain
+        return self.site or self.tenant
+
+class DomainIndexState:
+    """
+    Tenant and site domains in a trie of reversed labels, so ``a.shop.com``
+    is stored under ``com`` > ``shop`` > ``a``. A domain such as
+    ``*.shop.com`` is stored under a ``*`` label and matches every subdomain
+    of ``shop.com`` that has no more specific entry. Active kids are kept
+    per (tenant id, site id) owner as frozensets, replaced on every change,
+    so lookups never see a set being modified.
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+        # (entity, id) -> indexed domain, to move or drop entries by id
+        self.domains: Dict[Tuple[str, str], str] = {}
+        self.kids: Dict[Tuple[str, Optional[str]], FrozenSet[str]] = {}
+
+    def resolve(self, domain: str) -> Optional[Resolution]:
+        node, wildcard = self.root, None
+        for label in reversed(normalize_domain(domain).split(".")):
+            candidate = node.children.get(WILDCARD)
+            if candidate is not None and candidate.target is not None:
+                wildcard = candidate
+            node = node.children.get(label)
+            if node is None:
+                break
+        if node is None or node.target is None:
+            node = wildcard
+        if node is None:
+            return None
+        target = node.target
+        return Resolution(target, self.kids.get((target.tenant_id, target.site_id), frozenset()))
+
+    def put(self, entity: str, id: str, target: DomainTarget) -> None:
+        self.remove(entity, id)
+        node = self.root
+        for label in reversed(target.domain.split(".")):
+            node = node.children.setdefault(label, TrieNode())
+        setattr(node, "site" if entity == "sites" else "tenant", target)
+        self.domains[(entity, id)] = target.domain
+
+    def remove(self, entity: str, id: str) -> None:
+        domain = self.domains.pop((entity, id), None)
+        if domain is None:
+            return
+        labels = list(reversed(domain.split(".")))
+        path = [self.root]
+        for label in labels:
+            path.append(path[-1].children[label])
+        setattr(path[-1], "site" if entity == "sites" else "tenant", None)
+        # Prune nodes left without entries or children
+        for depth in range(len(labels), 0, -1):
+            node = path[depth]
+            if node.children or node.target is not None:
+                break
+            del path[depth - 1].children[labels[depth - 1]]
+
+    def set_kid(self, kid: str, tenant_id: str, site_id: Optional[str], active: bool) -> None:
+        owner = (tenant_id, site_id)
+        kids = self.kids.get(owner, frozenset())
+        kids = kids | {kid} if active else kids - {kid}
+        if kids:
+            self.kids[owner] = kids
+        else:
+            self.kids.pop(owner, None)
+
+    def apply(self, event: "InvalidationEvent") -> None:
+        if event.entity == "rsa_key_pairs":
+            if event.action == "delete" or event.status is not None:
+                active = event.action != "delete" and event.status == "active"
+                self.set_kid(event.kid, event.tenant_id, event.site_id, active)
+        elif event.entity in ("tenants", "sites"):
+            if event.action == "delete" or event.domain is None:
+                self.remove(event.entity, event.id)
+                return
+            is_sites = event.entity == "sites"
+            self.put(event.entity, event.id, DomainTarget(
+                domain=normalize_domain(event.domain),
+                tenant_id=event.tenant_id if is_sites else event.id,
+                site_id=event.id if is_sites else None,
+                is_active=event.is_active is not False,
+            ))
+
+def load_state() -> DomainIndexState:
+    """Index every tenant and site domain and every active kid, with three column-only queries"""
+    state = DomainIndexState()
+    with SessionLocal() as db:
+        for row in crud.tenant.get_domains(db):
+            state.put("tenants", str(row.id), DomainTarget(
+                normalize_domain(row.domain), str(row.id), None, row.is_active is not False
+            ))
+        for row in crud.site.get_domains(db):
+            state.put("sites", str(row.id), DomainTarget(
+                normalize_domain(row.domain), str(row.tenant_id), str(row.id), row.is_active is not False
+            ))
+        for row in crud.rsa_key_pair.get_active_kids(db):
+            state.set_kid(row.kid, str(row.tenant_id), str(row.site_id) if row.site_id else None, True)
+    return state
+
+class DomainIndex:
+    """
+    In-process index resolving a domain to its tenant or site and active kids.
+
+    Built from the database on startup in a background thread, or by the
+    first lookup if that comes first, then kept current by invalidation
+    events. Events arriving while a build runs are applied to the old index
+    and replayed on the new one, so nothing committed during a build is lost.
+    Broker reconnects, after which events may have been missed, rebuild the
+    index in the background while the old one keeps serving.
+    """
+
+    def __init__(self):
+        self._state: Optional[DomainIndexState] = None
+        self._pending: Optional[List["InvalidationEvent"]] = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._builds = 0
+        self._failures = 0
+        self._build_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    def resolve(self, domain: str) -> Optional[Resolution]:
+        self.ensure_built()
+        return self._state.resolve(domain)
+
+    def apply(self, event: "InvalidationEvent") -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(event)
+            if self._state is not None:
+                self._state.apply(event)
+
+    def ensure_built(self) -> None:
+        if self._state is None:
+            with self._build_lock:
+                if self._state is None:
+                    self._build()
+
+    def build(self) -> None:
+        with self._build_lock:
+            self._build()
+
+    def start(self) -> None:
+        """Build in a background thread, so startup never waits for the database"""
+        threading.Thread(target=self._build_in_background, name="domain-index", daemon=True).start()
+
+    def clear(self) -> None:
+        # Old entries stay usable until the rebuild replaces them
+        self.start()
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "ready": state is not None,
+            "domains": len(state.domains) if state is not None else 0,
+            "kid_owners": len(state.kids) if state is not None else 0,
+            "builds": self._builds,
+            "failures": self._failures,
+            "last_build_seconds": self._build_seconds,
+        }
+
+    def _build(self) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            state = load_state()
+        except Exception:
+            self._failures += 1
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for event in self._pending:
+                state.apply(event)
+            self._pending = None
+            self._state = state
+        self._builds += 1
+        self._build_seconds = time.perf_counter() - started
+
+    def _build_in_background(self) -> None:
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Building the domain index failed, the next lookup retries")
+
+domain_index = DomainIndex()
+invalidation_bus.subscribe(domain_index.apply, on_reset=domain_index.clear)
@@ -0,0 +1,120 @@
+import logging
+import zlib
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple, Type, Union
+from uuid import UUID
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import RowMapping
+from app import crud
+from app.core.config import settings
+from app.core.serialization import ORJSON_OPTIONS, schema_fields
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.schemas.rsa_key_pair import RSAKeyPair, RSAKeyPairWithPrivate
+from app.schemas.site import Site
+from app.schemas.tenant import Tenant
+
+logger = logging.getLogger(__name__)
+
+# zlib window bits that produce a gzip container instead of a raw deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+class ExportTable(NamedTuple):
+    crud: CRUDBase
+    async_crud: AsyncCRUDBase
+    schema: Type[BaseModel]
+    # Schema used with ``include_private``, the same as ``schema`` when nothing is private
+    private_schema: Type[BaseModel]
+
+EXPORT_TABLES = {
+    "tenants": ExportTable(crud.tenant, crud.async_tenant, Tenant, Tenant),
+    "sites": ExportTable(crud.site, crud.async_site, Site, Site),
+    "keys": ExportTable(crud.rsa_key_pair, crud.async_rsa_key_pair, RSAKeyPair, RSAKeyPairWithPrivate),
+}
+
+def export_columns(entity: str, include_private: bool) -> Tuple[str, ...]:
+    table = EXPORT_TABLES[entity]
+    if include_private and table.private_schema is not table.schema:
+        logger.info("Exporting %s with private keys", entity)
+        return schema_fields(table.private_schema)
+    return schema_fields(table.schema)
+
+def export_filename(entity: str, gzip: bool) -> str:
+    return f"{entity}.ndjson.gz" if gzip else f"{entity}.ndjson"
+
+def encode_rows(rows: Sequence[RowMapping]) -> bytes:
+    """One JSON document per row, each followed by a newline"""
+    return b"".join(orjson.dumps(dict(row), option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+def ndjson_chunks(partitions: Iterable[Sequence[RowMapping]], *, gzip: bool) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if gzip else None
+    for partition in partitions:
+        chunk = encode_rows(partition)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+async def ndjson_chunks_async(
+    partitions: AsyncIterable[Sequence[RowMapping]], *, gzip: bool
+) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if gzip else None
+    async for partition in partitions:
+        chunk = encode_rows(partition)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+def export_ndjson(
+    entity: str,
+    *,
+    tenant_id: Optional[Union[UUID, str]] = None,
+    updated_since: Optional[datetime] = None,
+    include_private: bool = False,
+    gzip: bool = False,
+    batch_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Stream ``entity`` ("tenants", "sites" or "keys") as NDJSON, optionally
+    gzipped. Private keys are left out unless ``include_private`` is set.
+
+    The generator owns its session, so it outlives the request handler that
+    returned it and is closed once the last row has been sent.
+    """
+    columns = export_columns(entity, include_private)
+    with SessionLocal() as db:
+        partitions = EXPORT_TABLES[entity].crud.stream(
+            db,
+            columns=columns,
+            tenant_id=tenant_id,
+            updated_since=updated_since,
+            batch_size=batch_size or settings.EXPORT_BATCH_SIZE,
+        )
+        yield from ndjson_chunks(partitions, gzip=gzip)
+
+async def export_ndjson_async(
+    entity: str,
+    *,
+    tenant_id: Optional[Union[UUID, str]] = None,
+    updated_since: Optional[datetime] = None,
+    include_private: bool = False,
+    gzip: bool = False,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    columns = export_columns(entity, include_private)
+    async with AsyncSessionLocal() as db:
+        partitions = EXPORT_TABLES[entity].async_crud.stream(
+            db,
+            columns=columns,
+            tenant_id=tenant_id,
+            updated_since=updated_since,
+            batch_size=batch_size or settings.EXPORT_BATCH_SIZE,
+        )
+        async for chunk in ndjson_chunks_async(partitions, gzip=gzip):
+            yield chunk
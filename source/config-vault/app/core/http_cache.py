@@ -0,0 +1,57 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Type
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from app.core.serialization import RawJSONResponse, dump_rows
+
+def make_etag(body: bytes) -> str:
+    """Build a strong ETag from the exact bytes of a response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+def versioned_row_response(
+    body: bytes,
+    *,
+    etag: str,
+    cache_control: str,
+    if_none_match: Optional[str],
+) -> Response:
+    """A serialized row with its ETag and Cache-Control, or a 304 when the client's copy is current"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+    return RawJSONResponse(body, headers=headers)
+
+def versioned_rows_response(
+    rows: List[Any],
+    schema: Type[BaseModel],
+    *,
+    cache_control: str,
+    if_none_match: Optional[str],
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Rows with an ETag over their serialized fields and ``headers``, or a 304
+    when the client's copy is current. The rows are serialized once, for the
+    ETag, and that body is sent as is: it is byte for byte what the response
+    model would produce.
+    """
+    body = dump_rows(rows, schema)
+    headers = dict(headers or {})
+    etag = make_etag(body + orjson.dumps(headers))
+    headers.update({"ETag": etag, "Cache-Control": cache_control})
+    if etag_matches(if_none_match, etag):
+        return not_modified(headers)
+    return RawJSONResponse(body, headers=headers)
@@ -0,0 +1,325 @@
+import json
+import logging
+import queue
+import select
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, NamedTuple, Optional
+from sqlalchemy.engine import make_url
+from app.core.bundle import bundle_cache
+from app.core.config import settings
+from app.core.jwks import jwks_cache
+from app.core.kid_cache import kid_cache
+from app.core.signing import signing_key_cache
+from app.core.version_cache import version_cache
+
+logger = logging.getLogger(__name__)
+
+class InvalidationEvent(NamedTuple):
+    """A committed write to a tenant, site or key pair, as seen by the caches"""
+    entity: str
+    action: str
+    id: str
+    tenant_id: Optional[str] = None
+    site_id: Optional[str] = None
+    kid: Optional[str] = None
+    domain: Optional[str] = None
+    # Current state, for indexes that track it rather than evict
+    status: Optional[str] = None
+    is_active: Optional[bool] = None
+
+def make_event(entity: str, action: str, obj: Any) -> InvalidationEvent:
+    """Build an event from an ORM object or a RETURNING row mapping"""
+    get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name, None)
+    as_str = lambda value: str(value) if value is not None else None
+    return InvalidationEvent(
+        entity=entity,
+        action=action,
+        id=str(get("id")),
+        tenant_id=as_str(get("tenant_id")),
+        site_id=as_str(get("site_id")),
+        kid=get("kid"),
+        domain=get("domain"),
+        status=get("status"),
+        is_active=get("is_active"),
+    )
+
+EventHandler = Callable[[InvalidationEvent], None]
+ResetHandler = Callable[[], None]
+
+class InvalidationBus:
+    """
+    Delivers invalidation events to the subscribers of this process only.
+
+    Used for tests and single-process runs, and as the base of the broker
+    backends, which deliver locally on publish and fan the event out to
+    every other worker.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+        self._reset_handlers: List[ResetHandler] = []
+        self._lock = threading.Lock()
+        self._counters = {"published": 0, "received": 0, "resets": 0, "errors": 0}
+
+    def subscribe(self, handler: EventHandler, on_reset: Optional[ResetHandler] = None) -> None:
+        """
+        Register ``handler`` for every event and ``on_reset`` for full flushes,
+        which happen whenever events may have been missed
+        """
+        self._handlers.append(handler)
+        if on_reset is not None:
+            self._reset_handlers.append(on_reset)
+
+    def publish(self, event: InvalidationEvent) -> None:
+        self._incr("published")
+        self._deliver(event)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.backend, **self._counters}
+
+    def _incr(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _deliver(self, event: InvalidationEvent) -> None:
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                self._incr("errors")
+                logger.exception("Invalidation handler failed for %s", event)
+
+    def _reset(self) -> None:
+        self._incr("resets")
+        for on_reset in self._reset_handlers:
+            try:
+                on_reset()
+            except Exception:
+                self._incr("errors")
+                logger.exception("Invalidation reset handler failed")
+
+class BrokerInvalidationBus(InvalidationBus, ABC):
+    """
+    Base for backends that fan events out through a broker.
+
+    Publishing delivers locally right away and queues the event for a sender
+    thread, so write paths never block on the broker. A listener thread
+    applies events from other processes and flushes every subscriber on each
+    (re)connect, since anything published while disconnected was lost.
+    """
+
+    def __init__(self, *, channel: str, reconnect_interval: float):
+        super().__init__()
+        self.channel = channel
+        self.reconnect_interval = reconnect_interval
+        self.origin = uuid.uuid4().hex
+        self.connected = False
+        self._outbox: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def publish(self, event: InvalidationEvent) -> None:
+        super().publish(event)
+        self._outbox.put(json.dumps({"origin": self.origin, **event._asdict()}))
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopped.clear()
+        for target, name in ((self._listen_forever, "listen"), (self._send_forever, "send")):
+            thread = threading.Thread(target=target, name=f"invalidation-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "channel": self.channel,
+            "connected": self.connected,
+            "outbox": self._outbox.qsize(),
+        }
+
+    def _receive(self, payload) -> None:
+        try:
+            data = json.loads(payload)
+            origin = data.pop("origin", None)
+            event = InvalidationEvent(**data)
+        except (TypeError, ValueError):
+            self._incr("errors")
+            logger.warning("Ignoring malformed invalidation payload %r", payload)
+            return
+        # Our own events were already delivered when they were published
+        if origin != self.origin:
+            self._incr("received")
+            self._deliver(event)
+
+    def _listen_forever(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                self._incr("errors")
+                logger.exception("Invalidation listener lost its connection")
+            self.connected = False
+            self._stopped.wait(self.reconnect_interval)
+
+    def _send_forever(self) -> None:
+        while True:
+            payload = self._outbox.get()
+            if payload is None:
+                return
+            while not self._stopped.is_set():
+                try:
+                    self._send(payload)
+                    break
+                except Exception:
+                    self._incr("errors")
+                    logger.exception("Failed to publish invalidation event")
+                    self._stopped.wait(self.reconnect_interval)
+
+    @abstractmethod
+    def _listen(self) -> None:
+        """Connect, subscribe, call ``_reset`` and feed payloads to ``_receive``"""
+
+    @abstractmethod
+    def _send(self, payload: str) -> None:
+        """Publish ``payload`` on the channel"""
+
+class RedisInvalidationBus(BrokerInvalidationBus):
+    """Fans events out over Redis pub/sub"""
+
+    backend = "redis"
+
+    def __init__(self, *, url: str, channel: str, reconnect_interval: float):
+        super().__init__(channel=channel, reconnect_interval=reconnect_interval)
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("INVALIDATION_BACKEND=redis requires the redis package") from exc
+        self._redis = redis
+        self.url = url
+        self._client = None
+
+    def _listen(self) -> None:
+        pubsub = self._redis.Redis.from_url(self.url).pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self.channel)
+            self.connected = True
+            self._reset()
+            while not self._stopped.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    self._receive(message["data"])
+        finally:
+            pubsub.close()
+
+    def _send(self, payload: str) -> None:
+        if self._client is None:
+            self._client = self._redis.Redis.from_url(self.url)
+        try:
+            self._client.publish(self.channel, payload)
+        except Exception:
+            self._client = None
+            raise
+
+class PostgresInvalidationBus(BrokerInvalidationBus):
+    """Fans events out with Postgres LISTEN/NOTIFY on dedicated connections"""
+
+    backend = "postgres"
+
+    def __init__(self, *, url: str, channel: str, reconnect_interval: float):
+        super().__init__(channel=channel, reconnect_interval=reconnect_interval)
+        # libpq does not understand SQLAlchemy driver suffixes such as +psycopg2
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+
+    def _connect(self):
+        import psycopg2
+
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    def _listen(self) -> None:
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            self.connected = True
+            self._reset()
+            while not self._stopped.is_set():
+                if select.select([connection], [], [], 1.0)[0]:
+                    connection.poll()
+                    while connection.notifies:
+                        self._receive(connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _send(self, payload: str) -> None:
+        if self._connection is None or self._connection.closed:
+            self._connection = self._connect()
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception:
+            self._connection.close()
+            raise
+
+def create_bus() -> InvalidationBus:
+    options = dict(
+        channel=settings.INVALIDATION_CHANNEL,
+        reconnect_interval=settings.INVALIDATION_RECONNECT_SECONDS,
+    )
+    if settings.INVALIDATION_BACKEND == "redis":
+        return RedisInvalidationBus(url=settings.INVALIDATION_REDIS_URL, **options)
+    if settings.INVALIDATION_BACKEND == "postgres":
+        return PostgresInvalidationBus(url=settings.DATABASE_URL, **options)
+    return InvalidationBus()
+
+def evict_cached(event: InvalidationEvent) -> None:
+    """Drop exactly the cache entries a write can have made stale"""
+    if event.entity == "rsa_key_pairs":
+        kid_cache.invalidate(event.kid)
+        version_cache.invalidate(event.entity, event.kid)
+        signing_key_cache.invalidate(event.kid)
+        jwks_cache.invalidate_key(event.tenant_id, event.site_id)
+        bundle_cache.invalidate(event.tenant_id)
+    elif event.entity == "sites":
+        version_cache.invalidate(event.entity, event.id)
+        jwks_cache.invalidate_site(event.id)
+        bundle_cache.invalidate(event.tenant_id)
+    elif event.entity == "tenants":
+        version_cache.invalidate(event.entity, event.id)
+        jwks_cache.invalidate_tenant(event.id)
+        bundle_cache.invalidate(event.id)
+
+def flush_caches() -> None:
+    kid_cache.clear()
+    version_cache.clear()
+    signing_key_cache.clear()
+    jwks_cache.clear()
+    bundle_cache.clear()
+
+invalidation_bus = create_bus()
+invalidation_bus.subscribe(evict_cached, on_reset=flush_caches)
+
+def publish(entity: str, action: str, obj: Any) -> None:
+    invalidation_bus.publish(make_event(entity, action, obj))
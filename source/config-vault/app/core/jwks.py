@@ -0,0 +1,142 @@
+import base64
+import json
+import threading
+from typing import Iterable, NamedTuple, Optional, Union
+from uuid import UUID
+from cryptography.hazmat.primitives import serialization
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.http_cache import make_etag
+
+class JWKSDocument(NamedTuple):
+    body: bytes
+    etag: str
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8 or 1, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def public_key_to_jwk(kid: str, public_key: str) -> dict:
+    """Convert a PEM encoded RSA public key to a JWK"""
+    numbers = serialization.load_pem_public_key(public_key.encode("utf-8")).public_numbers()
+    return {
+        "kty": "RSA",
+        "use": "sig",
+        "alg": "RS256",
+        "kid": kid,
+        "n": _b64url_uint(numbers.n),
+        "e": _b64url_uint(numbers.e),
+    }
+
+class JWKSCache:
+    """
+    In-process cache of serialized JWKS documents per tenant and per site.
+
+    Documents are keyed by ``("tenant", id)`` or ``("site", id)`` and dropped
+    by the CRUD write paths whenever a key of that tenant or site changes.
+    The JWK of each key is computed once and memoized by kid.
+
+    Every invalidation takes the next value of a counter and records it for
+    its document. A document built from rows read before an invalidation of
+    that same tenant or site, taken as ``generation`` before the read, is
+    returned but not cached, so a revoked key is never served from the cache.
+    Other tenants and sites keep caching meanwhile. Once invalidations are
+    dropped from that bounded record, documents of tenants and sites without
+    one are checked against the newest dropped invalidation instead.
+    """
+
+    # Invalidations are remembered this long, far longer than reading the key pairs of a document takes
+    INVALIDATION_WINDOW_SECONDS = 60
+
+    def __init__(self, *, max_documents: int, max_keys: int, ttl: Optional[float]):
+        self.documents = TTLCache(max_size=max_documents, ttl=ttl)
+        self.jwks = TTLCache(max_size=max_keys)
+        self._invalidated = TTLCache(
+            max_size=max_documents, ttl=self.INVALIDATION_WINDOW_SECONDS, on_evict=self._forget
+        )
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._cleared = 0
+        # Newest invalidation dropped from ``_invalidated``
+        self._forgotten = 0
+
+    @property
+    def generation(self) -> int:
+        """Token to take before reading the key pairs of a document"""
+        return self._generation
+
+    def get(self, scope: str, id: Union[UUID, str]) -> Optional[JWKSDocument]:
+        return self.documents.get((scope, str(id)))
+
+    def build(
+        self,
+        scope: str,
+        id: Union[UUID, str],
+        key_pairs: Iterable,
+        generation: Optional[int] = None,
+    ) -> JWKSDocument:
+        """
+        Build and return the JWKS document for a set of key pairs, caching it
+        unless its tenant or site was invalidated after ``generation``
+        """
+        keys = []
+        for key_pair in sorted(key_pairs, key=lambda key_pair: key_pair.kid):
+            jwk = self.jwks.get(key_pair.kid)
+            if jwk is None:
+                jwk = public_key_to_jwk(key_pair.kid, key_pair.public_key)
+                self.jwks.set(key_pair.kid, jwk)
+            keys.append(jwk)
+        body = json.dumps({"keys": keys}, separators=(",", ":")).encode("utf-8")
+        document = JWKSDocument(body=body, etag=make_etag(body))
+        key = (scope, str(id))
+        with self._lock:
+            stale = generation is not None and (
+                generation < self._cleared or self._invalidated.get(key, self._forgotten) > generation
+            )
+            if not stale:
+                self.documents.set(key, document)
+        return document
+
+    def _forget(self, key: tuple, generation: int) -> None:
+        self._forgotten = max(self._forgotten, generation)
+
+    def _invalidate(self, scope: str, id: Union[UUID, str]) -> None:
+        key = (scope, str(id))
+        with self._lock:
+            self._generation += 1
+            self._invalidated.set(key, self._generation)
+            self.documents.pop(key)
+
+    def invalidate_tenant(self, tenant_id: Union[UUID, str]) -> None:
+        self._invalidate("tenant", tenant_id)
+
+    def invalidate_site(self, site_id: Union[UUID, str]) -> None:
+        self._invalidate("site", site_id)
+
+    def invalidate_key(
+        self,
+        tenant_id: Union[UUID, str],
+        site_id: Optional[Union[UUID, str]] = None,
+    ) -> None:
+        """Drop the documents a key pair appears in"""
+        self.invalidate_tenant(tenant_id)
+        if site_id:
+            self.invalidate_site(site_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            # Builds in progress read their rows before the clear
+            self._generation += 1
+            self._cleared = self._generation
+            self._invalidated.clear()
+            self.documents.clear()
+            self.jwks.clear()
+
+    def stats(self) -> dict:
+        return {"documents": self.documents.stats(), "keys": self.jwks.stats()}
+
+jwks_cache = JWKSCache(
+    max_documents=settings.JWKS_CACHE_MAX_DOCUMENTS,
+    max_keys=settings.JWKS_CACHE_MAX_KEYS,
+    ttl=settings.JWKS_CACHE_TTL_SECONDS,
+)
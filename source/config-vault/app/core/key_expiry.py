@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+from typing import Optional
+from app import crud
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+class KeyExpirySweeper:
+    """
+    Background thread that moves active key pairs past ``expires_at`` to
+    ``expired`` in batches of ``batch_size``, one UPDATE per batch.
+
+    Every worker may run a sweeper: batches skip rows locked by another
+    worker, and a key is only ever expired once.
+    """
+
+    def __init__(self, *, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._runs = 0
+        self._expired = 0
+        self._errors = 0
+        self._last_run_at: Optional[float] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="rsa-key-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def sweep(self) -> int:
+        """Expire every due key pair now, returning how many were expired"""
+        expired = 0
+        with SessionLocal() as db:
+            while not self._stopped.is_set():
+                batch = crud.rsa_key_pair.expire_due(db, limit=self.batch_size)
+                expired += len(batch)
+                if len(batch) < self.batch_size:
+                    break
+        self._runs += 1
+        self._expired += expired
+        self._last_run_at = time.time()
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "batch_size": self.batch_size,
+            "runs": self._runs,
+            "expired": self._expired,
+            "errors": self._errors,
+            "last_run_at": self._last_run_at,
+        }
+
+    def _run(self) -> None:
+        # The first sweep waits one interval so startup never touches the database
+        while not self._stopped.wait(self.interval):
+            try:
+                expired = self.sweep()
+                if expired:
+                    logger.info("Expired %d RSA key pairs", expired)
+            except Exception:
+                self._errors += 1
+                logger.exception("RSA key expiry sweep failed")
+
+key_expiry_sweeper = KeyExpirySweeper(
+    interval=settings.KEY_EXPIRY_SWEEP_INTERVAL_SECONDS,
+    batch_size=settings.KEY_EXPIRY_SWEEP_BATCH_SIZE,
+)
@@ -1,19 +1,97 @@
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
+import asyncio
+import multiprocessing
+import os
 import secrets
 import string
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from app.core.config import settings
+from app.core.metrics import KEY_GENERATION_SECONDS, KEY_SERIALIZATION_SECONDS
+
+_executor: Optional[Executor] = None
+_refill_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+def lower_priority() -> None:
+    # Background key generation yields the CPU to request handling and interactive key generation
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+def create_executor(workers: Optional[int], name: str, *, background: bool = False) -> Executor:
+    if settings.KEY_GENERATION_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+    # spawn keeps workers from inheriting the server's threads and sockets
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=lower_priority if background else None,
+    )
+
+def get_executor() -> Executor:
+    """Return the executor dedicated to key generation, creating it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_executor(settings.KEY_GENERATION_WORKERS, "rsa-keygen")
+    return _executor
+
+def get_refill_executor() -> Executor:
+    """
+    Return the executor refilling the key pool, creating it on first use. It is
+    separate from the key generation executor, so refills never queue ahead of
+    keys generated for requests, and its processes run at a lower priority.
+    """
+    global _refill_executor
+    if _refill_executor is None:
+        with _executor_lock:
+            if _refill_executor is None:
+                _refill_executor = create_executor(settings.KEY_POOL_REFILL_WORKERS, "rsa-key-pool", background=True)
+    return _refill_executor
+
+def shutdown_executor() -> None:
+    """Shut down the key generation executors that were started"""
+    global _executor, _refill_executor
+    with _executor_lock:
+        for executor in (_executor, _refill_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _executor = _refill_executor = None
+
+class TimedKeyPair(NamedTuple):
+    """A key pair with the time each step took, measured where it was generated"""
+    private_key: str
+    public_key: str
+    generation_seconds: float
+    serialization_seconds: float
+
+def observe_key_pair(key_size: int, timed: TimedKeyPair) -> tuple[str, str]:
+    """
+    Record the timings of a key pair in this process's metrics and return
+    (private_key, public_key). Executor workers run in other processes, so
+    their timings are recorded here rather than in the worker.
+    """
+    KEY_GENERATION_SECONDS.labels(key_size).observe(timed.generation_seconds)
+    KEY_SERIALIZATION_SECONDS.observe(timed.serialization_seconds)
+    return timed.private_key, timed.public_key
 
 class KeyGenerationService:
     @staticmethod
-    def generate_rsa_key_pair(key_size: int = 2048) -> tuple[str, str]:
-        """Generate RSA key pair and return (private_key, public_key) as PEM strings"""
+    def generate_timed_key_pair(key_size: int = 2048) -> TimedKeyPair:
+        """Generate an RSA key pair as PEM strings, timing generation and serialization"""
+        started = time.perf_counter()
         private_key = rsa.generate_private_key(
             public_exponent=65537,
             key_size=key_size,
             backend=default_backend()
         )
+        generated = time.perf_counter()
         
         public_key = private_key.public_key()
         
@@ -30,7 +108,21 @@ class KeyGenerationService:
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ).decode('utf-8')
         
-        return private_pem, public_pem
+        return TimedKeyPair(private_pem, public_pem, generated - started, time.perf_counter() - generated)
+    
+    @staticmethod
+    def generate_rsa_key_pair(key_size: int = 2048) -> tuple[str, str]:
+        """Generate RSA key pair and return (private_key, public_key) as PEM strings"""
+        return observe_key_pair(key_size, KeyGenerationService.generate_timed_key_pair(key_size))
+    
+    @staticmethod
+    async def generate_rsa_key_pair_async(key_size: int = 2048) -> tuple[str, str]:
+        """Generate and serialize an RSA key pair on the key generation executor"""
+        loop = asyncio.get_running_loop()
+        timed = await loop.run_in_executor(
+            get_executor(), KeyGenerationService.generate_timed_key_pair, key_size
+        )
+        return observe_key_pair(key_size, timed)
     
     @staticmethod
     def generate_kid() -> str:
@@ -0,0 +1,187 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import as_completed
+from typing import Deque, Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+from app.core.key_generation import KeyGenerationService, get_refill_executor, observe_key_pair
+
+logger = logging.getLogger(__name__)
+
+class KeyPoolExhausted(Exception):
+    """Raised when the pool is empty and on-demand generation is disabled"""
+
+class KeyPool:
+    """
+    Bounded reserve of pre-generated RSA key pairs per key size.
+
+    A background thread tops each reserve up to the high watermark whenever it
+    drops below the low watermark, generating at most ``refill_batch_size``
+    keys per key size every ``refill_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        key_sizes: Iterable[int],
+        low_watermark: int,
+        high_watermark: int,
+        refill_batch_size: int,
+        refill_interval: float,
+        fallback_to_on_demand: bool = True,
+    ):
+        self.key_sizes = tuple(key_sizes)
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.refill_batch_size = refill_batch_size
+        self.refill_interval = refill_interval
+        self.fallback_to_on_demand = fallback_to_on_demand
+        self._reserves: Dict[int, Deque[Tuple[str, str]]] = {
+            size: deque() for size in self.key_sizes
+        }
+        self._counters: Dict[int, Dict[str, int]] = {
+            size: {"hits": 0, "misses": 0, "generated": 0, "failed": 0} for size in self.key_sizes
+        }
+        self._on_demand = 0
+        self._exhausted = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background refill thread"""
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="rsa-key-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refill thread"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def acquire(self, key_size: int) -> Optional[Tuple[str, str]]:
+        """Pop a pre-generated (private_key, public_key) pair, or None on a miss"""
+        reserve = self._reserves.get(key_size)
+        if reserve is None:
+            return None
+        try:
+            key_pair = reserve.popleft()
+        except IndexError:
+            key_pair = None
+        with self._lock:
+            self._counters[key_size]["hits" if key_pair else "misses"] += 1
+        if len(reserve) < self.low_watermark:
+            self._wakeup.set()
+        return key_pair
+
+    def get(self, key_size: int) -> Tuple[str, str]:
+        """Return a key pair from the pool, generating one on demand on a miss"""
+        key_pair = self._take(key_size)
+        if key_pair is not None:
+            return key_pair
+        return KeyGenerationService.generate_rsa_key_pair(key_size)
+
+    async def get_async(self, key_size: int) -> Tuple[str, str]:
+        """Like ``get``, but on-demand generation runs on the key generation executor"""
+        key_pair = self._take(key_size)
+        if key_pair is not None:
+            return key_pair
+        return await KeyGenerationService.generate_rsa_key_pair_async(key_size)
+
+    def _take(self, key_size: int) -> Optional[Tuple[str, str]]:
+        key_pair = self.acquire(key_size)
+        if key_pair is not None:
+            return key_pair
+        if self.running and key_size in self._reserves and not self.fallback_to_on_demand:
+            with self._lock:
+                self._exhausted += 1
+            raise KeyPoolExhausted(f"No pre-generated {key_size}-bit keys available")
+        with self._lock:
+            self._on_demand += 1
+        return None
+
+    def fill(self, key_size: int, count: int) -> int:
+        """Generate up to ``count`` keys into the reserve without passing the high watermark"""
+        reserve = self._reserves[key_size]
+        count = min(count, self.high_watermark - len(reserve))
+        if count <= 0 or self._stopped.is_set():
+            return 0
+        executor = get_refill_executor()
+        futures = [
+            executor.submit(KeyGenerationService.generate_timed_key_pair, key_size)
+            for _ in range(count)
+        ]
+        generated = failed = 0
+        # Keys that did finish are kept when others fail
+        for future in as_completed(futures):
+            try:
+                reserve.append(observe_key_pair(key_size, future.result()))
+            except Exception:
+                failed += 1
+                logger.exception("Failed to generate a %s-bit key for the pool", key_size)
+                continue
+            generated += 1
+        with self._lock:
+            self._counters[key_size]["generated"] += generated
+            self._counters[key_size]["failed"] += failed
+        return generated
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.running,
+                "low_watermark": self.low_watermark,
+                "high_watermark": self.high_watermark,
+                "refill_batch_size": self.refill_batch_size,
+                "refill_interval_seconds": self.refill_interval,
+                "fallback_to_on_demand": self.fallback_to_on_demand,
+                "on_demand": self._on_demand,
+                "exhausted": self._exhausted,
+                "pools": {
+                    str(size): {"depth": len(self._reserves[size]), **self._counters[size]}
+                    for size in self.key_sizes
+                },
+            }
+
+    def _needs_refill(self) -> bool:
+        return any(len(reserve) < self.low_watermark for reserve in self._reserves.values())
+
+    def _run(self) -> None:
+        refilling = set()
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            for size, reserve in self._reserves.items():
+                # Hysteresis: start below the low watermark, keep going until the high one
+                if len(reserve) < self.low_watermark:
+                    refilling.add(size)
+                if size not in refilling:
+                    continue
+                try:
+                    self.fill(size, self.refill_batch_size)
+                except Exception:
+                    logger.exception("Failed to refill %s-bit key pool", size)
+                if len(reserve) >= self.high_watermark:
+                    refilling.discard(size)
+            if not refilling and not self._needs_refill():
+                self._wakeup.wait()
+            else:
+                self._wakeup.wait(self.refill_interval)
+
+key_pool = KeyPool(
+    key_sizes=settings.KEY_POOL_KEY_SIZES,
+    low_watermark=settings.KEY_POOL_LOW_WATERMARK,
+    high_watermark=settings.KEY_POOL_HIGH_WATERMARK,
+    refill_batch_size=settings.KEY_POOL_REFILL_BATCH_SIZE,
+    refill_interval=settings.KEY_POOL_REFILL_INTERVAL_SECONDS,
+    fallback_to_on_demand=settings.KEY_POOL_FALLBACK_TO_ON_DEMAND,
+)
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy.orm import Session
+from app import crud
+from app.core.config import settings
+from app.core.key_generation import KeyGenerationService, create_executor, observe_key_pair
+from app.db.session import SessionLocal
+from app.models.rsa_key_pair import RSAKeyPair
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Token bucket allowing ``per_minute`` operations with bursts of up to
+    ``burst``. It is kept in memory, so it limits one process only.
+    """
+
+    def __init__(self, *, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def available(self) -> int:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return int(self._tokens)
+
+    def consume(self, count: int = 1) -> None:
+        self._tokens -= count
+
+class KeyRotationScheduler:
+    """
+    Background thread that rotates key pairs ahead of their expiry.
+
+    Each active key pair is given a ``rotate_at`` of ``expires_at`` minus the
+    lead time minus a per-kid jitter, so keys created together do not all
+    rotate together. Keys living shorter than that rotate halfway through
+    their lifetime, so their successors do not rotate again right away.
+
+    Due keys get a successor with the same owner, key size and lifetime.
+    Both keys are served until the old one is retired after the overlap
+    window. Successors are generated one at a time on a dedicated
+    low-priority executor of the KEY_GENERATION_EXECUTOR kind, under a rate
+    limit per worker.
+
+    Every worker may run a scheduler: due keys are claimed before their
+    successors are generated, so each key is rotated by one worker only.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float,
+        lead: float,
+        jitter: float,
+        overlap: float,
+        batch_size: int,
+        max_per_minute: float,
+        claim: float,
+        workers: int,
+    ):
+        self.interval = interval
+        self.lead = timedelta(seconds=lead)
+        self.jitter = jitter
+        self.overlap = timedelta(seconds=overlap)
+        self.batch_size = batch_size
+        self.claim = timedelta(seconds=claim)
+        self.workers = workers
+        self.limiter = RateLimiter(per_minute=max_per_minute, burst=batch_size)
+        self._counters = {"runs": 0, "scheduled": 0, "rotated": 0, "conflicts": 0, "retired": 0, "errors": 0}
+        self._executor: Optional[Executor] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="rsa-key-rotation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def jitter_for(self, kid: str) -> timedelta:
+        """Stable offset in [0, jitter) derived from the kid"""
+        fraction = int.from_bytes(hashlib.sha256(kid.encode("utf-8")).digest()[:8], "big") / 2**64
+        return timedelta(seconds=fraction * self.jitter)
+
+    def rotate_at(self, kid: str, created_at: datetime, expires_at: datetime) -> datetime:
+        lead = self.lead + self.jitter_for(kid)
+        if created_at is not None:
+            lead = min(lead, (expires_at - created_at) / 2)
+        return expires_at - lead
+
+    def schedule(self, db: Session) -> int:
+        """Give unscheduled key pairs a rotation time"""
+        rows = crud.rsa_key_pair.get_unscheduled(db, limit=500)
+        crud.rsa_key_pair.set_rotate_at(db, schedule=[
+            {"key_id": row.id, "rotate_at": self.rotate_at(row.kid, row.created_at, row.expires_at)}
+            for row in rows
+        ])
+        return len(rows)
+
+    def rotate_due(self, db: Session) -> int:
+        """Claim and rotate as many due key pairs as the rate limit allows"""
+        allowed = min(self.batch_size, self.limiter.available())
+        if not allowed:
+            return 0
+        rotated = 0
+        for key_pair in crud.rsa_key_pair.claim_due_rotations(db, limit=allowed, lease=self.claim):
+            if self._stopped.is_set():
+                break
+            self.limiter.consume()
+            private_key, public_key = self._generate(key_size_of(key_pair))
+            successor = crud.rsa_key_pair.rotate(
+                db,
+                key_pair=key_pair,
+                successor_in=successor_data(key_pair, private_key, public_key),
+                retire_at=datetime.now(timezone.utc) + self.overlap,
+            )
+            if successor is None:
+                self._counters["conflicts"] += 1
+            else:
+                rotated += 1
+        return rotated
+
+    def run_once(self) -> None:
+        with SessionLocal() as db:
+            self._counters["scheduled"] += self.schedule(db)
+            self._counters["rotated"] += self.rotate_due(db)
+            self._counters["retired"] += len(crud.rsa_key_pair.retire_due(db, limit=500))
+        self._counters["runs"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "lead_seconds": self.lead.total_seconds(),
+            "jitter_seconds": self.jitter,
+            "overlap_seconds": self.overlap.total_seconds(),
+            "batch_size": self.batch_size,
+            "max_per_minute": self.limiter.rate * 60,
+            "claim_seconds": self.claim.total_seconds(),
+            **self._counters,
+        }
+
+    def _generate(self, key_size: int):
+        if self._executor is None:
+            self._executor = create_executor(self.workers, "rsa-key-rotation", background=True)
+        timed = self._executor.submit(KeyGenerationService.generate_timed_key_pair, key_size).result()
+        return observe_key_pair(key_size, timed)
+
+    def _run(self) -> None:
+        # The first run waits one interval so startup never touches the database
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self._counters["errors"] += 1
+                logger.exception("RSA key rotation failed")
+
+def key_size_of(key_pair: RSAKeyPair) -> int:
+    return serialization.load_pem_public_key(key_pair.public_key.encode("utf-8")).key_size
+
+def successor_data(key_pair: RSAKeyPair, private_key: str, public_key: str) -> dict:
+    """Row for a successor with the same owner and lifetime as ``key_pair``"""
+    expires_at = None
+    if key_pair.expires_at is not None and key_pair.created_at is not None:
+        expires_at = datetime.now(timezone.utc) + (key_pair.expires_at - key_pair.created_at)
+    return {
+        "kid": KeyGenerationService.generate_kid(),
+        "private_key": private_key,
+        "public_key": public_key,
+        "tenant_id": key_pair.tenant_id,
+        "site_id": key_pair.site_id,
+        "status": "active",
+        "expires_at": expires_at,
+    }
+
+key_rotation_scheduler = KeyRotationScheduler(
+    interval=settings.KEY_ROTATION_INTERVAL_SECONDS,
+    lead=settings.KEY_ROTATION_LEAD_SECONDS,
+    jitter=settings.KEY_ROTATION_JITTER_SECONDS,
+    overlap=settings.KEY_ROTATION_OVERLAP_SECONDS,
+    batch_size=settings.KEY_ROTATION_BATCH_SIZE,
+    max_per_minute=settings.KEY_ROTATION_MAX_PER_MINUTE,
+    claim=settings.KEY_ROTATION_CLAIM_SECONDS,
+    workers=settings.KEY_ROTATION_WORKERS,
+)
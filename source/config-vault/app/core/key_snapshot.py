@@ -0,0 +1,455 @@
+import array
+import bisect
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+from app import crud
+from app.core.config import settings
+from app.core.invalidation import InvalidationEvent, invalidation_bus
+from app.core.kid_cache import kid_cache
+from app.db.session import SessionLocal
+from app.db.types import der_to_pem, key_to_der
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CVKS"
+FORMAT_VERSION = 2
+# Magic, format version, key count, site index size, build time (wall clock),
+# then the offsets of the kid hashes, records, tenant index, site index and blob
+HEADER = struct.Struct("<4sHxxIId7Q")
+# id, tenant_id, site_id and successor_id, flags, then where the kid, the DER
+# public key and the timestamps of the key pair are in the blob
+RECORD = struct.Struct("<16s16s16s16sBQHHH")
+HAS_SITE = 1
+HAS_SUCCESSOR = 2
+# Stored as ISO strings, so they read back exactly as the database returned them
+TIMESTAMPS = ("expires_at", "rotate_at", "retire_at", "created_at", "updated_at")
+
+def kid_hash(kid: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(kid, digest_size=8).digest(), "little")
+
+def id_prefix(id: bytes) -> int:
+    return int.from_bytes(id[:8], "big")
+
+def pad(position: int) -> int:
+    return -position % 8
+
+def write_snapshot(path: str, rows: Iterable[Any], built_at: float) -> int:
+    """
+    Write the active key pair ``rows``, in (created_at, id) order, to a new
+    snapshot file and rename it over ``path``, so readers only ever see
+    complete files. Returns the number of keys written.
+
+    Kids, public keys and timestamps are streamed to a spool file as rows
+    arrive; only the fixed-size records are kept to be sorted.
+    """
+    hashes = array.array("Q")
+    records = bytearray()
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory, prefix=".keys-blob-") as blob:
+        blob_size = 0
+        for row in rows:
+            kid = row.kid.encode()
+            der = key_to_der(row.public_key, "PUBLIC KEY")
+            times = ",".join(
+                getattr(row, name).isoformat() if getattr(row, name) is not None else "" for name in TIMESTAMPS
+            ).encode("ascii")
+            flags = HAS_SITE if row.site_id is not None else 0
+            flags |= HAS_SUCCESSOR if row.successor_id is not None else 0
+            hashes.append(kid_hash(kid))
+            records += RECORD.pack(
+                row.id.bytes,
+                row.tenant_id.bytes,
+                row.site_id.bytes if row.site_id is not None else bytes(16),
+                row.successor_id.bytes if row.successor_id is not None else bytes(16),
+                flags, blob_size, len(kid), len(der), len(times),
+            )
+            blob.write(kid + der + times)
+            blob_size += len(kid) + len(der) + len(times)
+        count = len(hashes)
+
+        # Records in kid hash order, for lookups by kid. The sorts are stable,
+        # so the owner indexes keep the (created_at, id) order of the rows,
+        # the order listings are served in.
+        order = sorted(range(count), key=hashes.__getitem__)
+        position = array.array("I", bytes(4 * count))
+        for sorted_index, index in enumerate(order):
+            position[index] = sorted_index
+        view = memoryview(records)
+
+        def owner(index: int, field: int) -> bytes:
+            start = index * RECORD.size + 16 * field
+            return bytes(view[start:start + 16])
+
+        by_tenant = sorted(range(count), key=lambda index: owner(index, 1))
+        by_site = sorted(
+            (index for index in range(count) if view[index * RECORD.size + 64] & HAS_SITE),
+            key=lambda index: owner(index, 2),
+        )
+        sections = [
+            array.array("Q", (hashes[index] for index in order)).tobytes(),
+            (view[index * RECORD.size:(index + 1) * RECORD.size] for index in order),
+            array.array("Q", (id_prefix(owner(index, 1)) for index in by_tenant)).tobytes(),
+            array.array("I", (position[index] for index in by_tenant)).tobytes(),
+            array.array("Q", (id_prefix(owner(index, 2)) for index in by_site)).tobytes(),
+            array.array("I", (position[index] for index in by_site)).tobytes(),
+            blob,
+        ]
+        sizes = [8 * count, RECORD.size * count, 8 * count, 4 * count, 8 * len(by_site), 4 * len(by_site), blob_size]
+
+        offsets = []
+        offset = HEADER.size
+        for size in sizes:
+            offset += pad(offset)
+            offsets.append(offset)
+            offset += size
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".keys-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                # Public keys only, readable by workers running as other users
+                os.fchmod(file.fileno(), 0o644)
+                file.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, len(by_site), built_at, *offsets))
+                for offset, section in zip(offsets, sections):
+                    file.write(bytes(offset - file.tell()))
+                    if section is blob:
+                        blob.seek(0)
+                        shutil.copyfileobj(blob, file)
+                    elif isinstance(section, bytes):
+                        file.write(section)
+                    else:
+                        file.writelines(section)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    return count
+
+class KeySnapshot:
+    """
+    A snapshot file mapped read-only. Lookups binary search the indexes in
+    place and only decode the key pairs they return, so every worker of a
+    node shares the same pages of the file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, version, count, site_count, built_at, *offsets = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} key snapshot")
+        self.count = count
+        self.built_at = built_at
+        hashes, self._records, tenant_keys, tenant_records, site_keys, site_records, self._blob = offsets
+        view = memoryview(self._map)
+        self._hashes = view[hashes:hashes + 8 * count].cast("Q")
+        self._tenant_keys = view[tenant_keys:tenant_keys + 8 * count].cast("Q")
+        self._tenant_records = view[tenant_records:tenant_records + 4 * count].cast("I")
+        self._site_keys = view[site_keys:site_keys + 8 * site_count].cast("Q")
+        self._site_records = view[site_records:site_records + 4 * site_count].cast("I")
+
+    @property
+    def size(self) -> int:
+        return len(self._map)
+
+    def _record(self, index: int) -> Tuple:
+        return RECORD.unpack_from(self._map, self._records + index * RECORD.size)
+
+    def _kid(self, record: Tuple) -> bytes:
+        start = self._blob + record[5]
+        return self._map[start:start + record[6]]
+
+    def _row(self, record: Tuple) -> Dict[str, Any]:
+        id, tenant_id, site_id, successor_id, flags, offset, kid_length, der_length, times_length = record
+        start = self._blob + offset
+        der_start = start + kid_length
+        times_start = der_start + der_length
+        times = self._map[times_start:times_start + times_length].decode("ascii").split(",")
+        timestamps = {name: datetime.fromisoformat(value) if value else None for name, value in zip(TIMESTAMPS, times)}
+        return {
+            "id": UUID(bytes=id),
+            "kid": self._map[start:der_start].decode(),
+            "public_key": der_to_pem(self._map[der_start:times_start], "PUBLIC KEY"),
+            "tenant_id": UUID(bytes=tenant_id),
+            "site_id": UUID(bytes=site_id) if flags & HAS_SITE else None,
+            "status": "active",
+            "expires_at": timestamps["expires_at"],
+            "rotate_at": timestamps["rotate_at"],
+            "successor_id": UUID(bytes=successor_id) if flags & HAS_SUCCESSOR else None,
+            "retire_at": timestamps["retire_at"],
+            "created_at": timestamps["created_at"],
+            "updated_at": timestamps["updated_at"],
+        }
+
+    def find(self, kid: str) -> Optional[Dict[str, Any]]:
+        """The active key pair with ``kid``, or None if it was not active when the snapshot was built"""
+        key = kid.encode()
+        hash = kid_hash(key)
+        index = bisect.bisect_left(self._hashes, hash)
+        while index < self.count and self._hashes[index] == hash:
+            record = self._record(index)
+            if self._kid(record) == key:
+                return self._row(record)
+            index += 1
+        return None
+
+    def _owned_by(self, keys: memoryview, records: memoryview, field: int, owner: UUID) -> List[Dict[str, Any]]:
+        prefix = id_prefix(owner.bytes)
+        index = bisect.bisect_left(keys, prefix)
+        rows = []
+        while index < len(keys) and keys[index] == prefix:
+            record = self._record(records[index])
+            if record[field] == owner.bytes:
+                rows.append(self._row(record))
+            index += 1
+        return rows
+
+    def by_tenant(self, tenant_id: UUID) -> List[Dict[str, Any]]:
+        return self._owned_by(self._tenant_keys, self._tenant_records, 1, tenant_id)
+
+    def by_site(self, site_id: UUID) -> List[Dict[str, Any]]:
+        return self._owned_by(self._site_keys, self._site_records, 2, site_id)
+
+class SharedKeySnapshot:
+    """
+    Active public keys shared by the workers of a node through a memory
+    mapped snapshot file, instead of a copy in every worker.
+
+    The worker holding a lock next to the file rebuilds it from the database
+    after key changes, at most every ``rebuild_interval``, and at least every
+    ``max_age``, replacing the file atomically. Every worker polls the path
+    and maps new files, while requests still reading the old mapping finish
+    on it.
+
+    Keys, tenants and sites with invalidation events since a snapshot was
+    built are read from the database until a newer snapshot covers them. A
+    broker reconnect, after which events may have been missed, sets every
+    older snapshot aside. Changes made by other workers only arrive through
+    a broker, so it does not start with the memory invalidation backend.
+    """
+
+    def __init__(self, *, path: str, poll_interval: float, rebuild_interval: float, max_age: float, batch_size: int):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self._snapshot: Optional[KeySnapshot] = None
+        self._lock = threading.Lock()
+        # Wall clock time of the last event seen for each kid, tenant and site
+        self._changed_kids: Dict[str, float] = {}
+        self._changed_tenants: Dict[str, float] = {}
+        self._changed_sites: Dict[str, float] = {}
+        self._last_change = 0.0
+        self._stale_before = 0.0
+        self._builder_lock = None
+        self._hits = 0
+        self._fallbacks = 0
+        self._maps = 0
+        self._builds = 0
+        self._build_failures = 0
+        self._build_seconds: Optional[float] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _current(self) -> Optional[KeySnapshot]:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.built_at < self._stale_before:
+            return None
+        return snapshot
+
+    @staticmethod
+    def _changed(changes: Dict[str, float], key: Any, snapshot: KeySnapshot) -> bool:
+        changed_at = changes.get(str(key))
+        return changed_at is not None and changed_at >= snapshot.built_at
+
+    def get(self, kid: str) -> Optional[Dict[str, Any]]:
+        """The key pair if the snapshot knows it to be active, otherwise None"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        row = None if self._changed(self._changed_kids, kid, snapshot) else snapshot.find(kid)
+        if row is None:
+            self._fallbacks += 1
+        else:
+            self._hits += 1
+        return row
+
+    def _active_by(self, changes: Dict[str, float], owner: UUID, lookup: Callable) -> Optional[List[Dict[str, Any]]]:
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        if self._changed(changes, owner, snapshot):
+            self._fallbacks += 1
+            return None
+        self._hits += 1
+        return lookup(snapshot, owner)
+
+    def active_by_tenant(self, tenant_id: UUID) -> Optional[List[Dict[str, Any]]]:
+        """Active key pairs of a tenant, or None when they must be read from the database"""
+        return self._active_by(self._changed_tenants, tenant_id, KeySnapshot.by_tenant)
+
+    def active_by_site(self, site_id: UUID) -> Optional[List[Dict[str, Any]]]:
+        return self._active_by(self._changed_sites, site_id, KeySnapshot.by_site)
+
+    def apply(self, event: InvalidationEvent) -> None:
+        if event.entity != "rsa_key_pairs":
+            return
+        now = time.time()
+        with self._lock:
+            self._changed_kids[event.kid] = now
+            self._changed_tenants[event.tenant_id] = now
+            if event.site_id is not None:
+                self._changed_sites[event.site_id] = now
+            self._last_change = now
+
+    def reset(self) -> None:
+        now = time.time()
+        with self._lock:
+            self._stale_before = now
+            self._last_change = now
+
+    def refresh(self) -> None:
+        """Map the snapshot file if it changed since it was last mapped"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.identity == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return
+        snapshot = KeySnapshot(self.path)
+        with self._lock:
+            # Changes older than the new snapshot are in it
+            for changes in (self._changed_kids, self._changed_tenants, self._changed_sites):
+                for key in [key for key, changed_at in changes.items() if changed_at < snapshot.built_at]:
+                    del changes[key]
+            self._snapshot = snapshot
+        self._maps += 1
+
+    def build(self) -> int:
+        """Write a new snapshot of every active key, returning how many it holds"""
+        started = time.perf_counter()
+        # Taken before reading, so events racing the read count as newer
+        built_at = time.time()
+        try:
+            with SessionLocal() as db:
+                count = write_snapshot(
+                    self.path,
+                    chain.from_iterable(crud.rsa_key_pair.stream_active_public_keys(db, batch_size=self.batch_size)),
+                    built_at,
+                )
+        except Exception:
+            self._build_failures += 1
+            raise
+        self._builds += 1
+        self._build_seconds = time.perf_counter() - started
+        self.refresh()
+        return count
+
+    def _is_builder(self) -> bool:
+        """Take the builder lock of the node if no other worker holds it"""
+        if self._builder_lock is None:
+            lock = open(f"{self.path}.lock", "a")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                return False
+            self._builder_lock = lock
+        return True
+
+    def _build_due(self) -> bool:
+        snapshot = self._current()
+        if snapshot is None:
+            return True
+        age = time.time() - snapshot.built_at
+        return age >= self.max_age or (self._last_change >= snapshot.built_at and age >= self.rebuild_interval)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        # Other workers' writes only reach this one through a broker
+        if invalidation_bus.backend == "memory":
+            raise RuntimeError(
+                "KEY_SNAPSHOT_ENABLED requires INVALIDATION_BACKEND=redis or postgres, so every "
+                "worker sees the key changes of the others"
+            )
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="key-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._builder_lock is not None:
+            self._builder_lock.close()
+            self._builder_lock = None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "mapped": snapshot is not None,
+            "usable": self._current() is not None,
+            "keys": snapshot.count if snapshot is not None else 0,
+            "size_bytes": snapshot.size if snapshot is not None else 0,
+            "age_seconds": time.time() - snapshot.built_at if snapshot is not None else None,
+            "builder": self._builder_lock is not None,
+            "changed_kids": len(self._changed_kids),
+            "hits": self._hits,
+            "fallbacks": self._fallbacks,
+            "maps": self._maps,
+            "builds": self._builds,
+            "build_failures": self._build_failures,
+            "last_build_seconds": self._build_seconds,
+        }
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+                if self._is_builder() and self._build_due():
+                    self.build()
+            except Exception:
+                logger.exception("Refreshing the RSA key snapshot failed")
+            self._stopped.wait(self.poll_interval)
+
+key_snapshot = SharedKeySnapshot(
+    path=settings.KEY_SNAPSHOT_PATH or os.path.join(tempfile.gettempdir(), "config-vault-keys.snapshot"),
+    poll_interval=settings.KEY_SNAPSHOT_POLL_SECONDS,
+    rebuild_interval=settings.KEY_SNAPSHOT_REBUILD_SECONDS,
+    max_age=settings.KEY_SNAPSHOT_MAX_AGE_SECONDS,
+    batch_size=settings.KEY_SNAPSHOT_BATCH_SIZE,
+)
+# Workers that never map a snapshot need not track changes
+if settings.KEY_SNAPSHOT_ENABLED:
+    invalidation_bus.subscribe(key_snapshot.apply, on_reset=key_snapshot.reset)
+
+async def get_key_by_kid(kid: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """An active key pair from the snapshot, any other through the kid cache and ``loader``"""
+    row = key_snapshot.get(kid)
+    if row is not None:
+        return row
+    return await kid_cache.get_or_load_async(kid, loader)
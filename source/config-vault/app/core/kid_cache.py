@@ -0,0 +1,61 @@
+from typing import Awaitable, Callable, Optional
+from app.core.cache import MISSING, GenerationCache
+from app.core.config import settings
+from app.schemas.rsa_key_pair import RSAKeyPair
+
+class KidCache:
+    """
+    Read-through cache of public key pairs by kid, dropped on invalidation
+    with the generation guard of ``GenerationCache``.
+
+    Unknown kids are cached as None with a short TTL.
+    """
+
+    def __init__(self, *, max_size: int, ttl: Optional[float], negative_ttl: float):
+        self.entries = GenerationCache(max_size=max_size, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    @property
+    def generation(self) -> int:
+        return self.entries.generation
+
+    def get(self, kid: str):
+        """Return the cached key pair, None for a known-unknown kid, or MISSING"""
+        return self.entries.get(kid, MISSING)
+
+    def put(self, kid: str, key_pair, generation: int) -> Optional[RSAKeyPair]:
+        """Cache ``key_pair``, or None for an unknown kid, unless invalidated after ``generation``"""
+        value = RSAKeyPair.model_validate(key_pair) if key_pair is not None else None
+        self.entries.put(kid, value, generation, None if value is not None else self.negative_ttl)
+        return value
+
+    def get_or_load(self, kid: str, loader: Callable[[], object]) -> Optional[RSAKeyPair]:
+        cached = self.get(kid)
+        if cached is not MISSING:
+            return cached
+        generation = self.generation
+        return self.put(kid, loader(), generation)
+
+    async def get_or_load_async(
+        self, kid: str, loader: Callable[[], Awaitable[object]]
+    ) -> Optional[RSAKeyPair]:
+        cached = self.get(kid)
+        if cached is not MISSING:
+            return cached
+        generation = self.generation
+        return self.put(kid, await loader(), generation)
+
+    def invalidate(self, kid: str) -> None:
+        self.entries.invalidate(kid)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {**self.entries.stats(), "negative_ttl_seconds": self.negative_ttl}
+
+kid_cache = KidCache(
+    max_size=settings.KID_CACHE_MAX_SIZE,
+    ttl=settings.KID_CACHE_TTL_SECONDS,
+    negative_ttl=settings.KID_CACHE_NEGATIVE_TTL_SECONDS,
+)
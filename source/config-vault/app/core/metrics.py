@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Set
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+# prometheus_client switches to file-backed values for every metric when this
+# is set before it is imported, so each worker process writes its own files
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+HTTP_REQUESTS = Counter(
+    "config_vault_http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "config_vault_http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+HTTP_IN_PROGRESS = Gauge(
+    "config_vault_http_requests_in_progress", "HTTP requests being served", ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_STATEMENTS = Histogram(
+    "config_vault_http_request_db_statements", "SQL statements per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "config_vault_http_request_db_seconds", "Time spent in SQL statements per HTTP request", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+DB_STATEMENT_SECONDS = Histogram(
+    "config_vault_db_statement_duration_seconds", "SQL statement latency", ["operation"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+KEY_GENERATION_SECONDS = Histogram(
+    "config_vault_key_generation_seconds", "RSA private key generation time", ["key_size"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+KEY_SERIALIZATION_SECONDS = Histogram(
+    "config_vault_key_serialization_seconds", "PEM serialization time of a generated key pair",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+# Statement count and time of the current request, shared with the threadpool
+# that runs sync endpoints, since anyio copies the context into it
+request_stats: ContextVar[Optional["RequestStats"]] = ContextVar("request_stats", default=None)
+
+class RequestStats:
+    """
+    SQL statements of a request, with their text and timings and the threads
+    that ran them while profiled
+    """
+    __slots__ = ("statements", "db_seconds", "trace", "threads")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.trace: Optional[List[dict]] = None
+        self.threads: Optional[Set[int]] = None
+
+def statement_operation(statement: str) -> str:
+    operation = statement.lstrip()[:8].split(None, 1)
+    operation = operation[0].upper() if operation else ""
+    return operation if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY") else "OTHER"
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["metrics_started"] = time.perf_counter()
+    stats = request_stats.get()
+    if stats is not None and stats.threads is not None:
+        stats.threads.add(threading.get_ident())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.pop("metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if settings.METRICS_ENABLED:
+        DB_STATEMENT_SECONDS.labels(statement_operation(statement)).observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        # Parameters are left out, they may hold key material
+        if stats.trace is not None:
+            stats.trace.append(
+                {"statement": statement, "seconds": elapsed, "executemany": executemany}
+            )
+
+def time_statements(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and SQL statements per
+    route. Routes are labelled by their path template, found after routing
+    from the endpoint Starlette leaves in the scope, so labels stay bounded
+    and no route is matched twice.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[Callable, str]] = None
+
+    def route_label(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            request_stats.reset(token)
+            route = self.route_label(scope)
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            REQUEST_STATEMENTS.labels(route).observe(stats.statements)
+            REQUEST_DB_SECONDS.labels(route).observe(stats.db_seconds)
+
+def render_metrics() -> bytes:
+    """Metrics of this process, or of every worker in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the aggregate when it exits"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Generic, List, NamedTuple, Optional, Tuple, Type, TypeVar
+from uuid import UUID
+from fastapi import Response
+from pydantic import BaseModel
+from app.core.http_cache import versioned_rows_response
+
+T = TypeVar("T")
+
+class Page(NamedTuple, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str]
+    total: Optional[int] = None
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Encode the (created_at, id) position of a row as an opaque token"""
+    raw = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a token from ``encode_cursor``, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
+
+def page_headers(page: Page) -> Dict[str, str]:
+    """The next-page token and the optional total count, as response headers"""
+    headers = {}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if page.total is not None:
+        headers["X-Total-Count"] = str(page.total)
+    return headers
+
+def page_response(
+    page: Page,
+    schema: Type[BaseModel],
+    *,
+    cache_control: str,
+    if_none_match: Optional[str],
+) -> Response:
+    """
+    A page as a pre-serialized response of ``schema`` fields, or a 304 when
+    the client already has it.
+    """
+    return versioned_rows_response(
+        page.items,
+        schema,
+        cache_control=cache_control,
+        if_none_match=if_none_match,
+        headers=page_headers(page),
+    )
@@ -0,0 +1,195 @@
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.metrics import RequestStats, request_stats
+from app.core.query_budget import check_query_budget
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+# Threads blocked in these modules are waiting rather than working and are left out
+IDLE_MODULES = (
+    "threading.py",
+    "selectors.py",
+    "queue.py",
+    os.path.join("concurrent", "futures", "thread.py"),
+)
+
+def profiling_enabled() -> bool:
+    return bool(settings.PROFILING_TOKEN) or settings.PROFILING_SAMPLE_RATE > 0
+
+def get_output_dir() -> str:
+    return settings.PROFILING_OUTPUT_DIR or os.path.join(tempfile.gettempdir(), "config-vault-profiles")
+
+def folded_stack(frame) -> Optional[str]:
+    """A stack as ``module:function`` frames from the root, joined by ``;``"""
+    if frame.f_code.co_filename.endswith(IDLE_MODULES):
+        return None
+    names = []
+    while frame is not None:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def runs(frame, target) -> bool:
+    """Whether ``target`` is ``frame`` or one of its callers"""
+    while frame is not None:
+        if frame is target:
+            return True
+        frame = frame.f_back
+    return False
+
+class StackSampler:
+    """
+    Background thread sampling the stacks of one request at a fixed interval.
+
+    Created on the event loop thread, where only stacks running ``frame``,
+    the request's own coroutine, are counted, so other requests' tasks are
+    left out. Sync endpoints run on threadpool threads, which are sampled
+    once they are in ``threads``, e.g. after running one of the request's
+    statements.
+    """
+
+    def __init__(self, *, interval: float, frame, threads: Set[int]):
+        self.interval = interval
+        self.frame = frame
+        self.threads = threads
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._loop_thread = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, waiting for the last sample, so call it off the event loop"""
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._loop_thread:
+                    if not runs(frame, self.frame):
+                        continue
+                elif thread_id not in self.threads:
+                    continue
+                stack = folded_stack(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+
+def save_profile(profile: dict, stacks: Counter) -> None:
+    """Write a profile as JSON, and its stacks in the folded format flame graph tools read"""
+    output_dir = get_output_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, profile["id"])
+    with open(f"{path}.json", "w") as file:
+        json.dump({**profile, "stacks": dict(stacks.most_common())}, file, indent=2)
+    with open(f"{path}.folded", "w") as file:
+        file.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling requests on demand and checking the
+    statement budgets of routes. A profiled request reports its statement
+    count and database time in milliseconds in ``X-Query-Count`` and
+    ``X-DB-Time``, and the id of its saved profile in ``X-Profile-Id``.
+    Statements run while streaming a body are in the profile, not the headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def should_profile(self, scope) -> bool:
+        token = settings.PROFILING_TOKEN
+        if token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, token.encode()):
+                    return True
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Shared with the metrics middleware when it runs outside this one
+        stats = request_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = request_stats.set(stats)
+        try:
+            if self.should_profile(scope):
+                await self.profile(scope, receive, send, stats)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            if token is not None:
+                request_stats.reset(token)
+        check_query_budget(scope.get("endpoint"), stats.statements)
+
+    async def profile(self, scope, receive, send, stats: RequestStats):
+        profile_id = uuid.uuid4().hex
+        status = 500
+        stats.trace = []
+        stats.threads = set()
+
+        async def send_with_stats(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", []),
+                        (b"x-query-count", str(stats.statements).encode()),
+                        (b"x-db-time", f"{stats.db_seconds * 1000:.3f}".encode()),
+                        (b"x-profile-id", profile_id.encode()),
+                    ],
+                }
+            await send(message)
+
+        sampler = StackSampler(
+            interval=settings.PROFILING_INTERVAL_SECONDS, frame=sys._getframe(), threads=stats.threads
+        )
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            elapsed = time.perf_counter() - started
+            await run_in_threadpool(sampler.stop)
+            endpoint = scope.get("endpoint")
+            profile = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode("latin-1"),
+                "endpoint": f"{endpoint.__module__}.{endpoint.__name__}" if endpoint else None,
+                "status": status,
+                "seconds": elapsed,
+                "statements": stats.statements,
+                "db_seconds": stats.db_seconds,
+                "sql": stats.trace,
+                "interval_seconds": sampler.interval,
+                "samples": sampler.samples,
+            }
+            try:
+                await run_in_threadpool(save_profile, profile, sampler.stacks)
+            except OSError:
+                logger.exception("Failed to save profile %s", profile_id)
@@ -0,0 +1,36 @@
+import logging
+from typing import Callable, Dict, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Most SQL statements a request may run, by endpoint function
+budgets: Dict[Callable, int] = {}
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget(statements: int) -> Callable[[Callable], Callable]:
+    """
+    Declare the most SQL statements a request to the decorated endpoint may
+    run. N+1 queries, e.g. lazy loads of ``Tenant.sites`` or ``rsa_keys`` per
+    row, push requests over budget. The endpoint is returned unchanged.
+    """
+
+    def register(endpoint: Callable) -> Callable:
+        budgets[endpoint] = statements
+        return endpoint
+
+    return register
+
+def check_query_budget(endpoint: Optional[Callable], statements: int) -> None:
+    """Log, or raise with QUERY_BUDGET_MODE=raise, when a request went over budget"""
+    budget = budgets.get(endpoint)
+    if budget is None or statements <= budget or settings.QUERY_BUDGET_MODE == "off":
+        return
+    name = f"{endpoint.__module__}.{endpoint.__name__}"
+    if settings.QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(
+            f"{name} ran {statements} SQL statements, over its budget of {budget}"
+        )
+    logger.warning("%s ran %d SQL statements, over its budget of %d", name, statements, budget)
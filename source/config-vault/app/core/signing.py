@@ -0,0 +1,178 @@
+import asyncio
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Union
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from app.core.cache import GenerationCache
+from app.core.config import settings
+
+class SigningKeyNotFound(LookupError):
+    """No key pair has this kid"""
+
+class SigningKeyInactive(Exception):
+    """The key pair exists but is revoked, expired or retired"""
+
+class SigningKey(NamedTuple):
+    kid: str
+    private_key: RSAPrivateKey
+    expires_at: Optional[datetime]
+    # Estimated bytes held by OpenSSL for the loaded key
+    size: int
+
+HASHES = {"256": hashes.SHA256, "384": hashes.SHA384, "512": hashes.SHA512}
+
+def estimated_size(private_key: RSAPrivateKey) -> int:
+    """
+    Rough footprint of a loaded RSA key: the eight CRT components plus the
+    Montgomery contexts and blinding state OpenSSL caches on first use.
+    """
+    return private_key.key_size // 8 * 16 + 2048
+
+def is_expired(expires_at: Optional[datetime]) -> bool:
+    if expires_at is None:
+        return False
+    # Naive timestamps are UTC, as written by the rest of the service
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return expires_at <= datetime.utcnow()
+
+def check_usable(row: Any) -> None:
+    if row.status != "active" or is_expired(row.expires_at):
+        raise SigningKeyInactive(f"RSA key pair {row.kid} is not active")
+
+def load_signing_key(row: Any) -> SigningKey:
+    """Parse the private key PEM of a ``get_signing_keys`` row, the slow part of signing"""
+    private_key = serialization.load_pem_private_key(row.private_key.encode("utf-8"), password=None)
+    return SigningKey(
+        kid=row.kid,
+        private_key=private_key,
+        expires_at=row.expires_at,
+        size=estimated_size(private_key),
+    )
+
+def decode_data(data: str, encoding: str) -> bytes:
+    if encoding == "base64url":
+        return base64.b64decode(data + "=" * (-len(data) % 4), altchars=b"-_", validate=True)
+    return data.encode("utf-8")
+
+def sign_bytes(private_key: RSAPrivateKey, data: bytes, algorithm: str) -> bytes:
+    """Sign with a JWS algorithm: RS* is PKCS#1 v1.5, PS* is PSS with a digest-sized salt"""
+    hash_algorithm = HASHES[algorithm[2:]]()
+    if algorithm.startswith("PS"):
+        pad = padding.PSS(mgf=padding.MGF1(hash_algorithm), salt_length=hash_algorithm.digest_size)
+    else:
+        pad = padding.PKCS1v15()
+    return private_key.sign(data, pad, hash_algorithm)
+
+def encode_signature(signature: bytes) -> str:
+    return base64.urlsafe_b64encode(signature).rstrip(b"=").decode("ascii")
+
+class SigningKeyCache:
+    """
+    LRU cache of loaded private keys by kid, bounded by their estimated
+    memory rather than their count.
+
+    Only active keys are cached. Revoking, deleting or expiring a key evicts
+    it through the invalidation bus, with the generation guard of
+    ``GenerationCache``.
+    """
+
+    def __init__(self, *, max_bytes: int, ttl: Optional[float]):
+        self.entries = GenerationCache(
+            max_size=None, ttl=ttl, weigh=lambda key: key.size, max_weight=max_bytes
+        )
+        self._loads = 0
+
+    @property
+    def generation(self) -> int:
+        return self.entries.generation
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        return self.entries.get(kid)
+
+    def put(self, key: SigningKey, generation: int) -> None:
+        self._loads += 1
+        self.entries.put(key.kid, key, generation)
+
+    def invalidate(self, kid: Optional[str]) -> None:
+        self.entries.invalidate(kid)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {**self.entries.stats(), "loads": self._loads}
+
+signing_key_cache = SigningKeyCache(
+    max_bytes=settings.SIGNING_KEY_CACHE_MAX_BYTES,
+    ttl=settings.SIGNING_KEY_CACHE_TTL_SECONDS,
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_signing_executor() -> ThreadPoolExecutor:
+    """
+    Threads for PEM parsing and signing. OpenSSL releases the GIL for RSA
+    private key operations, so these scale across cores.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SIGNING_WORKERS, thread_name_prefix="rsa-sign"
+                )
+    return _executor
+
+def shutdown_signing_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+async def run_signing(fn: Callable, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_signing_executor(), fn, *args)
+
+SigningKeyResult = Union[SigningKey, SigningKeyNotFound, SigningKeyInactive]
+
+async def get_signing_keys(
+    kids: Iterable[str], loader: Callable[[List[str]], Awaitable[List[Any]]]
+) -> Dict[str, SigningKeyResult]:
+    """
+    Signing keys for ``kids`` from the cache, loading the missing ones with a
+    single ``loader`` call. Unusable kids map to the exception explaining why.
+    """
+    keys: Dict[str, SigningKeyResult] = {}
+    for kid in set(kids):
+        key = signing_key_cache.get(kid)
+        if key is not None and is_expired(key.expires_at):
+            signing_key_cache.invalidate(kid)
+            key = None
+        keys[kid] = key if key is not None else SigningKeyNotFound(f"RSA key pair {kid} not found")
+    missing = [kid for kid, key in keys.items() if not isinstance(key, SigningKey)]
+    if not missing:
+        return keys
+
+    generation = signing_key_cache.generation
+    rows = []
+    for row in await loader(missing):
+        try:
+            check_usable(row)
+            rows.append(row)
+        except SigningKeyInactive as exc:
+            keys[row.kid] = exc
+    loaded = await asyncio.gather(*(run_signing(load_signing_key, row) for row in rows))
+    for key in loaded:
+        signing_key_cache.put(key, generation)
+        keys[key.kid] = key
+    return keys
+
+async def sign(key: SigningKey, data: bytes, algorithm: str) -> str:
+    """Sign ``data`` on the signing pool, returning a base64url JWS signature"""
+    return encode_signature(await run_signing(sign_bytes, key.private_key, data, algorithm))
@@ -0,0 +1,69 @@
+from typing import Any, Awaitable, Callable, Hashable, Optional, Type
+from pydantic import BaseModel
+from app.core.cache import GenerationCache
+from app.core.config import settings
+from app.core.serialization import dump_row
+from app.core.http_cache import etag_matches, make_etag, not_modified, versioned_row_response
+
+class VersionCache:
+    """
+    ETags of single tenants, sites and keys by table and id (kid for keys),
+    so a client revalidating an unchanged resource gets its 304 without a
+    database query. Entries are dropped by invalidation events, with the
+    generation guard of ``GenerationCache``.
+    """
+
+    def __init__(self, *, max_size: int, ttl: Optional[float]):
+        self.entries = GenerationCache(max_size=max_size, ttl=ttl)
+
+    @property
+    def generation(self) -> int:
+        return self.entries.generation
+
+    def get(self, entity: str, key: Hashable) -> Optional[str]:
+        return self.entries.get((entity, str(key)))
+
+    def set(self, entity: str, key: Hashable, etag: str, generation: int) -> None:
+        self.entries.put((entity, str(key)), etag, generation)
+
+    def invalidate(self, entity: str, key: Hashable) -> None:
+        self.entries.invalidate((entity, str(key)))
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+version_cache = VersionCache(
+    max_size=settings.VERSION_CACHE_MAX_SIZE,
+    ttl=settings.VERSION_CACHE_TTL_SECONDS,
+)
+
+async def read_versioned(
+    entity: str,
+    key: Hashable,
+    schema: Type[BaseModel],
+    *,
+    loader: Callable[[], Awaitable[Any]],
+    cache_control: str,
+    if_none_match: Optional[str],
+) -> Any:
+    """
+    Serve one row with its ETag, or a 304. A revalidation matching the cached
+    version is answered without calling ``loader``. Returns None when the row
+    does not exist.
+    """
+    if if_none_match:
+        etag = version_cache.get(entity, key)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return not_modified({"ETag": etag, "Cache-Control": cache_control})
+    generation = version_cache.generation
+    row = await loader()
+    if row is None:
+        return None
+    # The ETag covers every field ``schema`` exposes, unlike ``updated_at`` alone
+    body = dump_row(row, schema)
+    etag = make_etag(body)
+    version_cache.set(entity, key, etag, generation)
+    return versioned_row_response(body, etag=etag, cache_control=cache_control, if_none_match=if_none_match)
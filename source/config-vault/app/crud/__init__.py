@@ -1,3 +1,3 @@
-from app.crud.crud_tenant import tenant
-from app.crud.crud_site import site
-from app.crud.crud_rsa_key_pair import rsa_key_pair
+from app.crud.crud_tenant import tenant, async_tenant
+from app.crud.crud_site import site, async_site
+from app.crud.crud_rsa_key_pair import rsa_key_pair, async_rsa_key_pair
@@ -1,14 +1,132 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import io
+from datetime import datetime
+from typing import (
+    Any, AsyncIterator, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Set, Type, TypeVar, Union,
+)
 from uuid import UUID
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import RowMapping, Select, delete, func, insert, inspect, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.types import TypeDecorator
+from app.core.invalidation import publish
+from app.core.pagination import Page, decode_cursor, encode_cursor
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+def filtered_query(model: Type[ModelType], filters: Optional[Dict[str, Any]] = None) -> Select:
+    """Select ``model`` rows matching every non-None column filter"""
+    stmt = select(model)
+    for field, value in (filters or {}).items():
+        if value is not None:
+            stmt = stmt.where(getattr(model, field) == value)
+    return stmt
+
+def page_query(
+    model: Type[ModelType],
+    stmt: Select,
+    *,
+    cursor: Optional[str],
+    limit: int,
+    skip: int = 0,
+) -> Select:
+    """
+    Order ``stmt`` by (created_at, id) and seek past ``cursor``. One extra row
+    is fetched to tell whether there is a next page.
+    """
+    if cursor:
+        stmt = stmt.where(tuple_(model.created_at, model.id) > tuple_(*decode_cursor(cursor)))
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.order_by(model.created_at, model.id).limit(limit + 1)
+
+def make_page(rows: Sequence[ModelType], limit: int, total: Optional[int] = None) -> Page[ModelType]:
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return Page(items=items, next_cursor=next_cursor, total=total)
+
+def export_query(
+    model: Type[ModelType],
+    columns: Iterable[str],
+    *,
+    tenant_id: Optional[Union[UUID, str]] = None,
+    updated_since: Optional[datetime] = None,
+) -> Select:
+    """
+    Select ``columns`` of every row owned by ``tenant_id`` and created or
+    updated since ``updated_since``, in (created_at, id) order.
+    """
+    stmt = select(*(model.__table__.c[name] for name in columns))
+    if tenant_id is not None:
+        # Tenants are owned by themselves
+        stmt = stmt.where(getattr(model, "tenant_id", model.id) == tenant_id)
+    if updated_since is not None:
+        stmt = stmt.where(func.coalesce(model.updated_at, model.created_at) >= updated_since)
+    return stmt.order_by(model.created_at, model.id)
+
+# Backslash sequences for the characters that delimit COPY text format fields and rows
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def copy_value(value: Any) -> str:
+    """Render a value in the text format of Postgres COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, bytes):
+        # bytea hex input, with its backslash escaped for COPY
+        return "\\\\x" + value.hex()
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+def copy_rows(db: Session, model: Type[ModelType], rows: Sequence[Dict[str, Any]]) -> None:
+    """Load ``rows`` with one COPY ... FROM STDIN in the session's transaction (psycopg2 only)"""
+    columns = list(rows[0])
+    dialect = db.get_bind().dialect
+    # COPY bypasses bind processing, so custom types still convert their values here
+    converters = {
+        column: model.__table__.c[column].type.process_bind_param
+        for column in columns
+        if isinstance(model.__table__.c[column].type, TypeDecorator)
+    }
+    buffer = io.StringIO()
+    for row in rows:
+        values = (
+            converters[column](row[column], dialect) if column in converters else row[column]
+            for column in columns
+        )
+        buffer.write("\t".join(copy_value(value) for value in values))
+        buffer.write("\n")
+    buffer.seek(0)
+    preparer = dialect.identifier_preparer
+    column_list = ", ".join(preparer.quote(column) for column in columns)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {preparer.format_table(model.__table__)} ({column_list}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+def insert_returning(model: Type[ModelType], values: Dict[str, Any]):
+    """
+    INSERT ... RETURNING the new row in full: deferred columns are returned
+    too, since the caller just wrote them and may hand them back.
+    """
+    return insert(model).values(**values).returning(model).options(undefer("*"))
+
+def update_values(
+    model: Type[ModelType], obj_in: Union[BaseModel, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Keep only the fields of an update that are columns of ``model``"""
+    update_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump(exclude_unset=True)
+    columns = inspect(model).columns.keys()
+    return {field: value for field, value in update_data.items() if field in columns}
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
@@ -16,17 +134,92 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get(self, db: Session, id: Union[UUID, str]) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
+    def get_existing_ids(self, db: Session, *, ids: Iterable[Union[UUID, str]]) -> Set[UUID]:
+        return self.get_existing_values(db, column="id", values=ids)
+
+    def get_existing_values(self, db: Session, *, column: str, values: Iterable[Any]) -> Set[Any]:
+        """Which of ``values`` are already stored in ``column``, with one query"""
+        values = set(values)
+        if not values:
+            return set()
+        stmt = select(getattr(self.model, column)).where(getattr(self.model, column).in_(values))
+        return set(db.scalars(stmt))
+
+    def get_column_by_id(self, db: Session, *, column: str, ids: Iterable[Union[UUID, str]]) -> Dict[UUID, Any]:
+        """``column`` of each of ``ids`` that exists, with one query"""
+        ids = set(ids)
+        if not ids:
+            return {}
+        stmt = select(self.model.id, getattr(self.model, column)).where(self.model.id.in_(ids))
+        return {id: value for id, value in db.execute(stmt)}
+
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return (
+            db.query(self.model)
+            .order_by(self.model.created_at, self.model.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)
-        db.add(db_obj)
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        with_total: bool = False,
+        skip: int = 0,
+    ) -> Page[ModelType]:
+        """
+        Keyset-paginate rows in (created_at, id) order. ``skip`` is only
+        honoured without a cursor, for offset-based callers.
+        """
+        stmt = filtered_query(self.model, filters)
+        total = None
+        if with_total:
+            total = db.scalar(select(func.count()).select_from(stmt.subquery()))
+        rows = db.scalars(page_query(self.model, stmt, cursor=cursor, limit=limit, skip=skip)).all()
+        return make_page(rows, limit, total)
+
+    def stream(
+        self,
+        db: Session,
+        *,
+        columns: Iterable[str],
+        tenant_id: Optional[Union[UUID, str]] = None,
+        updated_since: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Sequence[RowMapping]]:
+        """
+        Yield the rows of ``export_query`` in batches of ``batch_size``, read
+        through a server-side cursor so memory use does not grow with the table
+        """
+        stmt = export_query(self.model, columns, tenant_id=tenant_id, updated_since=updated_since)
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        yield from result.mappings().partitions()
+
+    def insert_many(self, db: Session, *, rows: Sequence[Dict[str, Any]]) -> None:
+        """
+        Insert rows that all have the same keys, without committing. Postgres
+        with psycopg2 loads them with COPY, other drivers with executemany.
+        """
+        if not rows:
+            return
+        if db.get_bind().dialect.driver == "psycopg2":
+            copy_rows(db, self.model, rows)
+        else:
+            db.execute(insert(self.model.__table__), list(rows))
+
+    def create(self, db: Session, *, obj_in: Union[CreateSchemaType, Dict[str, Any]]) -> ModelType:
+        # Keep native UUID/datetime values so every driver can bind them
+        obj_in_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump()
+        db_obj = db.scalar(insert_returning(self.model, obj_in_data))
         db.commit()
-        db.refresh(db_obj)
+        publish(self.model.__tablename__, "create", db_obj)
         return db_obj
 
     def update(
@@ -36,21 +229,127 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.model_dump(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        return self.update_by_id(db, id=db_obj.id, obj_in=obj_in) or db_obj
+
+    def update_by_id(
+        self,
+        db: Session,
+        *,
+        id: Union[UUID, str],
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Optional[ModelType]:
+        """Apply the set fields with one UPDATE ... RETURNING, or return None if no row matched"""
+        values = update_values(self.model, obj_in)
+        if not values:
+            return self.get(db, id=id)
+        stmt = update(self.model).where(self.model.id == id).values(**values).returning(self.model)
+        db_obj = db.scalar(stmt)
         db.commit()
-        db.refresh(db_obj)
+        if db_obj is not None:
+            publish(self.model.__tablename__, "update", db_obj)
         return db_obj
 
-    def remove(self, db: Session, *, id: Union[UUID, str]) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
+    def remove(self, db: Session, *, id: Union[UUID, str]) -> Optional[ModelType]:
+        """Delete with one DELETE ... RETURNING, or return None if no row matched"""
+        obj = db.scalar(delete(self.model).where(self.model.id == id).returning(self.model))
         db.commit()
+        if obj is not None:
+            publish(self.model.__tablename__, "delete", obj)
+        return obj
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """Async counterpart of CRUDBase with the same surface, for use with AsyncSession"""
+
+    def __init__(self, model: Type[ModelType]):
+        self.model = model
+
+    async def get(self, db: AsyncSession, id: Union[UUID, str]) -> Optional[ModelType]:
+        return await db.get(self.model, id)
+
+    async def get_existing_ids(
+        self, db: AsyncSession, *, ids: Iterable[Union[UUID, str]]
+    ) -> Set[UUID]:
+        ids = set(ids)
+        if not ids:
+            return set()
+        return set(await db.scalars(select(self.model.id).where(self.model.id.in_(ids))))
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
+    ) -> List[ModelType]:
+        stmt = select(self.model).order_by(self.model.created_at, self.model.id)
+        return list(await db.scalars(stmt.offset(skip).limit(limit)))
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        with_total: bool = False,
+        skip: int = 0,
+    ) -> Page[ModelType]:
+        stmt = filtered_query(self.model, filters)
+        total = None
+        if with_total:
+            total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+        query = page_query(self.model, stmt, cursor=cursor, limit=limit, skip=skip)
+        rows = (await db.scalars(query)).all()
+        return make_page(rows, limit, total)
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Iterable[str],
+        tenant_id: Optional[Union[UUID, str]] = None,
+        updated_since: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[RowMapping]]:
+        stmt = export_query(self.model, columns, tenant_id=tenant_id, updated_since=updated_since)
+        result = await db.stream(stmt.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            yield partition
+
+    async def create(
+        self, db: AsyncSession, *, obj_in: Union[CreateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        obj_in_data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump()
+        db_obj = await db.scalar(insert_returning(self.model, obj_in_data))
+        await db.commit()
+        publish(self.model.__tablename__, "create", db_obj)
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        return await self.update_by_id(db, id=db_obj.id, obj_in=obj_in) or db_obj
+
+    async def update_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: Union[UUID, str],
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Optional[ModelType]:
+        values = update_values(self.model, obj_in)
+        if not values:
+            return await self.get(db, id=id)
+        stmt = update(self.model).where(self.model.id == id).values(**values).returning(self.model)
+        db_obj = await db.scalar(stmt)
+        await db.commit()
+        if db_obj is not None:
+            publish(self.model.__tablename__, "update", db_obj)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: Union[UUID, str]) -> Optional[ModelType]:
+        obj = await db.scalar(delete(self.model).where(self.model.id == id).returning(self.model))
+        await db.commit()
+        if obj is not None:
+            publish(self.model.__tablename__, "delete", obj)
         return obj
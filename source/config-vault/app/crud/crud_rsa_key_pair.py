@@ -1,39 +1,381 @@
-from typing import List, Optional, Union
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
+from sqlalchemy import Delete, Update, bindparam, delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.crud.base import CRUDBase
+from app.core.invalidation import publish
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.models.rsa_key_pair import RSAKeyPair
 from app.schemas.rsa_key_pair import RSAKeyPairCreate, RSAKeyPairUpdate
 
+# What invalidation needs to know about a changed key pair
+EVENT_COLUMNS = (RSAKeyPair.id, RSAKeyPair.kid, RSAKeyPair.tenant_id, RSAKeyPair.site_id, RSAKeyPair.status)
+# What signing needs, without the rest of the row
+SIGNING_COLUMNS = (RSAKeyPair.kid, RSAKeyPair.private_key, RSAKeyPair.status, RSAKeyPair.expires_at)
+# Everything the API returns for a key pair except its constant active status
+PUBLIC_KEY_COLUMNS = (
+    RSAKeyPair.id,
+    RSAKeyPair.kid,
+    RSAKeyPair.public_key,
+    RSAKeyPair.tenant_id,
+    RSAKeyPair.site_id,
+    RSAKeyPair.expires_at,
+    RSAKeyPair.rotate_at,
+    RSAKeyPair.successor_id,
+    RSAKeyPair.retire_at,
+    RSAKeyPair.created_at,
+    RSAKeyPair.updated_at,
+)
+
+def delete_key_pairs(*criteria) -> Delete:
+    """DELETE the key pairs matching ``criteria``, returning their event columns"""
+    return delete(RSAKeyPair).where(*criteria).returning(*EVENT_COLUMNS)
+
+def set_key_pairs_status(status: str, *criteria) -> Update:
+    """UPDATE the status of the key pairs matching ``criteria``, returning their event columns"""
+    return (
+        update(RSAKeyPair)
+        .where(*criteria, RSAKeyPair.status != status)
+        .values(status=status)
+        .returning(*EVENT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+def status_update(status: str, *criteria) -> Update:
+    """UPDATE the status of the key pairs matching ``criteria``, returning the whole rows"""
+    return (
+        update(RSAKeyPair)
+        .where(*status_criteria(status, *criteria))
+        .values(status=status)
+        .returning(RSAKeyPair)
+    )
+
+def selection_criteria(
+    tenant_id: Optional[Union[UUID, str]] = None,
+    site_id: Optional[Union[UUID, str]] = None,
+    ids: Optional[Sequence[Union[UUID, str]]] = None,
+) -> list:
+    criteria = []
+    if tenant_id is not None:
+        criteria.append(RSAKeyPair.tenant_id == tenant_id)
+    if site_id is not None:
+        criteria.append(RSAKeyPair.site_id == site_id)
+    if ids is not None:
+        criteria.append(RSAKeyPair.id.in_(ids))
+    return criteria
+
+def expired_criteria(limit: int) -> list:
+    """Match up to ``limit`` active keys past expiry, skipping rows another worker holds"""
+    due = (
+        select(RSAKeyPair.id)
+        .where(RSAKeyPair.status == "active", RSAKeyPair.expires_at <= func.now())
+        .order_by(RSAKeyPair.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return [RSAKeyPair.id.in_(due.scalar_subquery())]
+
+def activatable_criteria() -> list:
+    """Match revoked keys that have not expired, the only ones that may be activated again"""
+    return [
+        RSAKeyPair.status == "revoked",
+        or_(RSAKeyPair.expires_at.is_(None), RSAKeyPair.expires_at > func.now()),
+    ]
+
+def status_criteria(status: str, *criteria) -> list:
+    """``criteria`` narrowed to the key pairs that may be moved to ``status``"""
+    return [*criteria, *activatable_criteria()] if status == "active" else list(criteria)
+
 class CRUDRSAKeyPair(CRUDBase[RSAKeyPair, RSAKeyPairCreate, RSAKeyPairUpdate]):
     def get_by_kid(self, db: Session, *, kid: str) -> Optional[RSAKeyPair]:
         return db.query(RSAKeyPair).filter(RSAKeyPair.kid == kid).first()
     
-    def get_by_tenant_id(self, db: Session, *, tenant_id: Union[UUID, str]) -> List[RSAKeyPair]:
-        return db.query(RSAKeyPair).filter(RSAKeyPair.tenant_id == tenant_id).all()
+    def get_signing_keys(self, db: Session, *, kids: Iterable[str]) -> List[Any]:
+        """The columns needed to sign with each of ``kids``, with one query"""
+        return db.execute(select(*SIGNING_COLUMNS).where(RSAKeyPair.kid.in_(set(kids)))).all()
     
-    def get_by_site_id(self, db: Session, *, site_id: Union[UUID, str]) -> List[RSAKeyPair]:
-        return db.query(RSAKeyPair).filter(RSAKeyPair.site_id == site_id).all()
+    def get_active_kids(self, db: Session) -> List[Any]:
+        """kid, tenant_id and site_id of every active key pair"""
+        stmt = select(RSAKeyPair.kid, RSAKeyPair.tenant_id, RSAKeyPair.site_id).where(RSAKeyPair.status == "active")
+        return db.execute(stmt).all()
+    
+    def stream_active_public_keys(self, db: Session, *, batch_size: int = 1000) -> Iterator[Sequence[Any]]:
+        """
+        Every active key pair without its private key in (created_at, id)
+        order, in batches read through a server-side cursor
+        """
+        stmt = (
+            select(*PUBLIC_KEY_COLUMNS)
+            .where(RSAKeyPair.status == "active")
+            .order_by(RSAKeyPair.created_at, RSAKeyPair.id)
+        )
+        yield from db.execute(stmt.execution_options(yield_per=batch_size)).partitions()
     
     def get_active_by_tenant_id(self, db: Session, *, tenant_id: Union[UUID, str]) -> List[RSAKeyPair]:
         return db.query(RSAKeyPair).filter(
             RSAKeyPair.tenant_id == tenant_id,
             RSAKeyPair.status == "active"
-        ).all()
+        ).order_by(RSAKeyPair.created_at, RSAKeyPair.id).all()
     
     def get_active_by_site_id(self, db: Session, *, site_id: Union[UUID, str]) -> List[RSAKeyPair]:
         return db.query(RSAKeyPair).filter(
             RSAKeyPair.site_id == site_id,
             RSAKeyPair.status == "active"
-        ).all()
+        ).order_by(RSAKeyPair.created_at, RSAKeyPair.id).all()
+    
+    def create_multi(self, db: Session, *, objs_in: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many key pairs with one multi-row INSERT ... RETURNING in one transaction"""
+        if not objs_in:
+            return []
+        table = RSAKeyPair.__table__
+        rows = db.execute(insert(table).returning(*table.c), list(objs_in)).mappings().all()
+        db.commit()
+        for row in rows:
+            publish(RSAKeyPair.__tablename__, "create", row)
+        return [dict(row) for row in rows]
     
     def update_status(self, db: Session, *, id: Union[UUID, str], status: str) -> Optional[RSAKeyPair]:
-        db_obj = db.query(RSAKeyPair).filter(RSAKeyPair.id == id).first()
-        if db_obj:
-            db_obj.status = status
-            db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
-        return db_obj
+        """
+        Set ``status`` with one UPDATE ... RETURNING. Only revoked keys that
+        have not expired are activated; None if no key pair was changed.
+        """
+        stmt = status_update(status, RSAKeyPair.id == id)
+        key_pair = db.scalar(stmt)
+        db.commit()
+        if key_pair is not None:
+            publish(RSAKeyPair.__tablename__, "update", key_pair)
+        return key_pair
+    
+    def update_status_multi(
+        self,
+        db: Session,
+        *,
+        status: str,
+        tenant_id: Optional[Union[UUID, str]] = None,
+        site_id: Optional[Union[UUID, str]] = None,
+        ids: Optional[Sequence[Union[UUID, str]]] = None,
+    ) -> List[Any]:
+        """
+        Set ``status`` on every key pair matching all given selectors with one
+        UPDATE. Keys already in that status are left untouched, and only
+        revoked keys that have not expired are activated.
+        """
+        criteria = selection_criteria(tenant_id, site_id, ids)
+        if not criteria:
+            raise ValueError("At least one of tenant_id, site_id or ids is required")
+        return self._set_status(db, set_key_pairs_status(status, *status_criteria(status, *criteria)))
+    
+    def expire_due(self, db: Session, *, limit: int) -> List[Any]:
+        """Mark up to ``limit`` active key pairs past ``expires_at`` as expired"""
+        return self._set_status(db, set_key_pairs_status("expired", *expired_criteria(limit)))
+    
+    def _set_status(self, db: Session, stmt: Update) -> List[Any]:
+        rows = db.execute(stmt).all()
+        db.commit()
+        for row in rows:
+            publish(RSAKeyPair.__tablename__, "update", row)
+        return rows
+
+    def get_unscheduled(self, db: Session, *, limit: int) -> List[Any]:
+        """Active, expiring key pairs that have no rotation time yet"""
+        stmt = (
+            select(RSAKeyPair.id, RSAKeyPair.kid, RSAKeyPair.created_at, RSAKeyPair.expires_at)
+            .where(
+                RSAKeyPair.status == "active",
+                RSAKeyPair.rotate_at.is_(None),
+                RSAKeyPair.expires_at.is_not(None),
+            )
+            .limit(limit)
+        )
+        return db.execute(stmt).all()
+    
+    def set_rotate_at(self, db: Session, *, schedule: Sequence[Dict[str, Any]]) -> List[Any]:
+        """
+        Store rotation times given as ``{"key_id": ..., "rotate_at": ...}`` with
+        one executemany. ``rotate_at`` is served with the key, so each updated
+        key is published like any other update; returns their event columns.
+        """
+        if not schedule:
+            return []
+        stmt = (
+            update(RSAKeyPair.__table__)
+            .where(RSAKeyPair.__table__.c.id == bindparam("key_id"))
+            .values(rotate_at=bindparam("rotate_at"))
+        )
+        db.execute(stmt, list(schedule))
+        # executemany UPDATEs cannot return rows, so read the event columns in the same transaction
+        ids = [item["key_id"] for item in schedule]
+        rows = db.execute(select(*EVENT_COLUMNS).where(RSAKeyPair.id.in_(ids))).all()
+        db.commit()
+        for row in rows:
+            publish(RSAKeyPair.__tablename__, "update", row)
+        return rows
+    
+    def rewrite_key_material(
+        self, db: Session, *, after: Optional[UUID], limit: int
+    ) -> Tuple[int, Optional[UUID]]:
+        """
+        Write back the keys of up to ``limit`` key pairs after ``after`` in id
+        order, which stores them in the current KEY_STORAGE_FORMAT. Returns how
+        many were rewritten and the last id for the next batch, None when done.
+        """
+        table = RSAKeyPair.__table__
+        stmt = select(table.c.id, table.c.private_key, table.c.public_key).order_by(table.c.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(table.c.id > after)
+        rows = db.execute(stmt).all()
+        if not rows:
+            return 0, None
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("key_id"))
+            .values(private_key=bindparam("private_pem"), public_key=bindparam("public_pem")),
+            [{"key_id": row.id, "private_pem": row.private_key, "public_pem": row.public_key} for row in rows],
+        )
+        db.commit()
+        return len(rows), rows[-1].id
+    
+    def claim_due_rotations(self, db: Session, *, limit: int, lease: timedelta) -> List[RSAKeyPair]:
+        """
+        Claim up to ``limit`` active key pairs without a successor whose
+        rotation time has passed, moving their rotation time ``lease`` ahead
+        with one UPDATE. Rows another worker holds are skipped, and keys whose
+        rotation never completes become due again when the lease runs out.
+        Keys already past expiry are left to the expiry sweep.
+        """
+        due = (
+            select(RSAKeyPair.id)
+            .where(
+                RSAKeyPair.status == "active",
+                RSAKeyPair.successor_id.is_(None),
+                RSAKeyPair.rotate_at <= func.now(),
+                RSAKeyPair.expires_at > func.now(),
+            )
+            .order_by(RSAKeyPair.rotate_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(RSAKeyPair)
+            .where(RSAKeyPair.id.in_(due.scalar_subquery()))
+            .values(rotate_at=datetime.now(timezone.utc) + lease)
+            .returning(RSAKeyPair)
+            .execution_options(synchronize_session=False)
+        )
+        key_pairs = list(db.scalars(stmt))
+        db.commit()
+        for key_pair in key_pairs:
+            publish(RSAKeyPair.__tablename__, "update", key_pair)
+        return key_pairs
+    
+    def rotate(
+        self,
+        db: Session,
+        *,
+        key_pair: RSAKeyPair,
+        successor_in: Dict[str, Any],
+        retire_at: datetime,
+    ) -> Optional[RSAKeyPair]:
+        """
+        Insert a successor and link it from ``key_pair``, which keeps being
+        served until ``retire_at``. Returns None, writing nothing, if another
+        worker rotated the key first.
+        """
+        successor = db.scalar(insert(RSAKeyPair).values(**successor_in).returning(RSAKeyPair))
+        claimed = db.execute(
+            update(RSAKeyPair)
+            .where(RSAKeyPair.id == key_pair.id, RSAKeyPair.successor_id.is_(None))
+            .values(successor_id=successor.id, retire_at=retire_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return None
+        db.commit()
+        publish(RSAKeyPair.__tablename__, "create", successor)
+        publish(RSAKeyPair.__tablename__, "update", key_pair)
+        return successor
+    
+    def retire_due(self, db: Session, *, limit: int) -> List[Any]:
+        """Retire up to ``limit`` rotated key pairs whose overlap window has ended"""
+        due = (
+            select(RSAKeyPair.id)
+            .where(RSAKeyPair.status == "active", RSAKeyPair.retire_at <= func.now())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return self._set_status(db, set_key_pairs_status("retired", RSAKeyPair.id.in_(due.scalar_subquery())))
+
+class AsyncCRUDRSAKeyPair(AsyncCRUDBase[RSAKeyPair, RSAKeyPairCreate, RSAKeyPairUpdate]):
+    async def get_by_kid(self, db: AsyncSession, *, kid: str) -> Optional[RSAKeyPair]:
+        return await db.scalar(select(RSAKeyPair).where(RSAKeyPair.kid == kid).limit(1))
+    
+    async def get_signing_keys(self, db: AsyncSession, *, kids: Iterable[str]) -> List[Any]:
+        result = await db.execute(select(*SIGNING_COLUMNS).where(RSAKeyPair.kid.in_(set(kids))))
+        return result.all()
+    
+    async def get_active_by_tenant_id(
+        self, db: AsyncSession, *, tenant_id: Union[UUID, str]
+    ) -> List[RSAKeyPair]:
+        return list(await db.scalars(select(RSAKeyPair).where(
+            RSAKeyPair.tenant_id == tenant_id,
+            RSAKeyPair.status == "active"
+        ).order_by(RSAKeyPair.created_at, RSAKeyPair.id)))
+    
+    async def get_active_by_site_id(
+        self, db: AsyncSession, *, site_id: Union[UUID, str]
+    ) -> List[RSAKeyPair]:
+        return list(await db.scalars(select(RSAKeyPair).where(
+            RSAKeyPair.site_id == site_id,
+            RSAKeyPair.status == "active"
+        ).order_by(RSAKeyPair.created_at, RSAKeyPair.id)))
+    
+    async def create_multi(
+        self, db: AsyncSession, *, objs_in: Sequence[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if not objs_in:
+            return []
+        table = RSAKeyPair.__table__
+        result = await db.execute(insert(table).returning(*table.c), list(objs_in))
+        rows = result.mappings().all()
+        await db.commit()
+        for row in rows:
+            publish(RSAKeyPair.__tablename__, "create", row)
+        return [dict(row) for row in rows]
+    
+    async def update_status(
+        self, db: AsyncSession, *, id: Union[UUID, str], status: str
+    ) -> Optional[RSAKeyPair]:
+        key_pair = await db.scalar(status_update(status, RSAKeyPair.id == id))
+        await db.commit()
+        if key_pair is not None:
+            publish(RSAKeyPair.__tablename__, "update", key_pair)
+        return key_pair
+    
+    async def update_status_multi(
+        self,
+        db: AsyncSession,
+        *,
+        status: str,
+        tenant_id: Optional[Union[UUID, str]] = None,
+        site_id: Optional[Union[UUID, str]] = None,
+        ids: Optional[Sequence[Union[UUID, str]]] = None,
+    ) -> List[Any]:
+        criteria = selection_criteria(tenant_id, site_id, ids)
+        if not criteria:
+            raise ValueError("At least one of tenant_id, site_id or ids is required")
+        return await self._set_status(db, set_key_pairs_status(status, *status_criteria(status, *criteria)))
+    
+    async def expire_due(self, db: AsyncSession, *, limit: int) -> List[Any]:
+        return await self._set_status(db, set_key_pairs_status("expired", *expired_criteria(limit)))
+    
+    async def _set_status(self, db: AsyncSession, stmt: Update) -> List[Any]:
+        rows = (await db.execute(stmt)).all()
+        await db.commit()
+        for row in rows:
+            publish(RSAKeyPair.__tablename__, "update", row)
+        return rows
 
 rsa_key_pair = CRUDRSAKeyPair(RSAKeyPair)
+async_rsa_key_pair = AsyncCRUDRSAKeyPair(RSAKeyPair)
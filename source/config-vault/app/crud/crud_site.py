@@ -1,15 +1,51 @@
-from typing import List, Optional, Union
+from typing import Any, List, Optional, Sequence, Union
 from uuid import UUID
+from sqlalchemy import Delete, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.crud.base import CRUDBase
+from app.core.invalidation import publish
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.crud_rsa_key_pair import delete_key_pairs
+from app.models.rsa_key_pair import RSAKeyPair
 from app.models.site import Site
 from app.schemas.site import SiteCreate, SiteUpdate
 
+def delete_sites(*criteria) -> Delete:
+    """DELETE the sites matching ``criteria``, returning what invalidation needs"""
+    return delete(Site).where(*criteria).returning(Site.id, Site.tenant_id, Site.domain)
+
+def publish_removed(db_obj: Optional[Site], key_pairs: Sequence) -> None:
+    if db_obj is None:
+        return
+    publish(Site.__tablename__, "delete", db_obj)
+    for key_pair in key_pairs:
+        publish(RSAKeyPair.__tablename__, "delete", key_pair)
+
 class CRUDSite(CRUDBase[Site, SiteCreate, SiteUpdate]):
     def get_by_domain(self, db: Session, *, domain: str) -> Optional[Site]:
         return db.query(Site).filter(Site.domain == domain).first()
     
-    def get_by_tenant_id(self, db: Session, *, tenant_id: Union[UUID, str]) -> List[Site]:
-        return db.query(Site).filter(Site.tenant_id == tenant_id).all()
+    def get_domains(self, db: Session) -> List[Any]:
+        return db.execute(select(Site.id, Site.domain, Site.tenant_id, Site.is_active)).all()
+    
+    def remove(self, db: Session, *, id: Union[UUID, str]) -> Optional[Site]:
+        # Delete the site's keys with one statement instead of loading them for the ORM cascade
+        key_pairs = db.execute(delete_key_pairs(RSAKeyPair.site_id == id)).all()
+        db_obj = db.scalar(delete(Site).where(Site.id == id).returning(Site))
+        db.commit()
+        publish_removed(db_obj, key_pairs)
+        return db_obj
+
+class AsyncCRUDSite(AsyncCRUDBase[Site, SiteCreate, SiteUpdate]):
+    async def get_by_domain(self, db: AsyncSession, *, domain: str) -> Optional[Site]:
+        return await db.scalar(select(Site).where(Site.domain == domain).limit(1))
+    
+    async def remove(self, db: AsyncSession, *, id: Union[UUID, str]) -> Optional[Site]:
+        key_pairs = (await db.execute(delete_key_pairs(RSAKeyPair.site_id == id))).all()
+        db_obj = await db.scalar(delete(Site).where(Site.id == id).returning(Site))
+        await db.commit()
+        publish_removed(db_obj, key_pairs)
+        return db_obj
 
 site = CRUDSite(Site)
+async_site = AsyncCRUDSite(Site)
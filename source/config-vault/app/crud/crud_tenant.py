@@ -1,11 +1,71 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.crud.base import CRUDBase
+from typing import Any, List, Optional, Sequence, Union
+from uuid import UUID
+from sqlalchemy import Select, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.core.invalidation import publish
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.crud_rsa_key_pair import delete_key_pairs
+from app.crud.crud_site import delete_sites
+from app.models.rsa_key_pair import RSAKeyPair
+from app.models.site import Site
 from app.models.tenant import Tenant
 from app.schemas.tenant import TenantCreate, TenantUpdate
 
+def publish_removed(db_obj: Optional[Tenant], sites: Sequence, key_pairs: Sequence) -> None:
+    if db_obj is None:
+        return
+    publish(Tenant.__tablename__, "delete", db_obj)
+    for site in sites:
+        publish(Site.__tablename__, "delete", site)
+    for key_pair in key_pairs:
+        publish(RSAKeyPair.__tablename__, "delete", key_pair)
+
+def bundle_query(ids: Sequence[Union[UUID, str]]) -> Select:
+    """Tenants with only their active sites and active keys, in three queries whatever their size"""
+    return (
+        select(Tenant)
+        .where(Tenant.id.in_(ids))
+        .options(
+            selectinload(Tenant.sites.and_(Site.is_active.is_(True))),
+            selectinload(Tenant.rsa_keys.and_(RSAKeyPair.status == "active")),
+        )
+    )
+
 class CRUDTenant(CRUDBase[Tenant, TenantCreate, TenantUpdate]):
     def get_by_domain(self, db: Session, *, domain: str) -> Optional[Tenant]:
         return db.query(Tenant).filter(Tenant.domain == domain).first()
+    
+    def get_domains(self, db: Session) -> List[Any]:
+        return db.execute(select(Tenant.id, Tenant.domain, Tenant.is_active)).all()
+    
+    def get_bundles(self, db: Session, *, ids: Sequence[Union[UUID, str]]) -> List[Tenant]:
+        return list(db.scalars(bundle_query(ids)))
+    
+    def remove(self, db: Session, *, id: Union[UUID, str]) -> Optional[Tenant]:
+        # Delete the tenant's keys and sites with one statement each instead of
+        # loading them for the ORM cascade
+        key_pairs = db.execute(delete_key_pairs(RSAKeyPair.tenant_id == id)).all()
+        sites = db.execute(delete_sites(Site.tenant_id == id)).all()
+        db_obj = db.scalar(delete(Tenant).where(Tenant.id == id).returning(Tenant))
+        db.commit()
+        publish_removed(db_obj, sites, key_pairs)
+        return db_obj
+
+class AsyncCRUDTenant(AsyncCRUDBase[Tenant, TenantCreate, TenantUpdate]):
+    async def get_by_domain(self, db: AsyncSession, *, domain: str) -> Optional[Tenant]:
+        return await db.scalar(select(Tenant).where(Tenant.domain == domain).limit(1))
+    
+    async def get_bundles(self, db: AsyncSession, *, ids: Sequence[Union[UUID, str]]) -> List[Tenant]:
+        return list(await db.scalars(bundle_query(ids)))
+    
+    async def remove(self, db: AsyncSession, *, id: Union[UUID, str]) -> Optional[Tenant]:
+        key_pairs = (await db.execute(delete_key_pairs(RSAKeyPair.tenant_id == id))).all()
+        sites = (await db.execute(delete_sites(Site.tenant_id == id))).all()
+        db_obj = await db.scalar(delete(Tenant).where(Tenant.id == id).returning(Tenant))
+        await db.commit()
+        publish_removed(db_obj, sites, key_pairs)
+        return db_obj
 
 tenant = CRUDTenant(Tenant)
+async_tenant = AsyncCRUDTenant(Tenant)
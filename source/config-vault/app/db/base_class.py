@@ -1,3 +1,11 @@
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql import functions
 
 Base = declarative_base()
+
+@compiles(functions.now, "sqlite")
+def sqlite_now(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP has no fractional part, so server-side timestamps
+    # would not compare correctly against bound datetimes (stored with microseconds)
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'NOW')"
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Optional, Type
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+CHECKOUT_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+class PoolStats:
+    """Counters for one engine's connection pool, fed by pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(CHECKOUT_WAIT_BUCKETS) + 1)
+
+    def incr(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for index, bound in enumerate(CHECKOUT_WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[index] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            data = {
+                "pool_class": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "timeouts": self.timeouts,
+                "checkout_wait": {
+                    "count": self.wait_count,
+                    "total_seconds": self.wait_total,
+                    "max_seconds": self.wait_max,
+                    "buckets": {
+                        **{str(bound): count for bound, count in zip(CHECKOUT_WAIT_BUCKETS, self.wait_buckets)},
+                        "+Inf": self.wait_buckets[-1],
+                    },
+                },
+            }
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                in_use=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return data
+
+def timed_pool_class(base: Type[QueuePool], stats: PoolStats) -> Type[QueuePool]:
+    """
+    Subclass a queue pool so that the time spent waiting for a connection is
+    recorded. SQLAlchemy has no event for the start of a checkout, so the
+    wait is measured around ``_do_get``.
+    """
+
+    class TimedQueuePool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                stats.incr("timeouts")
+                raise
+            finally:
+                stats.record_wait(time.perf_counter() - start)
+
+    TimedQueuePool.__name__ = f"Timed{base.__name__}"
+    return TimedQueuePool
+
+def instrument_engine(engine: Engine, stats: Optional[PoolStats] = None) -> PoolStats:
+    """Attach pool event listeners that feed ``stats``"""
+    stats = stats or PoolStats()
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr("checkouts")
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidations")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("soft_invalidations")
+
+    return stats
@@ -1,6 +1,69 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import time_statements
+from app.db.pool import PoolStats, instrument_engine, timed_pool_class
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(
+        hide_password=False
+    )
+
+def get_engine_options(database_url: str, stats: PoolStats, *, is_async: bool = False) -> dict:
+    """Build pool and connection options for an engine from settings"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    
+    # In-memory SQLite keeps its single-connection pool
+    if backend != "sqlite" or url.database not in (None, "", ":memory:"):
+        base_pool = AsyncAdaptedQueuePool if is_async else QueuePool
+        options.update(
+            poolclass=timed_pool_class(base_pool, stats),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+pool_stats = PoolStats()
+engine = create_engine(settings.DATABASE_URL, **get_engine_options(settings.DATABASE_URL, pool_stats))
+instrument_engine(engine, pool_stats)
+# Statements are always counted, for metrics, profiles and query budgets
+time_statements(engine)
+# Write paths load rows with RETURNING, so committing must not expire them
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# The async engine is only built when enabled, so its driver stays optional
+async_pool_stats = PoolStats()
+async_engine = None
+if settings.DB_ASYNC:
+    async_database_url = get_async_database_url()
+    async_engine = create_async_engine(
+        async_database_url,
+        **get_engine_options(async_database_url, async_pool_stats, is_async=True),
+    )
+    instrument_engine(async_engine.sync_engine, async_pool_stats)
+    time_statements(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
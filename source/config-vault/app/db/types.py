@@ -0,0 +1,76 @@
+import base64
+from typing import Optional, Union
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+PEM_PREFIX = b"-----BEGIN "
+
+def pem_label(pem: str) -> str:
+    """The label of a PEM document, e.g. "RSA PRIVATE KEY" for a PKCS#1 private key"""
+    first_line = pem.strip().split("\n", 1)[0].strip()
+    return first_line[len("-----BEGIN "):-len("-----")]
+
+def pem_to_der(pem: str) -> bytes:
+    """Body of a single-block PEM document, decoded"""
+    lines = pem.strip().splitlines()
+    return base64.b64decode("".join(lines[1:-1]), validate=True)
+
+def key_to_der(pem: str, label: str) -> bytes:
+    """
+    DER of a PEM key in the format ``label`` stands for: PKCS#8 for "PRIVATE
+    KEY", SubjectPublicKeyInfo for "PUBLIC KEY". Other key formats, such as
+    PKCS#1, are converted, since DER carries no label to read them back by.
+    """
+    if pem_label(pem) == label:
+        return pem_to_der(pem)
+    if label == "PRIVATE KEY":
+        private_key = serialization.load_pem_private_key(
+            pem.encode("utf-8"), password=None, unsafe_skip_rsa_key_validation=True
+        )
+        return private_key.private_bytes(
+            serialization.Encoding.DER, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+    if label == "PUBLIC KEY":
+        public_key = serialization.load_pem_public_key(pem.encode("utf-8"))
+        return public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    raise ValueError(f"Cannot store a {pem_label(pem)} as DER {label}")
+
+def der_to_pem(der: bytes, label: str) -> str:
+    """PEM with 64 character lines, byte for byte what ``cryptography`` writes"""
+    body = base64.b64encode(der).decode("ascii")
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return "\n".join([f"-----BEGIN {label}-----", *lines, f"-----END {label}-----", ""])
+
+class KeyMaterial(TypeDecorator):
+    """
+    A PEM key stored as bytes, either as the PEM text or as DER.
+
+    ``storage_format`` only applies to writes: rows in either format read
+    back as the same PEM string, so the format can be changed at any time
+    and existing rows converted later. DER rows read back labelled with
+    ``label``, so keys in other formats are converted to it when written.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, label: str, storage_format: str = "pem"):
+        super().__init__()
+        self.label = label
+        self.storage_format = storage_format
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        if self.storage_format == "der":
+            return key_to_der(value, self.label)
+        return value.encode("utf-8")
+
+    def process_result_value(self, value: Optional[Union[bytes, str]], dialect) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        if value.startswith(PEM_PREFIX):
+            return value.decode("utf-8")
+        return der_to_pem(value, self.label)
@@ -1,17 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.api.api_v1.api import api_router
+from app.core.cache_warming import start_cache_warming
 from app.core.config import settings
-from app.db.base import Base
-from app.db.session import engine
+from app.core.domain_index import domain_index
+from app.core.invalidation import invalidation_bus
+from app.core.key_expiry import key_expiry_sweeper
+from app.core.key_generation import shutdown_executor
+from app.core.key_pool import key_pool
+from app.core.key_rotation import key_rotation_scheduler
+from app.core.key_snapshot import key_snapshot
+from app.core.metrics import METRICS_CONTENT_TYPE, MetricsMiddleware, mark_process_dead, render_metrics
+from app.core.profiling import ProfilingMiddleware, profiling_enabled
+from app.core.signing import shutdown_signing_executor
+from app.db.session import async_engine, engine
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start background workers without touching the database. The schema is
+    managed by migrations (``alembic upgrade head``), pooled connections are
+    opened on first use and caches are warmed in the background.
+    """
+    invalidation_bus.start()
+    # The key pool warms up in its own thread while requests are already served
+    if settings.KEY_POOL_ENABLED:
+        key_pool.start()
+    if settings.DOMAIN_INDEX_BUILD_ON_STARTUP:
+        domain_index.start()
+    if settings.CACHE_WARM_ON_STARTUP:
+        start_cache_warming()
+    if settings.KEY_EXPIRY_SWEEP_ENABLED:
+        key_expiry_sweeper.start()
+    if settings.KEY_ROTATION_ENABLED:
+        key_rotation_scheduler.start()
+    if settings.KEY_SNAPSHOT_ENABLED:
+        key_snapshot.start()
+    try:
+        yield
+    finally:
+        key_snapshot.stop()
+        key_rotation_scheduler.stop()
+        key_expiry_sweeper.stop()
+        key_pool.stop()
+        shutdown_executor()
+        shutdown_signing_executor()
+        invalidation_bus.stop()
+        mark_process_dead()
+        # Close pooled connections so drivers with worker threads let the process exit
+        if async_engine is not None:
+            await async_engine.dispose()
+        engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse,
 )
 
 # Set all CORS enabled origins
@@ -25,8 +73,21 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Profiles and query budgets see the statements of the whole request
+if profiling_enabled() or settings.QUERY_BUDGET_MODE != "off":
+    app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so the latency it records includes CORS handling
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "config-vault"}
\ No newline at end of file
+    return {"status": "healthy", "service": "config-vault"}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        return Response(render_metrics(), headers={"Content-Type": METRICS_CONTENT_TYPE})
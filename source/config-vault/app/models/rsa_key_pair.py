@@ -1,21 +1,56 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Uuid, text
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 import uuid
+from app.core.config import settings
 from app.db.base_class import Base
+from app.db.types import KeyMaterial
 
 class RSAKeyPair(Base):
     __tablename__ = "rsa_key_pairs"
+    __table_args__ = (
+        # Keyset pagination order for the per-tenant and per-site listings
+        Index("ix_rsa_key_pairs_tenant_id_created_at_id", "tenant_id", "created_at", "id"),
+        Index("ix_rsa_key_pairs_site_id_created_at_id", "site_id", "created_at", "id"),
+        # Only active keys can expire, so the expiry sweep only needs those
+        Index(
+            "ix_rsa_key_pairs_active_expires_at",
+            "status",
+            "expires_at",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+        # Keys still waiting for a successor, in rotation order
+        Index(
+            "ix_rsa_key_pairs_pending_rotate_at",
+            "rotate_at",
+            postgresql_where=text("status = 'active' AND successor_id IS NULL"),
+            sqlite_where=text("status = 'active' AND successor_id IS NULL"),
+        ),
+        Index(
+            "ix_rsa_key_pairs_active_retire_at",
+            "retire_at",
+            postgresql_where=text("status = 'active' AND retire_at IS NOT NULL"),
+            sqlite_where=text("status = 'active' AND retire_at IS NOT NULL"),
+        ),
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     kid = Column(String(255), unique=True, nullable=False, index=True)
-    private_key = Column(Text, nullable=False)
-    public_key = Column(Text, nullable=False)
-    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
-    site_id = Column(UUID(as_uuid=True), ForeignKey("sites.id"), nullable=True)  # None for tenant-level keys
+    # PEM in the API, PEM or DER in the database depending on KEY_STORAGE_FORMAT.
+    # The private key is deferred: listings never load it, and the paths that
+    # sign with or return it select it explicitly.
+    private_key = deferred(Column(KeyMaterial("PRIVATE KEY", settings.KEY_STORAGE_FORMAT), nullable=False))
+    public_key = Column(KeyMaterial("PUBLIC KEY", settings.KEY_STORAGE_FORMAT), nullable=False)
+    tenant_id = Column(Uuid(as_uuid=True), ForeignKey("tenants.id"), nullable=False)
+    site_id = Column(Uuid(as_uuid=True), ForeignKey("sites.id"), nullable=True)  # None for tenant-level keys
     status = Column(String(50), default="active")
     expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Rotation: when a successor is due, which key replaced this one, and when
+    # this key stops being served once the overlap with its successor ends
+    rotate_at = Column(DateTime(timezone=True), nullable=True)
+    successor_id = Column(Uuid(as_uuid=True), ForeignKey("rsa_key_pairs.id", ondelete="SET NULL"), nullable=True)
+    retire_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
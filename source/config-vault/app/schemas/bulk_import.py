@@ -0,0 +1,15 @@
+from typing import List
+from pydantic import BaseModel
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResult(BaseModel):
+    entity: str
+    imported: int = 0
+    failed: int = 0
+    # First row that was not processed, pass it as ``start_row`` to resume
+    next_row: int = 1
+    # The first IMPORT_MAX_ERRORS failures, ``failed`` counts all of them
+    errors: List[ImportRowError] = []
@@ -0,0 +1,16 @@
+from typing import List
+from app.schemas.rsa_key_pair import RSAKeyPair
+from app.schemas.site import Site
+from app.schemas.tenant import Tenant
+
+class SiteBundle(Site):
+    """An active site with its active public keys"""
+    keys: List[RSAKeyPair] = []
+
+class TenantBundle(Tenant):
+    """
+    What a node needs to serve a tenant: its active sites and the active
+    public keys of the tenant itself (``keys``) and of each site
+    """
+    sites: List[SiteBundle] = []
+    keys: List[RSAKeyPair] = []
@@ -0,0 +1,13 @@
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+class DomainResolution(BaseModel):
+    """The tenant or site a domain belongs to, with the kids of its active keys"""
+    domain: str
+    # The indexed domain that matched, e.g. ``*.tenant.com`` for a wildcard match
+    matched: str
+    tenant_id: UUID
+    site_id: Optional[UUID] = None
+    is_active: bool
+    kids: List[str]
@@ -1,16 +1,106 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, List, Literal, Optional
 from uuid import UUID
-from pydantic import BaseModel
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from pydantic import BaseModel, model_validator
 
 class RSAKeyPairBase(BaseModel):
     tenant_id: UUID
     site_id: Optional[UUID] = None
     expires_in_days: int = 365
+    key_size: Literal[2048, 3072, 4096] = 2048
 
 class RSAKeyPairCreate(RSAKeyPairBase):
     pass
 
+class RSAKeyPairImport(BaseModel):
+    """
+    A key pair row of a bulk import, whose keys must be one unencrypted PEM
+    RSA key pair. Rotation state is not imported, the scheduler gives
+    imported keys a new rotation time.
+    """
+    id: Optional[UUID] = None
+    kid: str
+    private_key: str
+    public_key: str
+    tenant_id: UUID
+    site_id: Optional[UUID] = None
+    status: str = "active"
+    expires_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_keys(self) -> "RSAKeyPairImport":
+        # Only parsed: the keys' mathematical validity is not checked, as that is slow
+        private_key = load_rsa_key(
+            "private_key",
+            serialization.load_pem_private_key,
+            self.private_key,
+            password=None,
+            unsafe_skip_rsa_key_validation=True,
+        )
+        public_key = load_rsa_key("public_key", serialization.load_pem_public_key, self.public_key)
+        if private_key.public_key().public_numbers() != public_key.public_numbers():
+            raise ValueError("public_key does not belong to private_key")
+        return self
+
+def load_rsa_key(field: str, load: Callable, pem: str, **options) -> Any:
+    """Parse a PEM RSA key with ``load``, raising ValueError naming ``field`` for anything else"""
+    try:
+        key = load(pem.encode("utf-8"), **options)
+    except (TypeError, ValueError, UnsupportedAlgorithm):
+        raise ValueError(f"{field} is not an unencrypted PEM key") from None
+    if not isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        raise ValueError(f"{field} is not an RSA key")
+    return key
+
+class RSAKeyPairUpdate(BaseModel):
+    status: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+class RSAKeyPairSelection(BaseModel):
+    """Key pairs matching every given selector"""
+    tenant_id: Optional[UUID] = None
+    site_id: Optional[UUID] = None
+    ids: Optional[List[UUID]] = None
+
+    @model_validator(mode="after")
+    def check_selector(self) -> "RSAKeyPairSelection":
+        if self.tenant_id is None and self.site_id is None and self.ids is None:
+            raise ValueError("At least one of tenant_id, site_id or ids is required")
+        return self
+
+class RSAKeyPairStatusChange(BaseModel):
+    status: str
+    count: int
+    kids: List[str]
+
+SigningAlgorithm = Literal["RS256", "RS384", "RS512", "PS256", "PS384", "PS512"]
+
+class SignRequest(BaseModel):
+    """Bytes to sign, given as text or as base64url"""
+    data: str
+    encoding: Literal["utf-8", "base64url"] = "utf-8"
+    algorithm: SigningAlgorithm = "RS256"
+
+class SignBatchItem(SignRequest):
+    kid: str
+
+class SignResponse(BaseModel):
+    kid: str
+    algorithm: SigningAlgorithm
+    # base64url without padding, as in a JWS
+    signature: str
+
+class SignBatchResult(BaseModel):
+    kid: str
+    algorithm: SigningAlgorithm
+    signature: Optional[str] = None
+    error: Optional[str] = None
+
 class RSAKeyPairInDBBase(BaseModel):
     id: UUID
     kid: str
@@ -19,6 +109,9 @@ class RSAKeyPairInDBBase(BaseModel):
     site_id: Optional[UUID] = None
     status: str
     expires_at: Optional[datetime] = None
+    rotate_at: Optional[datetime] = None
+    successor_id: Optional[UUID] = None
+    retire_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -12,6 +12,12 @@ class SiteBase(BaseModel):
 class SiteCreate(SiteBase):
     pass
 
+class SiteImport(SiteBase):
+    """A site row of a bulk import, keeping its id and timestamps when given"""
+    id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class SiteUpdate(BaseModel):
     name: Optional[str] = None
     domain: Optional[str] = None
@@ -11,6 +11,12 @@ class TenantBase(BaseModel):
 class TenantCreate(TenantBase):
     pass
 
+class TenantImport(TenantBase):
+    """A tenant row of a bulk import, keeping its id and timestamps when given"""
+    id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class TenantUpdate(BaseModel):
     name: Optional[str] = None
     domain: Optional[str] = None
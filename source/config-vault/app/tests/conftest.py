@@ -0,0 +1,60 @@
+"""
+Settings are read when ``app`` is first imported, so the test database and
+the background worker switches are set here, before any test module imports
+it. Tests share one migrated SQLite database and create their own tenants.
+"""
+import os
+import tempfile
+import uuid
+from pathlib import Path
+import pytest
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+TEST_DIR = tempfile.mkdtemp(prefix="config-vault-tests-")
+
+for name, value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    "DB_ASYNC": "false",
+    "KEY_POOL_ENABLED": "false",
+    "KEY_GENERATION_EXECUTOR": "thread",
+    "KEY_EXPIRY_SWEEP_ENABLED": "false",
+    "KEY_ROTATION_ENABLED": "false",
+    "DOMAIN_INDEX_BUILD_ON_STARTUP": "false",
+    "CACHE_WARM_ON_STARTUP": "false",
+    "INVALIDATION_BACKEND": "memory",
+    "QUERY_BUDGET_MODE": "off",
+}.items():
+    os.environ.setdefault(name, value)
+
+API = "/config-vault/v1"
+
+@pytest.fixture(scope="session")
+def client():
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # Without alembic.ini, so its logging configuration leaves the app's loggers alone
+    config = Config()
+    config.set_main_option("script_location", str(SERVICE_ROOT / "alembic"))
+    command.upgrade(config, "head")
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db(client):
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        yield db
+
+@pytest.fixture
+def tenant(client):
+    """A new tenant with one site, under unique domains"""
+    name = uuid.uuid4().hex[:12]
+    tenant = client.post(f"{API}/tenants/", json={"name": name, "domain": f"{name}.test"}).json()
+    site = client.post(
+        f"{API}/sites/", json={"name": name, "domain": f"www.{name}.test", "tenant_id": tenant["id"]}
+    ).json()
+    return {**tenant, "site": site}
@@ -0,0 +1,86 @@
+"""
+Async database stack. The same requests must give the same results with
+DB_ASYNC on and off, through the async engine, sessions and CRUD.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+SCENARIO = """
+import json
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from app.core.key_generation import KeyGenerationService
+from app.core.key_pool import key_pool
+from app.db.session import async_engine
+from app.main import app
+
+command.upgrade(Config("alembic.ini"), "head")
+P = "/config-vault/v1"
+key_pair = KeyGenerationService.generate_rsa_key_pair()
+
+async def get_async(key_size):
+    return key_pair
+
+key_pool.get_async = get_async
+results = {"async_engine": async_engine is not None}
+
+def record(name, response, pick=lambda body: body):
+    results[name] = [response.status_code, pick(response.json()) if response.content else None]
+    return response.json() if response.content else None
+
+with TestClient(app) as client:
+    tenant = record("create tenant", client.post(P + "/tenants/", json={"name": "t", "domain": "t.com"}), lambda b: b["domain"])
+    record("duplicate domain", client.post(P + "/tenants/", json={"name": "u", "domain": "t.com"}), lambda b: bool(b["detail"]))
+    site = record("create site", client.post(P + "/sites/", json={"name": "s", "domain": "s.t.com", "tenant_id": tenant["id"]}), lambda b: b["domain"])
+    keys = [client.post(P + "/keys/", json={"tenant_id": tenant["id"], "site_id": site["id"] if i else None}).json() for i in range(3)]
+    record("key by kid", client.get(P + f"/keys/{keys[0]['kid']}"), lambda b: [b["status"], b["tenant_id"] == tenant["id"], "private_key" in b])
+    record("unknown site key", client.post(P + "/keys/", json={"tenant_id": tenant["id"], "site_id": tenant["id"]}), lambda b: b["detail"])
+    first = client.get(P + f"/keys/tenant/{tenant['id']}?limit=2&include_total=true")
+    rest = client.get(P + f"/keys/tenant/{tenant['id']}?limit=2&cursor={first.headers['x-next-cursor']}")
+    results["key pages"] = [len(first.json()), first.headers["x-total-count"], len(rest.json()), "x-next-cursor" in rest.headers]
+    record("bulk revoke", client.post(P + "/keys/bulk/revoke", json={"site_id": site["id"]}), lambda b: [b["status"], b["count"]])
+    record("active", client.get(P + f"/keys/tenant/{tenant['id']}/active"), lambda b: [k["kid"] for k in b] == [keys[0]["kid"]])
+    record("update tenant", client.put(P + f"/tenants/{tenant['id']}", json={"name": "t2"}), lambda b: [b["name"], b["domain"]])
+    record("delete tenant", client.delete(P + f"/tenants/{tenant['id']}"), lambda b: b["name"])
+    record("deleted tenant", client.get(P + f"/tenants/{tenant['id']}"), lambda b: b["detail"])
+    record("deleted key", client.get(P + f"/keys/{keys[1]['kid']}"), lambda b: b["detail"])
+print(json.dumps(results))
+"""
+
+def run_scenario(tmp_path: Path, *, db_async: bool) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / f'async-{db_async}.db'}",
+        "DB_ASYNC": str(db_async).lower(),
+        "KEY_POOL_ENABLED": "false",
+        "KEY_EXPIRY_SWEEP_ENABLED": "false",
+        "KEY_ROTATION_ENABLED": "false",
+        "DOMAIN_INDEX_BUILD_ON_STARTUP": "false",
+        "INVALIDATION_BACKEND": "memory",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", SCENARIO],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_async_stack_gives_the_same_results_as_the_sync_one(tmp_path):
+    sync = run_scenario(tmp_path, db_async=False)
+    async_ = run_scenario(tmp_path, db_async=True)
+    assert not sync.pop("async_engine") and async_.pop("async_engine")
+    assert async_ == sync
+    assert sync["bulk revoke"] == [200, ["revoked", 2]]
+    assert sync["key pages"] == [2, "3", 1, False]
+    assert sync["deleted key"][0] == 404
@@ -0,0 +1,83 @@
+"""
+Tenant bundles. A bundle holds the tenant, its active sites by domain and
+the active public keys of each by kid, is cached until one of them changes
+and answers a matching ``If-None-Match`` with a 304.
+"""
+import uuid
+import pytest
+from app import crud
+from app.core.bundle import bundle_cache
+from app.core.config import settings
+from app.tests.conftest import API
+
+@pytest.fixture
+def bundle_tenant(client, tenant):
+    """The tenant with a second and an inactive site, and keys for the tenant and each site"""
+    name = tenant["name"]
+    second = client.post(
+        f"{API}/sites/", json={"name": name, "domain": f"api.{name}.test", "tenant_id": tenant["id"]}
+    ).json()
+    inactive = client.post(
+        f"{API}/sites/",
+        json={"name": name, "domain": f"old.{name}.test", "tenant_id": tenant["id"], "is_active": False},
+    ).json()
+    owners = [None, None, tenant["site"]["id"], second["id"], inactive["id"]]
+    keys = client.post(
+        f"{API}/keys/batch", json=[{"tenant_id": tenant["id"], "site_id": site_id} for site_id in owners]
+    ).json()
+    return {**tenant, "sites": [second, tenant["site"], inactive], "keys": keys}
+
+def public(client, keys) -> list:
+    """What GET /keys/{kid} returns for ``keys``, in kid order"""
+    return [client.get(f"{API}/keys/{key['kid']}").json() for key in sorted(keys, key=lambda key: key["kid"])]
+
+def test_bundle_holds_active_sites_and_public_keys(client, bundle_tenant):
+    bundle = client.get(f"{API}/tenants/{bundle_tenant['id']}/bundle").json()
+    tenant_fields = {name: value for name, value in bundle.items() if name not in ("sites", "keys")}
+    assert tenant_fields == client.get(f"{API}/tenants/{bundle_tenant['id']}").json()
+    second, site, _ = bundle_tenant["sites"]
+    keys = bundle_tenant["keys"]
+    assert [item["id"] for item in bundle["sites"]] == [second["id"], site["id"]]
+    assert bundle["keys"] == public(client, keys[:2])
+    assert bundle["sites"][0]["keys"] == public(client, keys[3:4])
+    assert bundle["sites"][1]["keys"] == public(client, keys[2:3])
+    assert all("private_key" not in key for key in bundle["keys"])
+
+def test_bundle_changes_when_a_key_is_revoked(client, bundle_tenant):
+    path = f"{API}/tenants/{bundle_tenant['id']}/bundle"
+    response = client.get(path)
+    assert response.headers["cache-control"] == f"private, max-age={settings.TENANT_BUNDLE_MAX_AGE_SECONDS}"
+    etag = response.headers["etag"]
+    assert bundle_cache.get(bundle_tenant["id"]).etag == etag
+    cached = client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag
+    client.post(f"{API}/keys/{bundle_tenant['keys'][0]['id']}/revoke")
+    assert bundle_cache.get(bundle_tenant["id"]) is None
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert response.json()["keys"] == public(client, bundle_tenant["keys"][1:2])
+
+def test_bundles_follow_the_requested_order(client, bundle_tenant):
+    other = client.post(
+        f"{API}/tenants/", json={"name": "other", "domain": f"{uuid.uuid4().hex[:12]}.test"}
+    ).json()
+    missing = str(uuid.uuid4())
+    ids = [other["id"], missing, bundle_tenant["id"], other["id"]]
+    response = client.get(f"{API}/tenants/bundles", params={"ids": ids})
+    singles = [client.get(f"{API}/tenants/{id}/bundle").content for id in (other["id"], bundle_tenant["id"])]
+    assert response.content == b"[" + b",".join(singles) + b"]"
+    assert client.get(f"{API}/tenants/{missing}/bundle").status_code == 404
+
+def test_bundles_are_limited_in_number(client, monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_BUNDLE_MAX_IDS", 1)
+    ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    assert client.get(f"{API}/tenants/bundles", params={"ids": ids}).status_code == 400
+
+def test_bundles_loaded_before_an_invalidation_are_not_cached(db, tenant):
+    generation = bundle_cache.generation
+    bundle_cache.invalidate(tenant["id"])
+    (loaded,) = crud.tenant.get_bundles(db, ids=[uuid.UUID(tenant["id"])])
+    document = bundle_cache.put(loaded, generation)
+    assert document.body.startswith(b'{"name":') and bundle_cache.get(tenant["id"]) is None
+    bundle_cache.put(loaded, bundle_cache.generation)
+    assert bundle_cache.get(tenant["id"]) == document
@@ -0,0 +1,39 @@
+"""
+Shared cache building blocks. Weighted caches stay under their weight, a
+generation cache drops values loaded before an invalidation, and every
+component's counters are served under /stats.
+"""
+import pytest
+from app.api.api_v1.endpoints.stats import STATS_SOURCES
+from app.core.cache import GenerationCache, TTLCache
+from app.tests.conftest import API
+
+def test_weighted_caches_evict_by_weight():
+    evicted = []
+    cache = TTLCache(max_size=None, weigh=len, max_weight=5, on_evict=lambda key, value: evicted.append(key))
+    cache.set("a", "xx")
+    cache.set("b", "xx")
+    cache.set("c", "xx")
+    assert evicted == ["a"] and cache.get("a") is None
+    cache.set("b", "x")
+    assert cache.stats()["weight"] == 3
+    # Too heavy to ever fit, and replacing drops the old value
+    cache.set("c", "xxxxxx")
+    assert cache.get("c") is None and cache.stats()["weight"] == 1
+
+def test_values_loaded_before_an_invalidation_are_not_stored():
+    cache = GenerationCache(max_size=10)
+    generation = cache.generation
+    cache.invalidate("other")
+    assert not cache.put("key", "stale", generation)
+    assert cache.get("key") is None
+    assert cache.put("key", "fresh", cache.generation) and cache.get("key") == "fresh"
+    generation = cache.generation
+    cache.clear()
+    assert not cache.put("key", "stale", generation)
+    assert cache.stats()["invalidations"] == 1
+
+@pytest.mark.parametrize("path", [path for path, _, _ in STATS_SOURCES])
+def test_stats_routes_serve_their_counters(client, path):
+    response = client.get(f"{API}/stats/{path}")
+    assert response.status_code == 200 and isinstance(response.json(), dict)
@@ -0,0 +1,31 @@
+"""
+Cache warming. The active keys fill the kid cache and the JWKS documents of
+their tenants and sites, and keys changed while warming are left out.
+"""
+import json
+from app.core.cache import MISSING
+from app.core.cache_warming import warm_caches
+from app.core.jwks import jwks_cache
+from app.core.kid_cache import kid_cache
+from app.tests.conftest import API
+
+def test_active_keys_warm_the_kid_and_jwks_caches(client, tenant):
+    site_id = tenant["site"]["id"]
+    keys = [
+        client.post(f"{API}/keys/", json={"tenant_id": tenant["id"], "site_id": site_id}).json(),
+        client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json(),
+        client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json(),
+    ]
+    client.post(f"{API}/keys/{keys[2]['id']}/revoke")
+    expected = client.get(f"{API}/keys/{keys[0]['kid']}").json()
+    kid_cache.clear()
+    jwks_cache.clear()
+    assert warm_caches(batch_size=2) >= 2
+    assert kid_cache.get(keys[0]["kid"]).model_dump(mode="json") == expected
+    assert kid_cache.get(keys[2]["kid"]) is MISSING
+    tenant_kids = [jwk["kid"] for jwk in json.loads(jwks_cache.get("tenant", tenant["id"]).body)["keys"]]
+    assert tenant_kids == sorted(key["kid"] for key in keys[:2])
+    site_kids = [jwk["kid"] for jwk in json.loads(jwks_cache.get("site", site_id).body)["keys"]]
+    assert site_kids == [keys[0]["kid"]]
+    response = client.get(f"{API}/keys/site/{site_id}/jwks")
+    assert response.headers["etag"] == jwks_cache.get("site", site_id).etag
@@ -0,0 +1,64 @@
+"""
+Connection pool instrumentation. Checkouts, check-ins, invalidations and
+checkout waits, including timeouts of an exhausted pool, are counted per
+engine and reported by the stats endpoint.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from app.db.pool import PoolStats, instrument_engine, timed_pool_class
+from app.db.session import get_engine_options
+from app.tests.conftest import API, TEST_DIR
+
+def make_engine(stats: PoolStats, **options):
+    engine = create_engine(
+        f"sqlite:///{TEST_DIR}/pool.db",
+        poolclass=timed_pool_class(QueuePool, stats),
+        **options,
+    )
+    instrument_engine(engine, stats)
+    return engine
+
+def test_checkouts_and_invalidations_are_counted():
+    stats = PoolStats()
+    engine = make_engine(stats, pool_size=2, max_overflow=0)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    with engine.connect() as connection:
+        connection.invalidate()
+    # The invalidated connection is replaced on the next checkout
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["pool_class"] == "TimedQueuePool"
+    assert (snapshot["connects"], snapshot["checkouts"], snapshot["checkins"]) == (2, 3, 3)
+    assert snapshot["invalidations"] == 1
+    assert snapshot["checkout_wait"]["count"] == 3
+    assert sum(snapshot["checkout_wait"]["buckets"].values()) == 3
+    assert (snapshot["size"], snapshot["in_use"]) == (2, 0)
+
+def test_exhausted_pool_counts_a_timeout():
+    stats = PoolStats()
+    engine = make_engine(stats, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect():
+        assert stats.snapshot(engine.pool)["in_use"] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checkout_wait"]["max_seconds"] >= 0.05
+
+def test_engine_options_follow_settings():
+    options = get_engine_options("postgresql://db/config_vault", PoolStats())
+    assert options["pool_size"] == 5 and options["max_overflow"] == 10
+    assert options["pool_pre_ping"] is True
+    # In-memory SQLite keeps its own single connection pool
+    assert "poolclass" not in get_engine_options("sqlite://", PoolStats())
+
+def test_stats_endpoint_reports_the_sync_pool(client):
+    client.get(f"{API}/tenants/")
+    stats = client.get(f"{API}/stats/db-pool").json()
+    assert stats["sync"]["pool_class"] == "TimedQueuePool"
+    assert stats["sync"]["checkouts"] >= 1
+    assert "async" not in stats
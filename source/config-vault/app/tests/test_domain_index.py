@@ -0,0 +1,104 @@
+"""
+Domain resolution. Exact domains win over wildcards, the most specific
+wildcard wins over shorter ones, a wildcard never matches its own apex, and
+sites win over tenants with the same domain.
+"""
+import uuid
+import pytest
+from app.core.domain_index import DomainIndexState, DomainTarget, normalize_domain
+from app.core.invalidation import InvalidationEvent
+from app.tests.conftest import API
+
+def tenant_target(domain: str, tenant_id: str = "t1") -> DomainTarget:
+    return DomainTarget(domain, tenant_id, None, True)
+
+def site_target(domain: str, site_id: str = "s1") -> DomainTarget:
+    return DomainTarget(domain, "t1", site_id, True)
+
+def matched(state: DomainIndexState, domain: str):
+    resolution = state.resolve(domain)
+    return resolution.target.domain if resolution is not None else None
+
+@pytest.fixture
+def state() -> DomainIndexState:
+    state = DomainIndexState()
+    state.put("tenants", "t1", tenant_target("*.shop.com"))
+    state.put("sites", "s1", site_target("www.shop.com"))
+    state.put("sites", "s2", site_target("*.eu.shop.com", "s2"))
+    state.put("tenants", "t2", tenant_target("*.com", "t2"))
+    return state
+
+@pytest.mark.parametrize("domain, expected", [
+    ("www.shop.com", "www.shop.com"),
+    ("a.shop.com", "*.shop.com"),
+    ("a.b.c.shop.com", "*.shop.com"),
+    ("a.eu.shop.com", "*.eu.shop.com"),
+    ("a.b.eu.shop.com", "*.eu.shop.com"),
+    # Apexes fall back to the next wildcard up
+    ("eu.shop.com", "*.shop.com"),
+    ("shop.com", "*.com"),
+    ("other.com", "*.com"),
+    ("com", None),
+    ("shop.org", None),
+    # A lookup for the wildcard itself is an exact match
+    ("*.shop.com", "*.shop.com"),
+])
+def test_most_specific_match_wins(state, domain, expected):
+    assert matched(state, domain) == expected
+
+def test_domains_are_normalized():
+    assert normalize_domain(" WWW.Shop.com.:8443 ") == "www.shop.com"
+    assert normalize_domain("shop.com:http") == "shop.com:http"
+    state = DomainIndexState()
+    state.put("sites", "s1", site_target("www.shop.com"))
+    assert matched(state, "WWW.SHOP.COM.:443") == "www.shop.com"
+
+def test_sites_win_over_tenants_with_the_same_domain():
+    state = DomainIndexState()
+    state.put("tenants", "t1", tenant_target("*.shop.com"))
+    state.put("sites", "s1", site_target("*.shop.com"))
+    assert state.resolve("a.shop.com").target.site_id == "s1"
+    state.remove("sites", "s1")
+    assert state.resolve("a.shop.com").target.site_id is None
+
+def test_removed_wildcards_stop_matching_and_are_pruned(state):
+    state.remove("sites", "s2")
+    assert matched(state, "a.eu.shop.com") == "*.shop.com"
+    assert "eu" not in state.root.children["com"].children["shop"].children
+    state.remove("tenants", "t1")
+    assert matched(state, "a.shop.com") == "*.com"
+    # www.shop.com keeps the nodes it needs
+    assert matched(state, "www.shop.com") == "www.shop.com"
+    state.remove("tenants", "unknown")
+
+def test_moved_domains_leave_their_old_entry(state):
+    state.put("tenants", "t1", tenant_target("*.store.com"))
+    assert matched(state, "a.shop.com") == "*.com"
+    assert matched(state, "a.store.com") == "*.store.com"
+
+def test_events_move_domains_and_track_active_kids(state):
+    state.apply(InvalidationEvent("rsa_key_pairs", "insert", "k1", tenant_id="t1", kid="kid-1", status="active"))
+    state.apply(InvalidationEvent("rsa_key_pairs", "insert", "k2", tenant_id="t1", kid="kid-2", status="active"))
+    assert state.resolve("a.shop.com").kids == {"kid-1", "kid-2"}
+    state.apply(InvalidationEvent("rsa_key_pairs", "update", "k1", tenant_id="t1", kid="kid-1", status="revoked"))
+    state.apply(InvalidationEvent("rsa_key_pairs", "delete", "k2", tenant_id="t1", kid="kid-2"))
+    assert state.resolve("a.shop.com").kids == frozenset()
+    state.apply(InvalidationEvent("tenants", "update", "t1", domain="*.Shop.NET", is_active=False))
+    assert matched(state, "a.shop.com") == "*.com"
+    assert state.resolve("a.shop.net").target == DomainTarget("*.shop.net", "t1", None, False)
+    state.apply(InvalidationEvent("tenants", "delete", "t1"))
+    assert matched(state, "a.shop.net") is None
+
+def test_resolve_endpoint_matches_wildcard_domains(client):
+    name = uuid.uuid4().hex[:12]
+    tenant = client.post(f"{API}/tenants/", json={"name": name, "domain": f"*.{name}.test"}).json()
+    site = client.post(
+        f"{API}/sites/", json={"name": name, "domain": f"www.{name}.test", "tenant_id": tenant["id"]}
+    ).json()
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    response = client.get(f"{API}/resolve", params={"domain": f"API.{name}.test:8443"}).json()
+    assert response["matched"] == f"*.{name}.test" and response["site_id"] is None
+    assert response["tenant_id"] == tenant["id"] and response["kids"] == [key["kid"]]
+    response = client.get(f"{API}/resolve", params={"domain": f"www.{name}.test"}).json()
+    assert response["site_id"] == site["id"] and response["kids"] == []
+    assert client.get(f"{API}/resolve", params={"domain": f"{name}.test"}).status_code == 404
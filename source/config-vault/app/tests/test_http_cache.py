@@ -0,0 +1,80 @@
+"""
+Conditional reads. Tenants, sites, keys and their listings carry an ETag, a
+matching ``If-None-Match`` gets a 304, any change to what they return gets
+a new ETag, and a cached version is revalidated without the database.
+"""
+import asyncio
+import uuid
+import pytest
+from app.core.version_cache import read_versioned, version_cache
+from app.schemas.tenant import Tenant
+from app.tests.conftest import API
+
+def revalidate(client, path: str, change) -> None:
+    """Check a 304 for ``path`` while it is unchanged, and a new ETag after ``change``"""
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    cached = client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == etag and cached.headers["cache-control"] == response.headers["cache-control"]
+    change()
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+def new_key(client, tenant, site_id=None) -> dict:
+    return client.post(f"{API}/keys/", json={"tenant_id": tenant["id"], "site_id": site_id}).json()
+
+def test_tenants_revalidate(client, tenant):
+    path = f"{API}/tenants/{tenant['id']}"
+    revalidate(client, path, lambda: client.put(path, json={"name": "renamed"}))
+
+def test_sites_revalidate(client, tenant):
+    path = f"{API}/sites/{tenant['site']['id']}"
+    revalidate(client, path, lambda: client.put(path, json={"is_active": False}))
+
+def test_keys_revalidate(client, tenant):
+    key = new_key(client, tenant)
+    revalidate(client, f"{API}/keys/{key['kid']}", lambda: client.post(f"{API}/keys/{key['id']}/revoke"))
+
+@pytest.mark.parametrize("listing", ["tenants", "sites", "tenant keys", "site keys"])
+def test_pages_revalidate(client, tenant, listing):
+    name = uuid.uuid4().hex[:12]
+    path, change = {
+        # A new tenant lands on a later page, but changes the total
+        "tenants": (
+            f"{API}/tenants/?include_total=true",
+            lambda: client.post(f"{API}/tenants/", json={"name": name, "domain": f"{name}.test"}),
+        ),
+        "sites": (
+            f"{API}/sites/?tenant_id={tenant['id']}",
+            lambda: client.post(
+                f"{API}/sites/", json={"name": name, "domain": f"{name}.test", "tenant_id": tenant["id"]}
+            ),
+        ),
+        "tenant keys": (f"{API}/keys/tenant/{tenant['id']}", lambda: new_key(client, tenant)),
+        "site keys": (f"{API}/keys/site/{tenant['site']['id']}", lambda: new_key(client, tenant, tenant["site"]["id"])),
+    }[listing]
+    revalidate(client, path, change)
+
+@pytest.mark.parametrize("owner", ["tenant", "site"])
+def test_active_keys_revalidate(client, tenant, owner):
+    site_id = tenant["site"]["id"] if owner == "site" else None
+    key = new_key(client, tenant, site_id)
+    path = f"{API}/keys/{owner}/{site_id or tenant['id']}/active"
+    revalidate(client, path, lambda: client.post(f"{API}/keys/{key['id']}/revoke"))
+
+def test_cached_versions_revalidate_without_loading(client, tenant):
+    etag = client.get(f"{API}/tenants/{tenant['id']}").headers["etag"]
+    assert version_cache.get("tenants", tenant["id"]) == etag
+
+    async def loader():
+        pytest.fail("a cached version was loaded")
+
+    response = asyncio.run(read_versioned(
+        "tenants", tenant["id"], Tenant, loader=loader, cache_control="no-cache", if_none_match=etag
+    ))
+    assert response.status_code == 304 and response.headers["etag"] == etag
+    # Updates evict the cached version
+    client.put(f"{API}/tenants/{tenant['id']}", json={"name": "renamed"})
+    assert version_cache.get("tenants", tenant["id"]) is None
@@ -0,0 +1,107 @@
+"""
+Cache invalidation events. The in-memory bus delivers to this process, a
+broker bus also fans events out to every other worker and flushes on each
+(re)connect, and a write evicts exactly the cache entries it made stale.
+"""
+import queue
+import time
+import pytest
+from app.core.invalidation import (
+    BrokerInvalidationBus,
+    InvalidationBus,
+    InvalidationEvent,
+    evict_cached,
+    invalidation_bus,
+    make_event,
+)
+from app.core.kid_cache import kid_cache
+from app.core.version_cache import version_cache
+from app.tests.conftest import API
+
+KEY_EVENT = InvalidationEvent(entity="rsa_key_pairs", action="update", id="1", tenant_id="t1", kid="kid-1")
+
+class QueueBus(BrokerInvalidationBus):
+    """A broker bus over in-process queues, one per listening bus"""
+
+    backend = "queue"
+
+    def __init__(self, broker: list):
+        super().__init__(channel="test", reconnect_interval=0.01)
+        self.broker = broker
+
+    def _listen(self) -> None:
+        inbox: "queue.Queue[str]" = queue.Queue()
+        self.broker.append(inbox)
+        self.connected = True
+        self._reset()
+        while not self._stopped.is_set():
+            try:
+                self._receive(inbox.get(timeout=0.01))
+            except queue.Empty:
+                pass
+
+    def _send(self, payload: str) -> None:
+        for inbox in self.broker:
+            inbox.put(payload)
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+@pytest.fixture
+def buses():
+    broker = []
+    buses = [QueueBus(broker), QueueBus(broker)]
+    for bus in buses:
+        bus.start()
+    wait_for(lambda: len(broker) == 2)
+    yield buses
+    for bus in buses:
+        bus.stop()
+
+def test_broker_backends_must_listen_and_send():
+    with pytest.raises(TypeError):
+        BrokerInvalidationBus(channel="test", reconnect_interval=1)
+
+def test_memory_bus_delivers_locally_and_counts_handler_errors():
+    bus, events, resets = InvalidationBus(), [], []
+    bus.subscribe(events.append, on_reset=lambda: resets.append(1))
+    bus.subscribe(lambda event: 1 / 0)
+    bus.publish(KEY_EVENT)
+    bus._reset()
+    assert events == [KEY_EVENT] and resets == [1]
+    assert bus.stats() == {"backend": "memory", "published": 1, "received": 0, "resets": 1, "errors": 1}
+
+def test_broker_buses_deliver_each_event_once_per_worker(buses):
+    received = [[], []]
+    for bus, events in zip(buses, received):
+        bus.subscribe(events.append)
+    buses[0].publish(KEY_EVENT)
+    wait_for(lambda: received[1])
+    time.sleep(0.05)
+    assert received == [[KEY_EVENT], [KEY_EVENT]]
+    assert buses[0].stats()["received"] == 0 and buses[1].stats()["received"] == 1
+    assert all(bus.stats()["connected"] and bus.stats()["resets"] == 1 for bus in buses)
+
+def test_malformed_payloads_are_counted_and_ignored(buses):
+    buses[0]._send("not json")
+    buses[0]._send('{"entity": "tenants"}')
+    wait_for(lambda: buses[1].stats()["errors"] == 2)
+    assert buses[1].stats()["received"] == 0
+
+def test_key_events_evict_only_their_kid():
+    for kid in ("kid-1", "kid-2"):
+        kid_cache.get_or_load(kid, lambda: None)
+        version_cache.set("rsa_key_pairs", kid, '"etag"', version_cache.generation)
+    evict_cached(KEY_EVENT)
+    assert version_cache.get("rsa_key_pairs", "kid-1") is None
+    assert version_cache.get("rsa_key_pairs", "kid-2") == '"etag"'
+    assert kid_cache.get("kid-2") is None
+
+def test_events_carry_the_row_and_reach_the_bus(client, tenant, monkeypatch):
+    events = []
+    monkeypatch.setattr(invalidation_bus, "_handlers", [*invalidation_bus._handlers, events.append])
+    client.put(f"{API}/tenants/{tenant['id']}", json={"name": "renamed"})
+    assert events == [make_event("tenants", "update", {**tenant, "name": "renamed"})]
@@ -0,0 +1,75 @@
+"""
+JWKS documents. A key change drops exactly the documents of its tenant and
+site, and a document built from rows read before an invalidation is served
+once but never cached.
+"""
+import base64
+import json
+from types import SimpleNamespace
+from cryptography.hazmat.primitives import serialization
+from app.core.jwks import JWKSCache, jwks_cache
+from app.tests.conftest import API
+
+def make_cache() -> JWKSCache:
+    return JWKSCache(max_documents=10, max_keys=10, ttl=None)
+
+def test_key_changes_drop_only_the_documents_of_their_tenant_and_site():
+    cache = make_cache()
+    for scope, id in (("tenant", "t1"), ("site", "s1"), ("tenant", "t2"), ("site", "s2")):
+        cache.build(scope, id, [], cache.generation)
+    cache.invalidate_key("t1", "s1")
+    assert cache.get("tenant", "t1") is None
+    assert cache.get("site", "s1") is None
+    assert cache.get("tenant", "t2") is not None
+    assert cache.get("site", "s2") is not None
+
+def test_documents_read_before_an_invalidation_are_not_cached():
+    cache = make_cache()
+    generation = cache.generation
+    cache.invalidate_tenant("t1")
+    document = cache.build("tenant", "t1", [], generation)
+    assert document.body == b'{"keys":[]}'
+    assert cache.get("tenant", "t1") is None
+    # Invalidating another tenant does not stop this one from caching
+    generation = cache.generation
+    cache.invalidate_tenant("t2")
+    cache.build("tenant", "t1", [], generation)
+    assert cache.get("tenant", "t1") is not None
+
+def test_documents_read_before_a_dropped_invalidation_are_not_cached():
+    cache = JWKSCache(max_documents=2, max_keys=10, ttl=None)
+    generation = cache.generation
+    # More invalidations than are remembered push out the one of t1
+    for tenant_id in ("t1", "t2", "t3"):
+        cache.invalidate_tenant(tenant_id)
+    cache.build("tenant", "t1", [], generation)
+    assert cache.get("tenant", "t1") is None
+    cache.build("tenant", "t1", [], cache.generation)
+    assert cache.get("tenant", "t1") is not None
+
+def test_documents_read_before_a_flush_are_not_cached():
+    cache = make_cache()
+    generation = cache.generation
+    cache.clear()
+    cache.build("site", "s1", [], generation)
+    assert cache.get("site", "s1") is None
+
+def test_jwks_lists_active_keys_and_revalidates(client, tenant):
+    keys = [client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json() for _ in range(2)]
+    response = client.get(f"{API}/keys/tenant/{tenant['id']}/jwks")
+    assert sorted(jwk["kid"] for jwk in response.json()["keys"]) == sorted(key["kid"] for key in keys)
+    assert all(jwk["kty"] == "RSA" and jwk["e"] == "AQAB" for jwk in response.json()["keys"])
+    etag = response.headers["etag"]
+    assert client.get(f"{API}/keys/tenant/{tenant['id']}/jwks", headers={"If-None-Match": etag}).status_code == 304
+    client.post(f"{API}/keys/{keys[0]['id']}/revoke")
+    assert jwks_cache.get("tenant", tenant["id"]) is None
+    response = client.get(f"{API}/keys/tenant/{tenant['id']}/jwks", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [jwk["kid"] for jwk in response.json()["keys"]] == [keys[1]["kid"]]
+
+def test_jwk_of_a_key_pair_matches_its_public_key(client, tenant):
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    document = make_cache().build("tenant", tenant["id"], [SimpleNamespace(**key)])
+    jwk = json.loads(document.body)["keys"][0]
+    n = int.from_bytes(base64.urlsafe_b64decode(jwk["n"] + "=" * (-len(jwk["n"]) % 4)), "big")
+    assert n == serialization.load_pem_public_key(key["public_key"].encode()).public_numbers().n
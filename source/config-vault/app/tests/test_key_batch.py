@@ -0,0 +1,65 @@
+"""
+Batch key provisioning. A batch is written in one transaction, and a
+streamed batch that fails after it started reports the failure, and how
+many keys it committed, in its last line.
+"""
+import json
+import pytest
+from app.core.config import settings
+from app.core.key_generation import KeyGenerationService
+from app.core.key_pool import KeyPoolExhausted, key_pool
+from app.tests.conftest import API
+
+@pytest.fixture(scope="module")
+def key_pair():
+    return KeyGenerationService.generate_rsa_key_pair()
+
+@pytest.fixture(autouse=True)
+def pooled_keys(monkeypatch, key_pair):
+    async def get_async(key_size):
+        return key_pair
+
+    monkeypatch.setattr(key_pool, "get_async", get_async)
+
+def test_batch_creates_every_key(client, tenant):
+    keys_in = [{"tenant_id": tenant["id"], "site_id": tenant["site"]["id"]}] * 3
+    response = client.post(f"{API}/keys/batch", json=keys_in)
+    assert response.status_code == 200
+    keys = response.json()
+    assert len({key["kid"] for key in keys}) == 3
+    assert all(key["private_key"].startswith("-----BEGIN") for key in keys)
+    listed = client.get(f"{API}/keys/site/{tenant['site']['id']}/active").json()
+    assert {key["kid"] for key in listed} == {key["kid"] for key in keys}
+
+def test_batch_rejects_unknown_owners_and_oversized_batches(client, tenant, monkeypatch):
+    unknown = {"tenant_id": "00000000-0000-0000-0000-000000000000"}
+    response = client.post(f"{API}/keys/batch", json=[{"tenant_id": tenant["id"]}, unknown])
+    assert response.status_code == 400
+    assert client.get(f"{API}/keys/tenant/{tenant['id']}").json() == []
+    monkeypatch.setattr(settings, "KEY_BATCH_MAX_SIZE", 2)
+    response = client.post(f"{API}/keys/batch", json=[{"tenant_id": tenant["id"]}] * 3)
+    assert response.status_code == 400
+
+def test_streamed_batch_sends_keys_in_committed_chunks(client, tenant, monkeypatch):
+    monkeypatch.setattr(settings, "KEY_BATCH_STREAM_CHUNK_SIZE", 2)
+    response = client.post(f"{API}/keys/batch?stream=true", json=[{"tenant_id": tenant["id"]}] * 5)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5 and all("kid" in line for line in lines)
+
+def test_streamed_batch_reports_failures_after_it_started(client, tenant, monkeypatch, key_pair):
+    monkeypatch.setattr(settings, "KEY_BATCH_STREAM_CHUNK_SIZE", 1)
+    served = []
+
+    async def get_async(key_size):
+        if served:
+            raise KeyPoolExhausted("empty")
+        served.append(key_pair)
+        return key_pair
+
+    monkeypatch.setattr(key_pool, "get_async", get_async)
+    response = client.post(f"{API}/keys/batch?stream=true", json=[{"tenant_id": tenant["id"]}] * 3)
+    assert response.status_code == 200
+    *keys, last = [json.loads(line) for line in response.text.splitlines()]
+    assert last == {"error": "No pre-generated keys are available, please retry shortly.", "created": len(keys)}
+    assert len(client.get(f"{API}/keys/tenant/{tenant['id']}").json()) == len(keys)
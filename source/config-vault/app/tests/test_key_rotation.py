@@ -0,0 +1,126 @@
+"""
+Key rotation. Keys get a jittered rotation time ahead of expiry, a due key
+is claimed by one worker only and rotated to a successor with the same
+owner and lifetime, and the old key is retired after the overlap window.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select, update
+from app import crud
+from app.core.config import settings
+from app.core.key_generation import KeyGenerationService
+from app.core.key_rotation import KeyRotationScheduler, RateLimiter
+from app.models.rsa_key_pair import RSAKeyPair
+from app.tests.conftest import API
+
+def make_scheduler(**overrides) -> KeyRotationScheduler:
+    options = {
+        "interval": 60,
+        "lead": 7 * 24 * 3600,
+        "jitter": 3600,
+        "overlap": 3600,
+        "batch_size": 10,
+        "max_per_minute": 60,
+        "claim": 600,
+        "workers": 1,
+        **overrides,
+    }
+    return KeyRotationScheduler(**options)
+
+@pytest.fixture
+def key(client, db, tenant):
+    """A key that is due for rotation"""
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"], "site_id": tenant["site"]["id"]}).json()
+    db.execute(
+        update(RSAKeyPair)
+        .where(RSAKeyPair.id == uuid.UUID(key["id"]))
+        .values(rotate_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+    )
+    db.commit()
+    return key
+
+def load(db, id) -> RSAKeyPair:
+    db.expire_all()
+    return db.scalar(select(RSAKeyPair).where(RSAKeyPair.id == uuid.UUID(str(id))))
+
+def test_rotation_times_are_jittered_ahead_of_expiry():
+    scheduler = make_scheduler()
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    expires_at = created_at + timedelta(days=365)
+    rotate_at = scheduler.rotate_at("kid-1", created_at, expires_at)
+    assert expires_at - timedelta(days=7, hours=1) < rotate_at <= expires_at - timedelta(days=7)
+    assert rotate_at == scheduler.rotate_at("kid-1", created_at, expires_at)
+    assert scheduler.rotate_at("kid-2", created_at, expires_at) != rotate_at
+    # Short-lived keys rotate halfway through their lifetime
+    assert scheduler.rotate_at("kid-1", created_at, created_at + timedelta(days=2)) == created_at + timedelta(days=1)
+
+def test_due_keys_are_claimed_once(db, key):
+    claimed = crud.rsa_key_pair.claim_due_rotations(db, limit=100, lease=timedelta(minutes=10))
+    assert key["id"] in {str(key_pair.id) for key_pair in claimed}
+    again = crud.rsa_key_pair.claim_due_rotations(db, limit=100, lease=timedelta(minutes=10))
+    assert key["id"] not in {str(key_pair.id) for key_pair in again}
+
+def test_claims_run_out_so_failed_rotations_are_retried(db, key):
+    crud.rsa_key_pair.claim_due_rotations(db, limit=100, lease=timedelta(minutes=-1))
+    claimed = crud.rsa_key_pair.claim_due_rotations(db, limit=100, lease=timedelta(minutes=10))
+    assert key["id"] in {str(key_pair.id) for key_pair in claimed}
+
+def test_due_keys_get_a_successor_and_retire_after_the_overlap(client, db, key, monkeypatch):
+    # An overlap window that is already over, so the old key retires right away
+    scheduler = make_scheduler(overlap=-60)
+    key_pair = KeyGenerationService.generate_rsa_key_pair()
+    monkeypatch.setattr(scheduler, "_generate", lambda key_size: key_pair)
+    assert scheduler.rotate_due(db) >= 1
+    old = load(db, key["id"])
+    successor = load(db, old.successor_id)
+    assert (successor.tenant_id, successor.site_id, successor.status) == (old.tenant_id, old.site_id, "active")
+    lifetime = old.expires_at - old.created_at
+    assert abs((successor.expires_at - successor.created_at) - lifetime) < timedelta(minutes=1)
+    # Nothing is due any more, so a second run rotates nothing of this key
+    scheduler.rotate_due(db)
+    assert load(db, key["id"]).successor_id == successor.id
+    crud.rsa_key_pair.retire_due(db, limit=500)
+    assert client.get(f"{API}/keys/{key['kid']}").json()["status"] == "retired"
+
+def test_rotations_are_rate_limited(db, key, monkeypatch):
+    scheduler = make_scheduler(max_per_minute=0, batch_size=1)
+    monkeypatch.setattr(scheduler, "_generate", lambda key_size: pytest.fail("over the rate limit"))
+    scheduler.limiter.consume()
+    assert scheduler.rotate_due(db) == 0
+    assert load(db, key["id"]).successor_id is None
+
+def test_rate_limiter_refills_up_to_its_burst():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    assert limiter.available() == 2
+    limiter.consume(2)
+    assert limiter.available() == 0
+    limiter._updated -= 10
+    assert limiter.available() == 2
+
+def test_scheduled_rotation_times_reach_cached_reads(client, db, tenant):
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    db.execute(
+        update(RSAKeyPair)
+        .where(RSAKeyPair.id == uuid.UUID(key["id"]))
+        .values(expires_at=datetime.now(timezone.utc) + timedelta(days=30), rotate_at=None)
+    )
+    db.commit()
+    response = client.get(f"{API}/keys/{key['kid']}")
+    assert response.json()["rotate_at"] is None
+    scheduler = make_scheduler()
+    while scheduler.schedule(db):
+        pass
+    response = client.get(f"{API}/keys/{key['kid']}", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 200 and response.json()["rotate_at"] is not None
+
+def test_successors_follow_the_key_generation_executor(monkeypatch):
+    monkeypatch.setattr(settings, "KEY_GENERATION_EXECUTOR", "thread")
+    scheduler = make_scheduler()
+    try:
+        private_key, public_key = scheduler._generate(2048)
+        assert isinstance(scheduler._executor, ThreadPoolExecutor)
+        assert private_key.startswith("-----BEGIN") and public_key.startswith("-----BEGIN")
+    finally:
+        scheduler.stop()
@@ -0,0 +1,158 @@
+"""
+Shared key snapshot. Keys served from the snapshot must be byte for byte the
+responses the database path gives, with the same ETags, and keys changed
+after the snapshot was built must be read from the database until it is
+rebuilt.
+"""
+import json
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+EXERCISE = """
+import json
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from app.core.key_snapshot import key_snapshot
+from app.main import app
+
+command.upgrade(Config("alembic.ini"), "head")
+P = "/config-vault/v1"
+
+def read(client, paths):
+    responses = {path: client.get(P + path) for path in paths}
+    return {path: [response.status_code, response.text, response.headers["etag"]] for path, response in responses.items()}
+
+# Without the lifespan, as the snapshot only starts with a broker; the test builds it
+client = TestClient(app)
+tenant = client.post(P + "/tenants/", json={"name": "t", "domain": "t.com"}).json()
+site = client.post(P + "/sites/", json={"name": "s", "domain": "s.t.com", "tenant_id": tenant["id"]}).json()
+keys = [
+    client.post(P + "/keys/", json={"tenant_id": tenant["id"], "site_id": site["id"] if i % 2 else None}).json()
+    for i in range(4)
+]
+paths = [f"/keys/{key['kid']}" for key in keys] + [
+    f"/keys/tenant/{tenant['id']}/active",
+    f"/keys/site/{site['id']}/active",
+]
+from_database = read(client, paths)
+key_snapshot.build()
+from_snapshot = read(client, paths)
+hits = key_snapshot.stats()["hits"]
+client.post(P + f"/keys/{keys[1]['id']}/revoke")
+after_revoke = {
+    "status": client.get(P + f"/keys/{keys[1]['kid']}").json()["status"],
+    "site_keys": len(client.get(P + f"/keys/site/{site['id']}/active").json()),
+}
+print(json.dumps({
+    "from_database": from_database,
+    "from_snapshot": from_snapshot,
+    "hits": hits,
+    "after_revoke": after_revoke,
+}))
+"""
+
+def test_snapshot_serves_database_responses_until_keys_change(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'snapshot.db'}",
+        "KEY_SNAPSHOT_ENABLED": "true",
+        "KEY_SNAPSHOT_PATH": str(tmp_path / "keys.snapshot"),
+        # Built by the test only
+        "KEY_SNAPSHOT_POLL_SECONDS": "3600",
+        "KEY_POOL_ENABLED": "false",
+        "KEY_GENERATION_EXECUTOR": "thread",
+        "KEY_EXPIRY_SWEEP_ENABLED": "false",
+        "KEY_ROTATION_ENABLED": "false",
+        "DOMAIN_INDEX_BUILD_ON_STARTUP": "false",
+        "INVALIDATION_BACKEND": "memory",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", EXERCISE],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    result = json.loads(result.stdout.strip().splitlines()[-1])
+    assert result["from_snapshot"] == result["from_database"]
+    assert result["hits"] == len(result["from_snapshot"])
+    assert result["after_revoke"] == {"status": "revoked", "site_keys": 1}
+
+PUBLIC_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode()
+
+def snapshot_row(number: int, tenant_id: uuid.UUID, site_id=None) -> SimpleNamespace:
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=number)
+    return SimpleNamespace(
+        id=uuid.UUID(int=number), kid=f"kid-{number}", public_key=PUBLIC_KEY, tenant_id=tenant_id, site_id=site_id,
+        successor_id=None, expires_at=created_at + timedelta(days=365), rotate_at=None, retire_at=None,
+        created_at=created_at, updated_at=None,
+    )
+
+def test_snapshot_files_index_streamed_rows(tmp_path):
+    from app.core.key_snapshot import KeySnapshot, write_snapshot
+
+    tenant_id, other_id, site_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    rows = [snapshot_row(number, tenant_id, site_id if number % 2 else None) for number in range(50)]
+    rows.append(snapshot_row(50, other_id))
+    path = str(tmp_path / "keys.snapshot")
+    # A generator, as the builder streams rows from the database
+    assert write_snapshot(path, (row for row in rows), built_at=1.0) == 51
+    snapshot = KeySnapshot(path)
+    assert snapshot.count == 51 and snapshot.built_at == 1.0
+    for row in rows:
+        assert snapshot.find(row.kid) == {**vars(row), "status": "active"}
+    assert snapshot.find("unknown") is None
+    # Owner listings keep the (created_at, id) order of the rows
+    assert [row["kid"] for row in snapshot.by_tenant(tenant_id)] == [row.kid for row in rows[:50]]
+    assert [row["kid"] for row in snapshot.by_site(site_id)] == [row.kid for row in rows[1:50:2]]
+    assert [row["kid"] for row in snapshot.by_tenant(other_id)] == ["kid-50"]
+    assert snapshot.by_site(uuid.uuid4()) == [] and not list(tmp_path.glob(".keys-*"))
+
+def test_snapshot_files_hold_pkcs1_public_keys_as_subject_public_key_info(tmp_path):
+    from app.core.key_snapshot import KeySnapshot, write_snapshot
+
+    public_key = serialization.load_pem_public_key(PUBLIC_KEY.encode())
+    # Imported as is and kept under PEM storage
+    pkcs1 = public_key.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.PKCS1).decode()
+    row = snapshot_row(0, uuid.uuid4())
+    row.public_key = pkcs1
+    path = str(tmp_path / "keys.snapshot")
+    write_snapshot(path, [row], built_at=1.0)
+    assert KeySnapshot(path).find(row.kid)["public_key"] == PUBLIC_KEY
+
+def test_snapshot_records_address_blobs_past_4_gib(tmp_path):
+    from app.core.key_snapshot import HEADER, MAGIC, RECORD, KeySnapshot, write_snapshot
+
+    fields = (bytes(16),) * 4 + (0, 2 ** 40, 1, 2, 3)
+    assert RECORD.unpack(RECORD.pack(*fields)) == fields
+    # Files of an older format are refused rather than misread
+    path = tmp_path / "keys.snapshot"
+    write_snapshot(str(path), [], built_at=1.0)
+    data = bytearray(path.read_bytes())
+    data[:HEADER.size] = HEADER.pack(MAGIC, 1, *HEADER.unpack_from(data)[2:])
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        KeySnapshot(str(path))
+
+def test_snapshots_need_a_broker():
+    from app.core.key_snapshot import key_snapshot
+
+    # Other workers' revokes would only reach this one when the snapshot gets old
+    with pytest.raises(RuntimeError, match="INVALIDATION_BACKEND"):
+        key_snapshot.start()
+    assert not key_snapshot.running
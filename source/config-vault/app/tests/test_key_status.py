@@ -0,0 +1,70 @@
+"""
+Key status changes. Bulk revoke and activate change every selected key with
+one statement, only revoked keys that have not expired can be activated
+again, and the expiry sweep moves active keys past expiry to expired.
+"""
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from app.core.key_expiry import KeyExpirySweeper
+from app.models.rsa_key_pair import RSAKeyPair
+from app.tests.conftest import API
+
+@pytest.fixture
+def keys(client, tenant):
+    return client.post(f"{API}/keys/batch", json=[{"tenant_id": tenant["id"]}] * 4).json()
+
+def set_columns(db, key, **values) -> None:
+    db.execute(update(RSAKeyPair).where(RSAKeyPair.id == uuid.UUID(key["id"])).values(**values))
+    db.commit()
+
+def statuses(client, keys) -> list:
+    return [client.get(f"{API}/keys/{key['kid']}").json()["status"] for key in keys]
+
+def past() -> datetime:
+    return datetime.utcnow() - timedelta(days=1)
+
+def test_bulk_revoke_changes_only_keys_not_already_revoked(client, tenant, keys):
+    client.post(f"{API}/keys/{keys[0]['id']}/revoke")
+    response = client.post(f"{API}/keys/bulk/revoke", json={"tenant_id": tenant["id"]}).json()
+    assert response["status"] == "revoked" and response["count"] == 3
+    assert sorted(response["kids"]) == sorted(key["kid"] for key in keys[1:])
+    assert statuses(client, keys) == ["revoked"] * 4
+
+def test_bulk_activate_only_reactivates_revoked_unexpired_keys(client, db, tenant, keys):
+    client.post(f"{API}/keys/bulk/revoke", json={"ids": [key["id"] for key in keys[:3]]})
+    set_columns(db, keys[1], expires_at=past())
+    set_columns(db, keys[2], status="retired")
+    set_columns(db, keys[3], status="expired")
+    response = client.post(f"{API}/keys/bulk/activate", json={"tenant_id": tenant["id"]}).json()
+    assert response["kids"] == [keys[0]["kid"]]
+    assert statuses(client, keys) == ["active", "revoked", "retired", "expired"]
+
+def test_activating_a_key_that_cannot_be_activated_conflicts(client, db, keys):
+    client.post(f"{API}/keys/{keys[0]['id']}/revoke")
+    set_columns(db, keys[0], expires_at=past())
+    set_columns(db, keys[1], status="expired")
+    for key in keys[:2]:
+        assert client.post(f"{API}/keys/{key['id']}/activate").status_code == 409
+    assert statuses(client, keys[:2]) == ["revoked", "expired"]
+    client.post(f"{API}/keys/{keys[2]['id']}/revoke")
+    assert client.post(f"{API}/keys/{keys[2]['id']}/activate").status_code == 200
+    # Activating an active key changes nothing and succeeds
+    assert client.post(f"{API}/keys/{keys[3]['id']}/activate").status_code == 200
+    assert statuses(client, keys[2:]) == ["active", "active"]
+    missing = "00000000-0000-0000-0000-000000000000"
+    assert client.post(f"{API}/keys/{missing}/activate").status_code == 404
+
+def test_bulk_changes_need_a_selector(client):
+    assert client.post(f"{API}/keys/bulk/revoke", json={}).status_code == 422
+
+def test_sweep_expires_active_keys_past_expiry_in_batches(client, db, keys):
+    for key in keys[:3]:
+        set_columns(db, key, expires_at=past())
+    client.post(f"{API}/keys/{keys[2]['id']}/revoke")
+    sweeper = KeyExpirySweeper(interval=60, batch_size=1)
+    assert sweeper.sweep() >= 2
+    assert statuses(client, keys) == ["expired", "expired", "revoked", "active"]
+    assert sweeper.sweep() == 0
+    assert sweeper.stats()["runs"] == 2 and sweeper.stats()["expired"] >= 2
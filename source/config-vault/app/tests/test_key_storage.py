@@ -0,0 +1,110 @@
+"""
+Key storage. Keys read back as the same PEM whether they are stored as PEM
+or as DER, keys in other PEM formats are stored as PKCS#8 and SPKI, the
+rewrite CLI converts every row, and migration 0005 keeps keys readable
+both ways.
+"""
+import os
+import subprocess
+import sys
+import uuid
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from app.core.config import settings
+from app.db.types import KeyMaterial, pem_label, pem_to_der
+from app.models.rsa_key_pair import RSAKeyPair
+from app.tests.conftest import API, SERVICE_ROOT
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def private_pem(private_format=serialization.PrivateFormat.PKCS8) -> str:
+    return PRIVATE_KEY.private_bytes(
+        serialization.Encoding.PEM, private_format, serialization.NoEncryption()
+    ).decode()
+
+def public_pem(public_format=serialization.PublicFormat.SubjectPublicKeyInfo) -> str:
+    return PRIVATE_KEY.public_key().public_bytes(serialization.Encoding.PEM, public_format).decode()
+
+def round_trip(column_type: KeyMaterial, pem: str) -> str:
+    stored = column_type.process_bind_param(pem, None)
+    return column_type.process_result_value(stored, None)
+
+@pytest.mark.parametrize("storage_format", ["pem", "der"])
+def test_keys_read_back_unchanged(storage_format):
+    assert round_trip(KeyMaterial("PRIVATE KEY", storage_format), private_pem()) == private_pem()
+    assert round_trip(KeyMaterial("PUBLIC KEY", storage_format), public_pem()) == public_pem()
+
+def test_der_holds_the_key_body_only():
+    stored = KeyMaterial("PUBLIC KEY", "der").process_bind_param(public_pem(), None)
+    assert stored == pem_to_der(public_pem())
+    # Either format reads back through the same type
+    assert KeyMaterial("PUBLIC KEY", "der").process_result_value(public_pem().encode(), None) == public_pem()
+
+def test_pkcs1_keys_are_stored_as_pkcs8_and_spki_under_der():
+    pkcs1_private = private_pem(serialization.PrivateFormat.TraditionalOpenSSL)
+    pkcs1_public = public_pem(serialization.PublicFormat.PKCS1)
+    assert pem_label(pkcs1_private) == "RSA PRIVATE KEY" and pem_label(pkcs1_public) == "RSA PUBLIC KEY"
+    assert round_trip(KeyMaterial("PRIVATE KEY", "der"), pkcs1_private) == private_pem()
+    assert round_trip(KeyMaterial("PUBLIC KEY", "der"), pkcs1_public) == public_pem()
+    # PEM storage keeps the key as it was given
+    assert round_trip(KeyMaterial("PRIVATE KEY", "pem"), pkcs1_private) == pkcs1_private
+
+def test_rewrite_cli_converts_every_row(client, db, tenant):
+    keys = client.post(f"{API}/keys/batch", json=[{"tenant_id": tenant["id"]}] * 3).json()
+    # The storage format is read at import, so the CLI runs as its own process
+    result = subprocess.run(
+        [sys.executable, "-m", "app.cli.rewrite_keys", "--batch-size", "2"],
+        cwd=SERVICE_ROOT,
+        env={**os.environ, "KEY_STORAGE_FORMAT": "der"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    table = RSAKeyPair.__table__
+    total = db.scalar(sa.select(sa.func.count()).select_from(table))
+    assert result.stderr.splitlines()[-1] == f"Done, {total} key pairs are stored as der"
+    raw = sa.select(sa.cast(table.c.public_key, sa.LargeBinary)).where(table.c.id == uuid.UUID(keys[0]["id"]))
+    assert db.scalar(raw) == pem_to_der(keys[0]["public_key"])
+    for key in keys:
+        assert client.get(f"{API}/keys/{key['kid']}").json()["public_key"] == key["public_key"]
+
+def test_migration_converts_keys_both_ways(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'migration.db'}")
+    config = Config()
+    config.set_main_option("script_location", str(SERVICE_ROOT / "alembic"))
+    command.upgrade(config, "0004")
+    engine = sa.create_engine(settings.DATABASE_URL)
+    tenants = sa.table("tenants", sa.column("id", sa.Uuid()), sa.column("name"), sa.column("domain"))
+    keys = sa.table(
+        "rsa_key_pairs",
+        sa.column("id", sa.Uuid()),
+        sa.column("kid"),
+        sa.column("tenant_id", sa.Uuid()),
+        sa.column("private_key"),
+        sa.column("public_key"),
+    )
+    tenant_id, pem_id, der_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    with engine.begin() as connection:
+        connection.execute(sa.insert(tenants).values(id=tenant_id, name="migration", domain="migration.test"))
+        connection.execute(sa.insert(keys), [
+            {"id": id, "kid": id.hex, "tenant_id": tenant_id, "private_key": private_pem(), "public_key": public_pem()}
+            for id in (pem_id, der_id)
+        ])
+    command.upgrade(config, "0005")
+    with engine.begin() as connection:
+        stored = connection.execute(sa.select(keys.c.private_key, keys.c.public_key)).all()
+        assert all(row == (private_pem().encode(), public_pem().encode()) for row in stored)
+        connection.execute(
+            sa.update(keys).where(keys.c.id == der_id).values(
+                private_key=pem_to_der(private_pem()), public_key=pem_to_der(public_pem())
+            )
+        )
+    command.downgrade(config, "0004")
+    with engine.connect() as connection:
+        rows = connection.execute(sa.select(keys.c.private_key, keys.c.public_key)).all()
+    assert rows == [(private_pem(), public_pem())] * 2
+    engine.dispose()
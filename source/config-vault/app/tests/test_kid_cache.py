@@ -0,0 +1,54 @@
+"""
+Key lookups by kid. Unknown kids are cached briefly, writes drop the kid
+at once, and a load that started before an invalidation is not stored.
+"""
+import time
+import uuid
+from app.core.cache import MISSING
+from app.core.kid_cache import KidCache, kid_cache
+from app.tests.conftest import API
+
+def make_cache(**overrides) -> KidCache:
+    return KidCache(**{"max_size": 10, "ttl": None, "negative_ttl": 0.05, **overrides})
+
+def test_unknown_kids_are_cached_for_the_negative_ttl():
+    cache, loads = make_cache(), []
+    loader = lambda: loads.append(1)
+    assert cache.get_or_load("kid-1", loader) is None
+    assert cache.get_or_load("kid-1", loader) is None
+    assert len(loads) == 1
+    time.sleep(0.06)
+    assert cache.get("kid-1") is MISSING
+
+def test_loads_that_started_before_an_invalidation_are_not_stored():
+    cache = make_cache()
+
+    def loader():
+        cache.invalidate("kid-1")
+
+    cache.get_or_load("kid-1", loader)
+    assert cache.get("kid-1") is MISSING
+    assert cache.stats()["invalidations"] == 1
+    cache.get_or_load("kid-1", lambda: None)
+    assert cache.get("kid-1") is None
+
+def test_entries_beyond_the_size_are_evicted():
+    cache = make_cache(max_size=2)
+    for kid in ("kid-1", "kid-2", "kid-3"):
+        cache.get_or_load(kid, lambda: None)
+    assert cache.get("kid-1") is MISSING
+    assert cache.stats()["evictions"] == 1
+
+def test_key_reads_are_cached_until_the_key_changes(client, tenant):
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    assert client.get(f"{API}/keys/{key['kid']}").json()["status"] == "active"
+    assert kid_cache.get(key["kid"]).status == "active"
+    client.post(f"{API}/keys/{key['id']}/revoke")
+    assert kid_cache.get(key["kid"]) is MISSING
+    assert client.get(f"{API}/keys/{key['kid']}").json()["status"] == "revoked"
+
+def test_unknown_kids_are_not_found_and_cached_as_none(client):
+    kid = uuid.uuid4().hex
+    assert client.get(f"{API}/keys/{kid}").status_code == 404
+    assert kid_cache.get(kid) is None
+    assert client.get(f"{API}/stats/kid-cache").json()["negative_ttl_seconds"] == kid_cache.negative_ttl
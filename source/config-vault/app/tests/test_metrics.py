@@ -0,0 +1,59 @@
+"""
+Metrics. Requests are labelled by the path template of their route, so ids
+never become label values, and requests no route matched share one label.
+"""
+import uuid
+from prometheus_client import REGISTRY
+from app.core.metrics import MetricsMiddleware
+from app.main import app
+from app.tests.conftest import API
+
+def requests_total(method: str, route: str, status: str) -> float:
+    labels = {"method": method, "route": route, "status": status}
+    return REGISTRY.get_sample_value("config_vault_http_requests_total", labels) or 0.0
+
+def statement_count(route: str) -> float:
+    return REGISTRY.get_sample_value("config_vault_http_request_db_statements_count", {"route": route}) or 0.0
+
+def test_routes_are_labelled_by_their_path_template(client, tenant):
+    route = f"{API}/tenants/{{tenant_id}}"
+    ok, missing = requests_total("GET", route, "200"), requests_total("GET", route, "404")
+    statements = statement_count(route)
+    client.get(f"{API}/tenants/{tenant['id']}")
+    client.get(f"{API}/tenants/{uuid.uuid4()}")
+    assert requests_total("GET", route, "200") == ok + 1
+    assert requests_total("GET", route, "404") == missing + 1
+    assert statement_count(route) == statements + 2
+    # Sub-routes keep their own template
+    bundle = f"{API}/tenants/{{tenant_id}}/bundle"
+    before = requests_total("GET", bundle, "200")
+    client.get(f"{API}/tenants/{tenant['id']}/bundle")
+    assert requests_total("GET", bundle, "200") == before + 1
+
+def test_unmatched_requests_share_one_label(client):
+    before = requests_total("GET", "unmatched", "404")
+    client.get(f"{API}/no-such-route/{uuid.uuid4()}")
+    client.get(f"/{uuid.uuid4()}")
+    assert requests_total("GET", "unmatched", "404") == before + 2
+    assert not any(
+        "no-such-route" in sample.labels.get("route", "")
+        for metric in REGISTRY.collect()
+        for sample in metric.samples
+    )
+
+def test_validation_errors_keep_the_route_label(client):
+    route = f"{API}/tenants/{{tenant_id}}"
+    before = requests_total("GET", route, "422")
+    client.get(f"{API}/tenants/not-a-uuid")
+    assert requests_total("GET", route, "422") == before + 1
+
+def test_metrics_are_exposed(client):
+    client.get(f"{API}/tenants/")
+    body = client.get("/metrics").text
+    assert f'config_vault_http_requests_total{{method="GET",route="{API}/tenants/",status="200"}}' in body
+
+def test_route_labels_come_from_the_app_routes():
+    middleware = MetricsMiddleware(app)
+    scope = {"app": app, "endpoint": next(route.endpoint for route in app.routes if route.path == "/metrics")}
+    assert middleware.route_label(scope) == "/metrics"
+    assert middleware.route_label({"app": app}) == "unmatched"
@@ -0,0 +1,160 @@
+"""
+Query budgets. Every budgeted route must stay within its SQL statement budget
+on both the sync and the async database path, so N+1 regressions such as lazy
+loads of ``Tenant.sites`` or ``rsa_keys`` per row fail here. Profiled requests
+must report their statements in headers and in the saved profile, sampling
+only their own stacks, and revalidating a cached version must not query the
+database.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+from app.core.config import settings
+from app.core.profiling import StackSampler
+from app.core.query_budget import QueryBudgetExceeded, check_query_budget, query_budget
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+EXERCISE = """
+import json
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from app.main import app
+
+command.upgrade(Config("alembic.ini"), "head")
+P = "/config-vault/v1"
+PROFILE = {"X-Profile": "budget-test"}
+calls = []
+
+def call(client, method, path, headers=None, **kwargs):
+    response = client.request(method, P + path, headers={**PROFILE, **(headers or {})}, **kwargs)
+    calls.append({
+        "request": f"{method} {path}",
+        "status": response.status_code,
+        "statements": response.headers.get("x-query-count"),
+        "profile_id": response.headers.get("x-profile-id"),
+        "etag": response.headers.get("etag"),
+    })
+    return response.json() if response.content else None
+
+# Any budgeted route going over its budget raises QueryBudgetExceeded here
+with TestClient(app) as client:
+    tenant = call(client, "POST", "/tenants/", json={"name": "t", "domain": "t.com"})
+    sites = [
+        call(client, "POST", "/sites/", json={"name": f"s{i}", "domain": f"s{i}.t.com", "tenant_id": tenant["id"]})
+        for i in range(3)
+    ]
+    keys = [
+        call(client, "POST", "/keys/", json={"tenant_id": tenant["id"], "site_id": site["id"]})
+        for site in sites
+        for _ in range(2)
+    ]
+    call(client, "GET", "/tenants/?include_total=true")
+    call(client, "GET", f"/tenants/{tenant['id']}")
+    # A revalidation of a cached version is answered without the database
+    call(client, "GET", f"/tenants/{tenant['id']}", headers={"If-None-Match": calls[-1]["etag"]})
+    call(client, "GET", f"/tenants/{tenant['id']}/bundle")
+    call(client, "PUT", f"/tenants/{tenant['id']}", json={"domain": "t2.com"})
+    call(client, "GET", f"/sites/?tenant_id={tenant['id']}&include_total=true")
+    call(client, "PUT", f"/sites/{sites[0]['id']}", json={"domain": "s9.t.com"})
+    call(client, "GET", f"/keys/{keys[0]['kid']}")
+    call(client, "GET", f"/keys/tenant/{tenant['id']}?include_total=true")
+    call(client, "GET", f"/keys/site/{sites[0]['id']}?include_total=true")
+    call(client, "GET", f"/keys/tenant/{tenant['id']}/active")
+    call(client, "GET", f"/keys/site/{sites[0]['id']}/active")
+    call(client, "POST", f"/keys/{keys[1]['id']}/revoke")
+    call(client, "POST", "/keys/bulk/activate", json={"site_id": sites[0]["id"]})
+    call(client, "DELETE", f"/keys/{keys[1]['id']}")
+    call(client, "DELETE", f"/sites/{sites[2]['id']}")
+    call(client, "DELETE", f"/tenants/{tenant['id']}")
+    unprofiled = client.get(P + "/tenants/")
+print(json.dumps({"calls": calls, "unprofiled_headers": dict(unprofiled.headers)}))
+"""
+
+def exercise_routes(tmp_path: Path, *, db_async: bool) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'budget.db'}",
+        "DB_ASYNC": str(db_async).lower(),
+        "QUERY_BUDGET_MODE": "raise",
+        "PROFILING_TOKEN": "budget-test",
+        "PROFILING_OUTPUT_DIR": str(tmp_path / "profiles"),
+        "KEY_POOL_ENABLED": "false",
+        "KEY_GENERATION_EXECUTOR": "thread",
+        "KEY_EXPIRY_SWEEP_ENABLED": "false",
+        "KEY_ROTATION_ENABLED": "false",
+        "DOMAIN_INDEX_BUILD_ON_STARTUP": "false",
+        "INVALIDATION_BACKEND": "memory",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", EXERCISE],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+@pytest.mark.parametrize("db_async", [False, True], ids=["sync", "async"])
+def test_routes_stay_within_query_budgets_and_report_profiles(tmp_path, db_async):
+    result = exercise_routes(tmp_path, db_async=db_async)
+    for call in result["calls"]:
+        assert 200 <= call["status"] < 300 or call["status"] == 304, call
+        profile = json.loads((tmp_path / "profiles" / f"{call['profile_id']}.json").read_text())
+        assert profile["statements"] == int(call["statements"]) == len(profile["sql"]), call
+    revalidation = next(call for call in result["calls"] if call["status"] == 304)
+    assert revalidation["statements"] == "0"
+    assert "x-query-count" not in result["unprofiled_headers"]
+
+def test_query_budget_raises_or_logs_when_exceeded(monkeypatch, caplog):
+    @query_budget(2)
+    def endpoint():
+        pass
+
+    check_query_budget(endpoint, 2)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
+    with pytest.raises(QueryBudgetExceeded):
+        check_query_budget(endpoint, 3)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "log")
+    with caplog.at_level(logging.WARNING, logger="app.core.query_budget"):
+        check_query_budget(endpoint, 3)
+    assert "over its budget of 2" in caplog.text
+
+def work(stopped: threading.Event) -> None:
+    while not stopped.is_set():
+        pass
+
+def other_work(stopped: threading.Event) -> None:
+    while not stopped.is_set():
+        pass
+
+def serve(stopped: threading.Event) -> StackSampler:
+    """A profiled request, running here and on a thread that ran its statements"""
+    worker = threading.Thread(target=work, args=(stopped,))
+    worker.start()
+    sampler = StackSampler(interval=0.001, frame=sys._getframe(), threads={worker.ident})
+    sampler.start()
+    time.sleep(0.1)
+    return sampler
+
+def test_profiles_sample_only_their_own_request():
+    stopped = threading.Event()
+    other = threading.Thread(target=other_work, args=(stopped,))
+    other.start()
+    sampler = serve(stopped)
+    # Past the request's frame, as when another task runs on the event loop
+    time.sleep(0.1)
+    sampler.stop()
+    stopped.set()
+    other.join()
+    functions = {stack.rsplit(":", 1)[-1] for stack in sampler.stacks}
+    assert functions == {"serve", "work"}
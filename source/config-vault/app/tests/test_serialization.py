@@ -0,0 +1,64 @@
+"""
+Row serialization. Rows dumped straight to JSON with orjson must be byte for
+byte what FastAPI returns for the same rows through their response model.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import select
+from app.core.serialization import dump_row, dump_rows
+from app.models.rsa_key_pair import RSAKeyPair as RSAKeyPairModel
+from app.models.tenant import Tenant as TenantModel
+from app.schemas.rsa_key_pair import RSAKeyPair
+from app.schemas.tenant import Tenant
+
+TIMES = [
+    datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    datetime(2024, 1, 2, 3, 4, 5, 120000, tzinfo=timezone(timedelta(0))),
+    datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+    datetime(2024, 1, 2, 3, 4, 5),
+]
+
+def pydantic_body(rows, schema, response_class=JSONResponse) -> bytes:
+    """What FastAPI sends for ``rows`` with ``schema`` as the response model"""
+    return response_class(jsonable_encoder([schema.model_validate(row) for row in rows])).body
+
+def tenant_row(created_at: datetime) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "name": "Zürich ✓ \"quoted\"",
+        "domain": "zurich.test",
+        "is_active": True,
+        "created_at": created_at,
+        "updated_at": None,
+    }
+
+@pytest.mark.parametrize("response_class", [JSONResponse, ORJSONResponse])
+def test_rows_match_pydantic_byte_for_byte(response_class):
+    rows = [tenant_row(created_at) for created_at in TIMES]
+    assert dump_rows(rows, Tenant) == pydantic_body(rows, Tenant, response_class)
+    for row in rows:
+        assert dump_row(row, Tenant) == pydantic_body([row], Tenant)[1:-1]
+        assert dump_row(Tenant.model_validate(row), Tenant) == pydantic_body([row], Tenant)[1:-1]
+
+def test_database_rows_match_pydantic_byte_for_byte(db, tenant, client):
+    client.post("/config-vault/v1/keys/", json={"tenant_id": tenant["id"]})
+    tenants = db.scalars(select(TenantModel).limit(20)).all()
+    assert dump_rows(tenants, Tenant) == pydantic_body(tenants, Tenant)
+    keys = db.scalars(select(RSAKeyPairModel).limit(20)).all()
+    assert dump_rows(keys, RSAKeyPair) == pydantic_body(keys, RSAKeyPair)
+
+def test_listings_are_serialized_once(client, tenant, monkeypatch):
+    from app.core import http_cache
+
+    bodies = []
+    def counting_dump_rows(rows, schema):
+        bodies.append(dump_rows(rows, schema))
+        return bodies[-1]
+    monkeypatch.setattr(http_cache, "dump_rows", counting_dump_rows)
+    client.post("/config-vault/v1/keys/", json={"tenant_id": tenant["id"]})
+    response = client.get(f"/config-vault/v1/keys/tenant/{tenant['id']}")
+    assert bodies == [response.content]
+    assert response.json()[0]["tenant_id"] == tenant["id"]
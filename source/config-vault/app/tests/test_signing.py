@@ -0,0 +1,69 @@
+"""
+Signing. Signatures of every JWS algorithm verify with the key's public key,
+batches report failures per item, and revoked keys stop signing at once.
+"""
+import base64
+import pytest
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from app.core.signing import signing_key_cache
+from app.tests.conftest import API
+
+ALGORITHMS = ["RS256", "RS384", "RS512", "PS256", "PS384", "PS512"]
+
+@pytest.fixture
+def key(client, tenant):
+    return client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+
+def verify(public_pem: str, signature: str, data: bytes, algorithm: str) -> None:
+    """Verify a base64url JWS signature, raising InvalidSignature if it does not match"""
+    public_key = serialization.load_pem_public_key(public_pem.encode())
+    hash_algorithm = {"256": hashes.SHA256, "384": hashes.SHA384, "512": hashes.SHA512}[algorithm[2:]]()
+    if algorithm.startswith("PS"):
+        pad = padding.PSS(mgf=padding.MGF1(hash_algorithm), salt_length=hash_algorithm.digest_size)
+    else:
+        pad = padding.PKCS1v15()
+    assert "=" not in signature
+    raw = base64.urlsafe_b64decode(signature + "=" * (-len(signature) % 4))
+    public_key.verify(raw, data, pad, hash_algorithm)
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_signatures_verify_with_the_public_key(client, key, algorithm):
+    response = client.post(f"{API}/keys/{key['kid']}/sign", json={"data": "héllo", "algorithm": algorithm})
+    assert response.json()["kid"] == key["kid"] and response.json()["algorithm"] == algorithm
+    verify(key["public_key"], response.json()["signature"], "héllo".encode(), algorithm)
+    with pytest.raises(InvalidSignature):
+        verify(key["public_key"], response.json()["signature"], b"tampered", algorithm)
+
+def test_base64url_data_is_decoded_before_signing(client, key):
+    data = bytes(range(256))
+    encoded = base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+    response = client.post(f"{API}/keys/{key['kid']}/sign", json={"data": encoded, "encoding": "base64url"})
+    verify(key["public_key"], response.json()["signature"], data, "RS256")
+    invalid = client.post(f"{API}/keys/{key['kid']}/sign", json={"data": "***", "encoding": "base64url"})
+    assert invalid.status_code == 400
+
+def test_batches_sign_in_order_and_report_failures(client, tenant, key):
+    revoked = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    client.post(f"{API}/keys/{revoked['id']}/revoke")
+    items = [
+        {"kid": key["kid"], "data": "one", "algorithm": "PS384"},
+        {"kid": "unknown-kid", "data": "two"},
+        {"kid": revoked["kid"], "data": "three"},
+        {"kid": key["kid"], "data": "four"},
+    ]
+    results = client.post(f"{API}/keys/sign/batch", json=items).json()
+    assert [result["kid"] for result in results] == [item["kid"] for item in items]
+    verify(key["public_key"], results[0]["signature"], b"one", "PS384")
+    verify(key["public_key"], results[3]["signature"], b"four", "RS256")
+    assert results[1]["error"] == "RSA key pair not found" and results[1]["signature"] is None
+    assert results[2]["error"] == "RSA key pair is not active"
+
+def test_revoked_keys_stop_signing_at_once(client, key):
+    assert client.post(f"{API}/keys/{key['kid']}/sign", json={"data": "x"}).status_code == 200
+    assert signing_key_cache.get(key["kid"]) is not None
+    client.post(f"{API}/keys/{key['id']}/revoke")
+    assert signing_key_cache.get(key["kid"]) is None
+    assert client.post(f"{API}/keys/{key['kid']}/sign", json={"data": "x"}).status_code == 409
+    assert client.post(f"{API}/keys/unknown-kid/sign", json={"data": "x"}).status_code == 404
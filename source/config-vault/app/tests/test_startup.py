@@ -0,0 +1,58 @@
+"""
+Startup-time budget. Importing the app and serving its first request must not
+open a database connection and must stay within a fixed time budget, so that
+workers start and reload quickly even when the database is slow or down.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[2]
+
+IMPORT_BUDGET_SECONDS = float(os.environ.get("STARTUP_IMPORT_BUDGET_SECONDS", "3.0"))
+FIRST_REQUEST_BUDGET_SECONDS = float(os.environ.get("STARTUP_FIRST_REQUEST_BUDGET_SECONDS", "1.0"))
+
+MEASURE = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    response = client.get("/health")
+    served = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_seconds": imported - start,
+    "first_request_seconds": served - imported,
+}))
+"""
+
+def measure_startup() -> dict:
+    env = {
+        **os.environ,
+        # Any connection attempt against this database fails
+        "DATABASE_URL": "sqlite:////nonexistent/config-vault/startup.db",
+        "DB_ASYNC": "false",
+        "KEY_POOL_ENABLED": "false",
+        "INVALIDATION_BACKEND": "memory",
+    }
+    # A fresh interpreter, so nothing is already imported
+    result = subprocess.run(
+        [sys.executable, "-c", MEASURE],
+        cwd=SERVICE_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_startup_does_not_touch_database_and_fits_budget():
+    timings = measure_startup()
+    assert timings["status"] == 200
+    assert timings["import_seconds"] < IMPORT_BUDGET_SECONDS, timings
+    assert timings["first_request_seconds"] < FIRST_REQUEST_BUDGET_SECONDS, timings
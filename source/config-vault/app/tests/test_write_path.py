@@ -0,0 +1,61 @@
+"""
+Write path. Every create, update and delete writes with one INSERT, UPDATE
+or DELETE ... RETURNING per table and reads nothing back afterwards, and
+updates apply only the fields that were sent.
+"""
+import pytest
+from sqlalchemy import event
+from app.db.session import engine
+from app.tests.conftest import API
+
+@pytest.fixture
+def statements(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()[:1] + ["RETURNING"] * ("RETURNING" in statement)))
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+def writes(statements) -> list:
+    """The statements from the first write on, as reads before it only validate input"""
+    first = next(i for i, statement in enumerate(statements) if not statement.startswith("SELECT"))
+    return statements[first:]
+
+def test_creates_insert_with_returning(client, tenant, statements):
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"], "site_id": tenant["site"]["id"]})
+    assert key.status_code == 200
+    assert writes(statements) == ["INSERT RETURNING"]
+
+def test_updates_are_one_update_with_returning(client, tenant, statements):
+    response = client.put(f"{API}/tenants/{tenant['id']}", json={"name": "renamed"})
+    assert statements == ["UPDATE RETURNING"]
+    assert response.json()["name"] == "renamed"
+    # Fields that were not sent keep their values
+    assert response.json()["domain"] == tenant["domain"]
+    statements.clear()
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    statements.clear()
+    assert client.post(f"{API}/keys/{key['id']}/revoke").status_code == 200
+    assert statements == ["UPDATE RETURNING"]
+    assert client.get(f"{API}/keys/{key['kid']}").json()["status"] == "revoked"
+
+def test_deletes_are_one_delete_with_returning_per_table(client, tenant, statements):
+    key = client.post(f"{API}/keys/", json={"tenant_id": tenant["id"]}).json()
+    statements.clear()
+    assert client.delete(f"{API}/keys/{key['id']}").json()["kid"] == key["kid"]
+    assert statements == ["DELETE RETURNING"]
+    statements.clear()
+    assert client.delete(f"{API}/sites/{tenant['site']['id']}").status_code == 200
+    assert statements == ["DELETE RETURNING"] * 2
+    statements.clear()
+    assert client.delete(f"{API}/tenants/{tenant['id']}").status_code == 200
+    assert statements == ["DELETE RETURNING"] * 3
+
+def test_writes_to_missing_rows_are_not_found(client, statements):
+    missing = "00000000-0000-0000-0000-000000000000"
+    assert client.put(f"{API}/sites/{missing}", json={"name": "x"}).status_code == 404
+    assert client.post(f"{API}/keys/{missing}/revoke").status_code == 404
+    assert client.delete(f"{API}/keys/{missing}").status_code == 404
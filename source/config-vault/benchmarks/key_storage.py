@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Measure what private key material costs key pair listings.
+
+Seeds a throwaway SQLite database (or --database-url) with key pairs stored in
+the current KEY_STORAGE_FORMAT, reports the stored key bytes per row for PEM
+and DER, then times a page of ``get_page`` with the private key deferred (the
+default) and undeferred, with peak memory from tracemalloc, e.g.:
+
+    python benchmarks/key_storage.py
+    KEY_STORAGE_FORMAT=der python benchmarks/key_storage.py --rows 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Already migrated database to run against")
+    parser.add_argument("--rows", type=int, default=2000, help="Key pairs to seed")
+    parser.add_argument("--limit", type=int, nargs="+", default=[100, 1000], help="Page sizes to list")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page size, the best one is reported")
+    return parser.parse_args()
+
+def configure(database_url):
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="config-vault-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, str(SERVICE_ROOT))
+    if database_url.startswith("sqlite"):
+        from alembic import command
+        from alembic.config import Config
+
+        config = Config(str(SERVICE_ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(SERVICE_ROOT / "alembic"))
+        command.upgrade(config, "head")
+
+def seed(db, count):
+    from app import crud
+    from app.core.key_generation import KeyGenerationService
+
+    # Key generation is slow, and the stored size does not depend on the key itself
+    private_key, public_key = KeyGenerationService.generate_rsa_key_pair(2048)
+    tenant_id, now = uuid.uuid4(), datetime.utcnow()
+    crud.tenant.insert_many(
+        db, rows=[{"id": tenant_id, "name": "bench", "domain": f"{tenant_id}.bench", "created_at": now}]
+    )
+    crud.rsa_key_pair.insert_many(
+        db,
+        rows=[
+            {
+                "id": uuid.uuid4(),
+                "kid": KeyGenerationService.generate_kid(),
+                "private_key": private_key,
+                "public_key": public_key,
+                "tenant_id": tenant_id,
+                "site_id": None,
+                "status": "active",
+                "created_at": now,
+                "expires_at": now + timedelta(days=90),
+            }
+            for _ in range(count)
+        ],
+    )
+    db.commit()
+    return tenant_id, private_key, public_key
+
+def stored_sizes(private_key, public_key):
+    from app.db.types import KeyMaterial
+
+    return {
+        storage_format: sum(
+            len(KeyMaterial(label, storage_format).process_bind_param(pem, None))
+            for label, pem in (("PRIVATE KEY", private_key), ("PUBLIC KEY", public_key))
+        )
+        for storage_format in ("pem", "der")
+    }
+
+def measure(repeat, fn):
+    timings, peak = [], 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(timings), peak
+
+def main():
+    args = parse_args()
+    configure(args.database_url)
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import undefer
+    from app.core.config import settings
+    from app.crud.base import filtered_query, page_query
+    from app.db import base  # noqa: F401 registers every model for the relationships
+    from app.db.session import SessionLocal
+    from app.models.rsa_key_pair import RSAKeyPair
+
+    with SessionLocal() as db:
+        tenant_id, private_key, public_key = seed(db, args.rows)
+        stored = db.execute(
+            select(func.avg(func.length(RSAKeyPair.private_key) + func.length(RSAKeyPair.public_key)))
+        ).scalar()
+
+    sizes = stored_sizes(private_key, public_key)
+    print(f"key bytes per row: pem {sizes['pem']}, der {sizes['der']}, "
+          f"stored as {settings.KEY_STORAGE_FORMAT} {stored:.0f}")
+
+    def list_page(limit, eager):
+        # The query of get_page, optionally undeferring the private key as the model did before
+        stmt = page_query(RSAKeyPair, filtered_query(RSAKeyPair, {"tenant_id": tenant_id}), cursor=None, limit=limit)
+        if eager:
+            stmt = stmt.options(undefer(RSAKeyPair.private_key))
+        with SessionLocal() as db:
+            db.scalars(stmt).all()
+
+    print(f"{'limit':>6}  {'eager ms':>9}  {'deferred ms':>12}  {'eager peak KiB':>15}  {'deferred peak KiB':>18}")
+    for limit in args.limit:
+        eager_seconds, eager_peak = measure(args.repeat, lambda: list_page(limit, True))
+        deferred_seconds, deferred_peak = measure(args.repeat, lambda: list_page(limit, False))
+        print(
+            f"{limit:>6}  {eager_seconds * 1000:>9.2f}  {deferred_seconds * 1000:>12.2f}"
+            f"  {eager_peak / 1024:>15.0f}  {deferred_peak / 1024:>18.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
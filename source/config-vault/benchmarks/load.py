@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Run named load scenarios against the app in-process and report latency.
+
+The ASGI app is served in this process through httpx, with its lifespan, and
+talks to the database seeded by benchmarks/seed.py (same --database-url
+default). Each scenario sends --requests requests from --concurrency
+concurrent clients after a warm-up, and reports p50/p95/p99 latency,
+requests per second and SQL statements per request. Results are printed as
+JSON (or written to --output) so runs can be compared. Key creation and the
+mixed scenario write, so reseed between runs that must match exactly, e.g.:
+
+    python benchmarks/seed.py --tenants 1000
+    python benchmarks/load.py --output before.json
+    python benchmarks/load.py --scenario kid-reads mixed --baseline before.json
+    DB_ASYNC=true python benchmarks/load.py --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, NamedTuple
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'config-vault-bench.db')}"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URL),
+        help="Seeded database to run against (default: %(default)s)",
+    )
+    parser.add_argument("--scenario", nargs="+", help=f"Scenarios to run, all by default: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, help="Requests per scenario, overriding each scenario's default")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests before each scenario")
+    parser.add_argument("--sample-size", type=int, default=500, help="Tenants, sites and keys drawn as targets")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+    unknown = set(args.scenario or ()) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s) {', '.join(sorted(unknown))}, choose from {', '.join(SCENARIOS)}")
+    return args
+
+def configure(database_url):
+    os.environ["DATABASE_URL"] = database_url
+    # Background workers would add queries and CPU load to every scenario
+    os.environ.setdefault("KEY_EXPIRY_SWEEP_ENABLED", "false")
+    os.environ.setdefault("KEY_ROTATION_ENABLED", "false")
+    os.environ.setdefault("DOMAIN_INDEX_BUILD_ON_STARTUP", "false")
+    sys.path.insert(0, str(SERVICE_ROOT))
+
+class Sample(NamedTuple):
+    """Existing rows the scenarios pick their targets from"""
+    tenant_ids: list
+    site_ids: list
+    kids: list
+    key_ids: list
+
+def draw_sample(size, rng):
+    """
+    Rows at random positions in id order, so targets are spread over the
+    whole table rather than taken from its first pages
+    """
+    from sqlalchemy import select
+    from app.db.session import SessionLocal
+    from app.models.rsa_key_pair import RSAKeyPair
+    from app.models.site import Site
+    from app.models.tenant import Tenant
+
+    def draw(db, columns, *criteria):
+        rows = {}
+        for _ in range(size):
+            start = uuid.UUID(int=rng.getrandbits(128))
+            row = db.execute(
+                select(*columns).where(columns[0] >= start, *criteria).order_by(columns[0]).limit(1)
+            ).first()
+            if row is not None:
+                rows[row[0]] = row
+        return list(rows.values())
+
+    with SessionLocal() as db:
+        tenants = draw(db, (Tenant.id,))
+        sites = draw(db, (Site.id,))
+        keys = draw(db, (RSAKeyPair.id, RSAKeyPair.kid), RSAKeyPair.status == "active")
+    if not tenants or not keys:
+        raise SystemExit("The database has no tenants or active keys, run benchmarks/seed.py first")
+    return Sample(
+        tenant_ids=[str(row.id) for row in tenants],
+        site_ids=[str(row.id) for row in sites],
+        kids=[row.kid for row in keys],
+        key_ids=[str(row.id) for row in keys],
+    )
+
+# A scenario step sends one request and returns it. ``state`` belongs to one
+# simulated client, e.g. to follow pagination cursors.
+Step = Callable[..., Awaitable]
+
+async def kid_read(client, prefix, sample, rng, state):
+    return await client.get(f"{prefix}/keys/{rng.choice(sample.kids)}")
+
+async def active_keys(client, prefix, sample, rng, state):
+    if sample.site_ids and rng.random() < 0.5:
+        return await client.get(f"{prefix}/keys/site/{rng.choice(sample.site_ids)}/active")
+    return await client.get(f"{prefix}/keys/tenant/{rng.choice(sample.tenant_ids)}/active")
+
+async def tenant_page(client, prefix, sample, rng, state):
+    params = {"limit": 100}
+    if state.get("cursor"):
+        params["cursor"] = state["cursor"]
+    response = await client.get(f"{prefix}/tenants/", params=params)
+    state["cursor"] = response.headers.get("x-next-cursor")
+    return response
+
+async def key_create(client, prefix, sample, rng, state):
+    return await client.post(f"{prefix}/keys/", json={"tenant_id": rng.choice(sample.tenant_ids)})
+
+async def key_status_toggle(client, prefix, sample, rng, state):
+    action = rng.choice(("revoke", "activate"))
+    return await client.post(f"{prefix}/keys/{rng.choice(sample.key_ids)}/{action}")
+
+MIXED = ((kid_read, 0.75), (active_keys, 0.1), (tenant_page, 0.05), (key_status_toggle, 0.09), (key_create, 0.01))
+
+async def mixed(client, prefix, sample, rng, state):
+    step = rng.choices([step for step, _ in MIXED], weights=[weight for _, weight in MIXED])[0]
+    return await step(client, prefix, sample, rng, state)
+
+class Scenario(NamedTuple):
+    step: Step
+    requests: int
+    description: str
+
+SCENARIOS: Dict[str, Scenario] = {
+    "kid-reads": Scenario(kid_read, 5000, "GET /keys/{kid} for random active kids"),
+    "active-keys": Scenario(active_keys, 2000, "Active key listings of random tenants and sites"),
+    "tenant-pages": Scenario(tenant_page, 1000, "Walk the tenant listing 100 rows at a time"),
+    "key-create-burst": Scenario(key_create, 200, "POST /keys for random tenants, back to back"),
+    "mixed": Scenario(mixed, 5000, "75% kid reads, 15% listings, 10% status changes and creations"),
+}
+
+class QueryCounter:
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+async def run_scenario(client, prefix, name, sample, args, counter):
+    scenario = SCENARIOS[name]
+    total = args.requests or scenario.requests
+    rng = random.Random(f"{args.seed}:{name}")
+    latencies, errors = [], {}
+    remaining = {"warmup": args.warmup, "measured": total}
+
+    async def client_loop(phase):
+        state = {}
+        while remaining[phase] > 0:
+            remaining[phase] -= 1
+            started = time.perf_counter()
+            response = await scenario.step(client, prefix, sample, rng, state)
+            elapsed = time.perf_counter() - started
+            if phase == "measured":
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    # Warm up with a single client, then measure with all of them
+    await client_loop("warmup")
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop("measured") for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "name": name,
+        "description": scenario.description,
+        "requests": len(ordered),
+        "concurrency": args.concurrency,
+        "errors": {str(status): count for status, count in sorted(errors.items())},
+        "duration_seconds": round(duration, 3),
+        "requests_per_second": round(len(ordered) / duration, 1),
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+        "queries_per_request": round((counter.count - queries_before) / len(ordered), 2),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment(args):
+    from sqlalchemy import func, select
+    from app.core.config import settings
+    from app.db.session import SessionLocal, async_engine, engine
+    from app.models.rsa_key_pair import RSAKeyPair
+    from app.models.site import Site
+    from app.models.tenant import Tenant
+
+    dialect = (async_engine or engine).dialect
+    with SessionLocal() as db:
+        rows = {
+            name: db.scalar(select(func.count()).select_from(model))
+            for name, model in (("tenants", Tenant), ("sites", Site), ("keys", RSAKeyPair))
+        }
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "database": f"{dialect.name}+{dialect.driver}",
+        "rows": rows,
+        "settings": {
+            name: getattr(settings, name)
+            for name in ("DB_ASYNC", "DB_POOL_SIZE", "FAST_JSON_RESPONSES", "KEY_POOL_ENABLED", "KEY_STORAGE_FORMAT")
+        },
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+    }
+
+def print_table(report, baseline, out=sys.stderr):
+    previous = {scenario["name"]: scenario for scenario in (baseline or {}).get("scenarios", [])}
+    print(
+        f"{'scenario':<17} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}",
+        file=out,
+    )
+    for scenario in report["scenarios"]:
+        latency = scenario["latency_ms"]
+        print(
+            f"{scenario['name']:<17} {scenario['requests_per_second']:>9.1f} {latency['p50']:>8.2f}"
+            f" {latency['p95']:>8.2f} {latency['p99']:>8.2f} {scenario['queries_per_request']:>8.2f}"
+            f" {sum(scenario['errors'].values()):>7}",
+            file=out,
+        )
+        before = previous.get(scenario["name"])
+        if before is not None:
+            ratio = lambda new, old: f"{new / old:.2f}x" if old else "-"
+            print(
+                f"{'  vs baseline':<17} {ratio(scenario['requests_per_second'], before['requests_per_second']):>9}"
+                + "".join(
+                    f" {ratio(latency[p], before['latency_ms'][p]):>8}" for p in ("p50", "p95", "p99")
+                )
+                + f" {ratio(scenario['queries_per_request'], before['queries_per_request']):>8}",
+                file=out,
+            )
+
+async def run(args):
+    import httpx
+    from app.core.config import settings
+    from app.db.session import async_engine, engine
+    from app.main import app
+
+    counter = QueryCounter([engine] + ([async_engine.sync_engine] if async_engine is not None else []))
+    sample = draw_sample(args.sample_size, random.Random(args.seed))
+    report = {"environment": environment(args), "scenarios": []}
+    # Unhandled errors become 500 responses counted per scenario, as behind a server
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://config-vault") as client:
+            for name in args.scenario or SCENARIOS:
+                print(f"Running {name}", file=sys.stderr)
+                report["scenarios"].append(
+                    await run_scenario(client, settings.API_V1_STR, name, sample, args, counter)
+                )
+    return report
+
+def main():
+    args = parse_args()
+    configure(args.database_url)
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_table(report, baseline)
+    body = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(body + "\n")
+    else:
+        print(body)
+
+if __name__ == "__main__":
+    main()
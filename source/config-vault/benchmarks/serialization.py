@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare the default and the fast JSON path for key pair list responses.
+
+The default path is what FastAPI does with ``response_model``: validate every
+row into the schema, run ``jsonable_encoder`` and ``json.dumps``. The fast
+path, which listings use, dumps the rows directly with orjson, e.g.:
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 100 1000 --repeat 20
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per size, the best one is reported")
+    return parser.parse_args()
+
+def make_rows(count):
+    from app.core.key_generation import KeyGenerationService
+    from app.db import base  # noqa: F401 registers every model for the relationships
+    from app.models.rsa_key_pair import RSAKeyPair
+
+    # Key generation is slow, and serialization cost does not depend on the key itself
+    private_key, public_key = KeyGenerationService.generate_rsa_key_pair(2048)
+    tenant_id, now = uuid.uuid4(), datetime.utcnow()
+    return [
+        RSAKeyPair(
+            id=uuid.uuid4(),
+            kid=KeyGenerationService.generate_kid(),
+            private_key=private_key,
+            public_key=public_key,
+            tenant_id=tenant_id,
+            site_id=None,
+            status="active",
+            created_at=now,
+            expires_at=now + timedelta(days=90),
+        )
+        for _ in range(count)
+    ]
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, str(SERVICE_ROOT))
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from app.core.serialization import dump_rows
+    from app.schemas.rsa_key_pair import RSAKeyPair
+
+    adapter = TypeAdapter(List[RSAKeyPair])
+
+    def default_path(rows):
+        validated = adapter.validate_python(rows, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    print(f"{'rows':>7}  {'default ms':>11}  {'fast ms':>9}  {'speedup':>8}  {'bytes':>10}")
+    for count in args.rows:
+        rows = make_rows(count)
+        default_seconds, default_body = best_of(args.repeat, lambda: default_path(rows))
+        fast_seconds, fast_body = best_of(args.repeat, lambda: dump_rows(rows, RSAKeyPair))
+        if json.loads(default_body) != json.loads(fast_body):
+            raise SystemExit(f"Bodies differ for {count} rows")
+        print(
+            f"{count:>7}  {default_seconds * 1000:>11.2f}  {fast_seconds * 1000:>9.2f}"
+            f"  {default_seconds / fast_seconds:>7.1f}x  {len(fast_body):>10}"
+        )
+
+if __name__ == "__main__":
+    main()
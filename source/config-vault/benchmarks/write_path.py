@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Count the SQL statements each mutating endpoint issues per request.
+
+Runs the app in-process against a throwaway SQLite database migrated to head
+(or against DATABASE_URL with --database-url), e.g.:
+
+    python benchmarks/write_path.py
+    DB_ASYNC=true python benchmarks/write_path.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVICE_ROOT = Path(__file__).resolve().parents[1]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Already migrated database to run against")
+    return parser.parse_args()
+
+def configure(database_url):
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="config-vault-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("KEY_POOL_ENABLED", "false")
+    os.environ.setdefault("KEY_GENERATION_EXECUTOR", "thread")
+    sys.path.insert(0, str(SERVICE_ROOT))
+    if database_url.startswith("sqlite"):
+        from alembic import command
+        from alembic.config import Config
+
+        config = Config(str(SERVICE_ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(SERVICE_ROOT / "alembic"))
+        command.upgrade(config, "head")
+
+class QueryCounter:
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def main():
+    args = parse_args()
+    configure(args.database_url)
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.db.session import async_engine, engine
+    from app.main import app
+
+    engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    counter = QueryCounter(engines)
+    prefix = settings.API_V1_STR
+    results = []
+
+    with TestClient(app) as client:
+        def measure(name, method, path, **kwargs):
+            counter.count = 0
+            start = time.perf_counter()
+            response = client.request(method, prefix + path, **kwargs)
+            elapsed = time.perf_counter() - start
+            assert response.status_code < 400, (name, response.status_code, response.text)
+            results.append((name, counter.count, elapsed))
+            return response.json()
+
+        suffix = os.urandom(4).hex()
+        tenant = measure("POST /tenants", "POST", "/tenants/", json={"name": "t", "domain": f"t-{suffix}.com"})
+        measure("PUT /tenants/{id}", "PUT", f"/tenants/{tenant['id']}", json={"name": "t2"})
+        site = measure(
+            "POST /sites", "POST", "/sites/",
+            json={"name": "s", "domain": f"s-{suffix}.com", "tenant_id": tenant["id"]},
+        )
+        measure("PUT /sites/{id}", "PUT", f"/sites/{site['id']}", json={"name": "s2"})
+        key = measure("POST /keys", "POST", "/keys/", json={"tenant_id": tenant["id"], "site_id": site["id"]})
+        measure("POST /keys/batch (10)", "POST", "/keys/batch", json=[{"tenant_id": tenant["id"]}] * 10)
+        measure("POST /keys/{id}/revoke", "POST", f"/keys/{key['id']}/revoke")
+        measure("POST /keys/{id}/activate", "POST", f"/keys/{key['id']}/activate")
+        measure("DELETE /keys/{id}", "DELETE", f"/keys/{key['id']}")
+        client.post(f"{prefix}/keys/", json={"tenant_id": tenant["id"], "site_id": site["id"]})
+        measure("DELETE /sites/{id} (1 key)", "DELETE", f"/sites/{site['id']}")
+        measure("DELETE /tenants/{id} (10 keys)", "DELETE", f"/tenants/{tenant['id']}")
+
+    width = max(len(name) for name, _, _ in results)
+    print(f"{'endpoint':<{width}}  queries  ms")
+    for name, queries, elapsed in results:
+        print(f"{name:<{width}}  {queries:>7}  {elapsed * 1000:.1f}")
+
+if __name__ == "__main__":
+    main()